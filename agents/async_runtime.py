@@ -0,0 +1,72 @@
+"""
+حلقة أحداث خلفية مشتركة لتشغيل الدوال غير المتزامنة من الكود المتزامن
+"""
+import asyncio
+import threading
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar('T')
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """حلقة الأحداث الخلفية للعملية (تُنشأ عند أول استخدام في خيط daemon)"""
+    global _loop, _thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name='agent-event-loop',
+                                       daemon=True)
+            _thread.start()
+        return _loop
+
+
+def run_sync(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    تشغيل coroutine على الحلقة الخلفية وانتظار نتيجتها
+
+    يمكن استدعاؤها من عدة خيوط في نفس الوقت، فتُنفذ الطلبات بالتوازي على
+    الحلقة نفسها. إذا قوطع الانتظار (مثلاً KeyboardInterrupt) أو انتهت المهلة
+    تُلغى الـ coroutine.
+
+    Args:
+        coro: الـ coroutine المراد تشغيلها
+        timeout: أقصى مدة انتظار بالثواني (None = بلا حد)
+
+    Returns:
+        نتيجة الـ coroutine
+    """
+    loop = get_loop()
+    if threading.current_thread() is _thread:
+        coro.close()
+        raise RuntimeError("run_sync لا يمكن استدعاؤها من داخل حلقة الأحداث الخلفية")
+
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
+
+
+def stop(timeout: float = 5.0):
+    """
+    إيقاف الحلقة الخلفية وإغلاقها (تُنشأ حلقة جديدة عند الاستخدام التالي)
+
+    Args:
+        timeout: أقصى مدة انتظار لانتهاء خيط الحلقة بالثواني
+    """
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop = _thread = None
+    if loop is None or loop.is_closed():
+        return
+    loop.call_soon_threadsafe(loop.stop)
+    if thread is not None:
+        thread.join(timeout)
+    if not loop.is_running():
+        loop.close()
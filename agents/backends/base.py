@@ -0,0 +1,80 @@
+"""
+الواجهة المشتركة لمزودي نماذج اللغة
+"""
+import asyncio
+from typing import Dict, Iterator, List, Optional
+
+
+class LLMBackend:
+    """
+    واجهة مزود نموذج اللغة
+
+    على كل مزود تنفيذ complete و acomplete و stream. الاستدعاء الدفعي
+    الافتراضي يشغّل acomplete لكل طلب معاً، ويمكن للمزودين الذين يدعمون
+    واجهات دفعية أصلية استبداله.
+
+    إذا مُرر قاموس usage يملؤه المزود بـ prompt_tokens و completion_tokens
+    كما أبلغ عنها الخادم (ويتركه فارغاً إن لم يُبلغ عنها).
+    """
+
+    name = "base"
+    display_name = "Base"
+
+    def __init__(self, model: Optional[str] = None):
+        """
+        تهيئة المزود
+
+        Args:
+            model: اسم النموذج (None = من الإعدادات)
+        """
+        self.model = model or ""
+
+    def complete(self, messages: List[Dict[str, str]], max_tokens: int,
+                 temperature: float, usage: Optional[Dict[str, int]] = None) -> str:
+        """
+        طلب رد كامل بشكل متزامن
+
+        Args:
+            messages: الرسائل بصيغة API
+            max_tokens: الحد الأقصى لرموز الرد
+            temperature: درجة الحرارة
+            usage: قاموس يُملأ بعدد الرموز المستهلكة
+
+        Returns:
+            نص الرد
+        """
+        raise NotImplementedError
+
+    async def acomplete(self, messages: List[Dict[str, str]], max_tokens: int,
+                        temperature: float, usage: Optional[Dict[str, int]] = None) -> str:
+        """النسخة غير المتزامنة من complete"""
+        raise NotImplementedError
+
+    def stream(self, messages: List[Dict[str, str]], max_tokens: int,
+               temperature: float, usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        """
+        طلب رد كتدفق من الأجزاء النصية
+
+        Yields:
+            أجزاء الرد بالترتيب
+        """
+        raise NotImplementedError
+
+    async def abatch(self, requests: List[List[Dict[str, str]]], max_tokens: int,
+                     temperature: float,
+                     usages: Optional[List[Dict[str, int]]] = None) -> List[str]:
+        """
+        طلب عدة ردود مستقلة معاً
+
+        Args:
+            requests: قائمة محادثات بصيغة API
+            usages: قواميس usage لكل طلب بنفس الترتيب
+
+        Returns:
+            الردود بنفس ترتيب الطلبات
+        """
+        usages = usages if usages is not None else [None] * len(requests)
+        return list(await asyncio.gather(
+            *(self.acomplete(messages, max_tokens, temperature, usage)
+              for messages, usage in zip(requests, usages))
+        ))
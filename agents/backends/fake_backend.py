@@ -0,0 +1,98 @@
+"""
+مزود محلي وهمي بدون شبكة
+ردود حتمية بزمن استجابة وعدد رموز قابلين للضبط، للاختبارات وقياس الأداء
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+# إضافة المسار للوصول إلى config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config.settings import config
+from agents.backends.base import LLMBackend
+from agents.history import estimate_tokens
+
+# مفردات الرد المولّد؛ الكلمة في كل موضع تُختار من بصمة الطلب
+VOCABULARY = [
+    "نعم", "لا", "ربما", "المهمة", "البريد", "الرسالة", "تم", "التنفيذ", "الملخص",
+    "النتيجة", "مهم", "عاجل", "لاحقاً", "اليوم", "غداً", "شكراً",
+]
+
+
+class FakeBackend(LLMBackend):
+    """
+    مزود وهمي يعمل داخل العملية
+
+    الرد نفسه يُعاد دائماً لنفس الرسائل. الزمن latency موزع بالتساوي على
+    رموز الرد عند التدفق، وتُسجل كل الطلبات في calls.
+    """
+
+    name = "fake"
+    display_name = "Fake (محلي)"
+
+    def __init__(self, model: Optional[str] = None, latency: Optional[float] = None,
+                 tokens: Optional[int] = None, reply: Optional[str] = None):
+        """
+        تهيئة المزود الوهمي
+
+        Args:
+            model: اسم النموذج
+            latency: زمن الرد الكامل بالثواني (None = FAKE_LATENCY)
+            tokens: عدد رموز الرد المولّد (None = FAKE_TOKENS)
+            reply: رد ثابت بدلاً من الرد المولّد
+        """
+        super().__init__(model or "fake")
+        self.latency = config.FAKE_LATENCY if latency is None else latency
+        self.tokens = config.FAKE_TOKENS if tokens is None else tokens
+        self.reply = reply
+        self.calls: List[List[Dict[str, str]]] = []
+        self._lock = threading.Lock()
+
+    def _parts(self, messages: List[Dict[str, str]], max_tokens: int,
+               usage: Optional[Dict[str, int]] = None) -> List[str]:
+        """تسجيل الطلب وتوليد أجزاء الرد"""
+        with self._lock:
+            self.calls.append(list(messages))
+
+        if self.reply is not None:
+            words = self.reply.split(" ")
+        else:
+            digest = hashlib.sha256(
+                json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8")
+            ).digest()
+            count = min(self.tokens, max_tokens)
+            words = [VOCABULARY[digest[i % len(digest)] % len(VOCABULARY)] for i in range(count)]
+
+        if usage is not None:
+            usage['prompt_tokens'] = sum(estimate_tokens(m.get("content", "")) for m in messages)
+            usage['completion_tokens'] = len(words)
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def complete(self, messages: List[Dict[str, str]], max_tokens: int,
+                 temperature: float, usage: Optional[Dict[str, int]] = None) -> str:
+        parts = self._parts(messages, max_tokens, usage)
+        if self.latency:
+            time.sleep(self.latency)
+        return "".join(parts)
+
+    async def acomplete(self, messages: List[Dict[str, str]], max_tokens: int,
+                        temperature: float, usage: Optional[Dict[str, int]] = None) -> str:
+        parts = self._parts(messages, max_tokens, usage)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return "".join(parts)
+
+    def stream(self, messages: List[Dict[str, str]], max_tokens: int,
+               temperature: float, usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        parts = self._parts(messages, max_tokens, usage)
+        delay = self.latency / len(parts) if parts and self.latency else 0
+        for part in parts:
+            if delay:
+                time.sleep(delay)
+            yield part
@@ -0,0 +1,72 @@
+"""
+مزود Groq
+"""
+import os
+import sys
+from typing import Dict, Iterator, List, Optional
+
+# إضافة المسار للوصول إلى config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config.settings import config
+from agents.backends.base import LLMBackend
+from agents.clients import get_async_client, get_client
+
+
+def _record_usage(usage: Optional[Dict[str, int]], reported) -> None:
+    """نسخ عدد الرموز من كائن usage الخاص بـ Groq"""
+    if usage is not None and reported is not None:
+        usage['prompt_tokens'] = reported.prompt_tokens
+        usage['completion_tokens'] = reported.completion_tokens
+
+
+class GroqBackend(LLMBackend):
+    """مزود Groq عبر العملاء المشتركين في agents.clients"""
+
+    name = "groq"
+    display_name = "Groq"
+
+    def __init__(self, model: Optional[str] = None):
+        super().__init__(model or config.GROQ_MODEL)
+
+    @property
+    def client(self):
+        """العميل المتزامن المشترك (يُنشأ عند أول طلب)"""
+        return get_client("groq")
+
+    def complete(self, messages: List[Dict[str, str]], max_tokens: int,
+                 temperature: float, usage: Optional[Dict[str, int]] = None) -> str:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        _record_usage(usage, response.usage)
+        return response.choices[0].message.content
+
+    async def acomplete(self, messages: List[Dict[str, str]], max_tokens: int,
+                        temperature: float, usage: Optional[Dict[str, int]] = None) -> str:
+        response = await get_async_client("groq").chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+        _record_usage(usage, response.usage)
+        return response.choices[0].message.content
+
+    def stream(self, messages: List[Dict[str, str]], max_tokens: int,
+               temperature: float, usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True,
+        )
+        for chunk in stream:
+            # Groq يرسل عدد الرموز في x_groq.usage للجزء الأخير فقط
+            _record_usage(usage, getattr(getattr(chunk, 'x_groq', None), 'usage', None))
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -0,0 +1,75 @@
+"""
+مزود Ollama المحلي
+"""
+import os
+import sys
+from typing import Dict, Iterator, List, Optional
+
+# إضافة المسار للوصول إلى config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from config.settings import config
+from agents.backends.base import LLMBackend
+from agents.clients import get_async_client, get_client
+
+
+def _record_usage(usage: Optional[Dict[str, int]], response) -> None:
+    """نسخ عدد الرموز من رد Ollama (يتوفر في الرد الكامل أو آخر جزء من التدفق)"""
+    if usage is not None and response.get("eval_count") is not None:
+        usage['prompt_tokens'] = response.get("prompt_eval_count") or 0
+        usage['completion_tokens'] = response.get("eval_count")
+
+
+class OllamaBackend(LLMBackend):
+    """مزود Ollama عبر العملاء المشتركين في agents.clients"""
+
+    name = "ollama"
+    display_name = "Ollama"
+
+    def __init__(self, model: Optional[str] = None):
+        super().__init__(model or config.OLLAMA_MODEL)
+
+    @property
+    def client(self):
+        """العميل المتزامن المشترك (يُنشأ عند أول طلب)"""
+        return get_client("ollama")
+
+    @staticmethod
+    def _options(max_tokens: int, temperature: float) -> Dict[str, float]:
+        return {"num_predict": max_tokens, "temperature": temperature}
+
+    def complete(self, messages: List[Dict[str, str]], max_tokens: int,
+                 temperature: float, usage: Optional[Dict[str, int]] = None) -> str:
+        response = self.client.chat(
+            model=self.model,
+            messages=messages,
+            stream=False,
+            options=self._options(max_tokens, temperature),
+        )
+        _record_usage(usage, response)
+        return response.get("message", {}).get("content", "")
+
+    async def acomplete(self, messages: List[Dict[str, str]], max_tokens: int,
+                        temperature: float, usage: Optional[Dict[str, int]] = None) -> str:
+        response = await get_async_client("ollama").chat(
+            model=self.model,
+            messages=messages,
+            stream=False,
+            options=self._options(max_tokens, temperature),
+        )
+        _record_usage(usage, response)
+        return response.get("message", {}).get("content", "")
+
+    def stream(self, messages: List[Dict[str, str]], max_tokens: int,
+               temperature: float, usage: Optional[Dict[str, int]] = None) -> Iterator[str]:
+        stream = self.client.chat(
+            model=self.model,
+            messages=messages,
+            stream=True,
+            options=self._options(max_tokens, temperature),
+        )
+        for chunk in stream:
+            _record_usage(usage, chunk)
+            content = chunk.get("message", {}).get("content", "")
+            if content:
+                yield content
@@ -0,0 +1,57 @@
+"""
+سجل مزودي نماذج اللغة
+يُحمّل كل مزود عند أول استخدام فقط، لذا لا تُستورد مكتبات المزودين غير المستخدمة
+"""
+import importlib
+from typing import Callable, Dict, List, Union
+
+from agents.backends.base import LLMBackend
+
+BackendFactory = Callable[..., LLMBackend]
+
+# الاسم -> "الوحدة:الصنف" أو دالة تُنشئ المزود
+_BACKENDS: Dict[str, Union[str, BackendFactory]] = {
+    "groq": "agents.backends.groq_backend:GroqBackend",
+    "ollama": "agents.backends.ollama_backend:OllamaBackend",
+    "fake": "agents.backends.fake_backend:FakeBackend",
+}
+
+
+def register_backend(name: str, factory: Union[str, BackendFactory]):
+    """
+    تسجيل مزود جديد
+
+    Args:
+        name: اسم المزود كما يُكتب في AI_PROVIDER
+        factory: صنف أو دالة تُنشئ المزود، أو مسار "الوحدة:الصنف" للتحميل الكسول
+    """
+    _BACKENDS[name] = factory
+
+
+def available_backends() -> List[str]:
+    """أسماء المزودين المسجلين"""
+    return sorted(_BACKENDS)
+
+
+def create_backend(name: str, **options) -> LLMBackend:
+    """
+    إنشاء مزود بالاسم
+
+    Args:
+        name: اسم المزود
+        **options: معاملات إضافية لمُنشئ المزود
+
+    Returns:
+        كائن المزود
+
+    Raises:
+        ValueError: إذا لم يكن المزود مسجلاً
+    """
+    factory = _BACKENDS.get(name)
+    if factory is None:
+        raise ValueError(f"مزود غير معروف: {name}")
+    if isinstance(factory, str):
+        module_name, _, attribute = factory.partition(":")
+        factory = getattr(importlib.import_module(module_name), attribute)
+        _BACKENDS[name] = factory
+    return factory(**options)
@@ -1,22 +1,50 @@
 """
 الوكيل الأساسي الذي يتولى معالجة المعلومات والمنطق
 """
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel
+from typing import Optional, List, Dict, Any, Iterator, Callable
 from colorama import Fore, Style
+import asyncio
+import contextvars
 import sys
 import os
+import time
 
 # إضافة المسار للوصول إلى config
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.settings import config
+from agents.async_runtime import run_sync
+from agents.backends.base import LLMBackend
+from agents.backends.registry import create_backend
+from agents.history import ConversationHistory, Message, estimate_tokens, summarize_locally
+from agents.response_cache import ResponseCache, get_default_cache, make_cache_key
+from agents.telemetry import CallRecord, Telemetry, get_default_telemetry
 
+# حجم نافذة السياق (بالرموز) للنماذج المعروفة
+CONTEXT_WINDOWS = {
+    "mixtral-8x7b-32768": 32768,
+    "llama2": 4096,
+    "llama3": 8192,
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+    "gemma2-9b-it": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
 
-class Message(BaseModel):
-    """نموذج الرسالة"""
-    role: str  # "user" أو "assistant"
-    content: str
+# زمن انتظار الطلب المتزامن قبل أن تبدأ حلقة الأحداث الخلفية بتنفيذه
+# (None للاستدعاءات التي لم تمر بـ _submit مثل acomplete المباشر و stream_response)
+_queue_wait: contextvars.ContextVar = contextvars.ContextVar('queue_wait', default=None)
+
+
+async def _dequeued(queued_at: float, coro):
+    """تسجيل زمن الانتظار في الطابور ثم تنفيذ الـ coroutine"""
+    _queue_wait.set(time.perf_counter() - queued_at)
+    return await coro
+
+
+def _submit(coro):
+    """تشغيل coroutine من الكود المتزامن مع قياس زمن انتظارها"""
+    return run_sync(_dequeued(time.perf_counter(), coro))
 
 
 class BaseAgent:
@@ -27,107 +55,363 @@ class BaseAgent:
         تهيئة الوكيل الأساسي
 
         Args:
-            provider: مزود الخدمة ("groq" أو "ollama")
+            provider: اسم المزود المسجل في agents.backends.registry ("groq" أو "ollama" أو "fake")
         """
         self.provider = provider or config.AI_PROVIDER
-        self.conversation_history: List[Message] = []
-        self.model = None
+        self.backend = self._init_backend()
+        self.request_timeout: Optional[float] = config.REQUEST_TIMEOUT or None
+        self.temperature = config.TEMPERATURE
+        self.max_tokens = config.MAX_TOKENS
+        self.response_cache: Optional[ResponseCache] = get_default_cache()
+        self.telemetry: Optional[Telemetry] = get_default_telemetry()
+        self.conversation_history = ConversationHistory(
+            budget_tokens=self._history_budget(),
+            keep_recent=config.HISTORY_KEEP_RECENT,
+            summarizer=self._summarize_with_model if config.HISTORY_LLM_SUMMARY else None,
+        )
 
-        if self.provider == "groq":
-            self._init_groq()
-        elif self.provider == "ollama":
-            self._init_ollama()
-        else:
-            raise ValueError(f"مزود غير معروف: {self.provider}")
+    def _init_backend(self) -> LLMBackend:
+        """
+        إنشاء المزود من السجل
 
-    def _init_groq(self):
-        """تهيئة Groq API"""
+        لا يُنشأ عميل المزود ولا تُستورد مكتبته إلا عند أول طلب.
+        """
         try:
-            from groq import Groq
-            self.model = Groq(api_key=config.GROQ_API_KEY)
-            print(f"{Fore.GREEN}✓ تم الاتصال بـ Groq بنجاح{Style.RESET_ALL}")
+            return create_backend(self.provider)
         except Exception as e:
-            print(f"{Fore.RED}✗ خطأ في الاتصال بـ Groq: {e}{Style.RESET_ALL}")
+            print(f"{Fore.RED}✗ خطأ في تهيئة المزود {self.provider}: {e}{Style.RESET_ALL}")
             raise
 
-    def _init_ollama(self):
-        """تهيئة Ollama"""
-        try:
-            import ollama
-            self.model = ollama
-            print(f"{Fore.GREEN}✓ تم الاتصال بـ Ollama بنجاح{Style.RESET_ALL}")
-        except Exception as e:
-            print(f"{Fore.RED}✗ خطأ في الاتصال بـ Ollama: {e}{Style.RESET_ALL}")
-            raise
+    @property
+    def model_name(self) -> str:
+        """اسم النموذج المستخدم لدى المزود الحالي"""
+        return self.backend.model
+
+    def _history_budget(self) -> int:
+        """ميزانية رموز السجل: نافذة سياق النموذج ناقص المساحة المحجوزة للرد"""
+        context_window = config.CONTEXT_WINDOW_TOKENS or CONTEXT_WINDOWS.get(
+            self.model_name, DEFAULT_CONTEXT_WINDOW)
+        return max(256, context_window - config.MAX_TOKENS)
 
     def add_to_history(self, role: str, content: str):
         """إضافة رسالة إلى السجل"""
         self.conversation_history.append(Message(role=role, content=content))
 
     def get_history_for_api(self) -> List[Dict[str, str]]:
-        """الحصول على السجل بصيغة API"""
-        return [{"role": msg.role, "content": msg.content} for msg in self.conversation_history]
+        """الحصول على السجل بصيغة API (الملخص ثم النافذة الحديثة)"""
+        return self.conversation_history.to_api()
+
+    def _use_cache(self, use_cache: Optional[bool]) -> bool:
+        """الذاكرة المؤقتة مفعلة تلقائياً عند temperature=0 واختيارية لكل استدعاء غير ذلك"""
+        if self.response_cache is None:
+            return False
+        return self.temperature == 0 if use_cache is None else use_cache
+
+    def _cache_key(self, messages: List[Dict[str, str]]) -> str:
+        return make_cache_key(self.provider, self.model_name, self.temperature,
+                              self.max_tokens, messages)
+
+    async def acomplete(self, messages: List[Dict[str, str]], use_cache: Optional[bool] = None,
+                        timeout: Optional[float] = None) -> str:
+        """
+        استدعاء النموذج مباشرة بقائمة رسائل بدون المرور بسجل المحادثة
+
+        لا تعدّل حالة الوكيل، لذا يمكن تشغيل عدة استدعاءات معاً عبر asyncio.gather.
+
+        Args:
+            messages: الرسائل بصيغة API
+            use_cache: استخدام ذاكرة الردود المؤقتة (None = تلقائياً عند temperature=0)
+            timeout: مهلة الطلب بالثواني (None = REQUEST_TIMEOUT)
+
+        Returns:
+            نص الرد
+
+        Raises:
+            asyncio.TimeoutError: إذا تجاوز الطلب المهلة
+        """
+        timeout = timeout if timeout is not None else self.request_timeout
+        started, clock = time.time(), time.perf_counter()
+        key = self._cache_key(messages) if self._use_cache(use_cache) else None
+        if key is not None:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                self._record("complete", messages, started, clock, cached, cached=True)
+                return cached
+
+        usage: Dict[str, int] = {}
+        try:
+            response = await asyncio.wait_for(self._acomplete(messages, usage), timeout)
+        except BaseException as e:
+            self._record("complete", messages, started, clock, "", usage, error=e)
+            raise
+        self._record("complete", messages, started, clock, response, usage)
+
+        if key is not None:
+            self.response_cache.put(key, response)
+        return response
+
+    async def _acomplete(self, messages: List[Dict[str, str]],
+                         usage: Optional[Dict[str, int]] = None) -> str:
+        """استدعاء المزود بدون ذاكرة مؤقتة"""
+        return await self.backend.acomplete(messages, self.max_tokens, self.temperature, usage)
+
+    def _record(self, kind: str, messages: List[Dict[str, str]], started: float, clock: float,
+                response: str, usage: Optional[Dict[str, int]] = None,
+                ttft: Optional[float] = None, cached: bool = False,
+                error: Optional[BaseException] = None):
+        """
+        تسجيل قياس الاستدعاء في telemetry
+
+        Args:
+            kind: نوع الاستدعاء ("complete" أو "stream" أو "batch")
+            messages: الرسائل المرسلة
+            started: وقت البدء (epoch)
+            clock: وقت البدء من time.perf_counter
+            response: نص الرد
+            usage: عدد الرموز كما أبلغ عنه المزود (يُقدّر إن كان فارغاً)
+            ttft: زمن أول جزء بالثواني
+            cached: خُدم الرد من الذاكرة المؤقتة
+            error: الخطأ إن فشل الطلب
+        """
+        if self.telemetry is None:
+            return
+        usage = usage or {}
+        estimated = not cached and 'completion_tokens' not in usage
+        if estimated:
+            usage = {
+                'prompt_tokens': sum(estimate_tokens(m.get("content", "")) for m in messages),
+                'completion_tokens': estimate_tokens(response) if response else 0,
+            }
+        user_message = next((m.get("content", "") for m in reversed(messages)
+                             if m.get("role") == "user"), "")
+        self.telemetry.record(CallRecord(
+            provider=self.provider,
+            model=self.model_name,
+            kind=kind,
+            started_at=started,
+            queue_wait=_queue_wait.get(),
+            ttft=ttft,
+            latency=time.perf_counter() - clock,
+            prompt_tokens=0 if cached else usage.get('prompt_tokens', 0),
+            completion_tokens=0 if cached else usage.get('completion_tokens', 0),
+            tokens_estimated=estimated,
+            cached=cached,
+            error=None if error is None else (str(error) or type(error).__name__),
+            user_message=user_message,
+            response=response,
+        ))
+
+    async def acomplete_many(self, requests: List[List[Dict[str, str]]],
+                             use_cache: Optional[bool] = None,
+                             timeout: Optional[float] = None) -> List[str]:
+        """
+        عدة استدعاءات مستقلة معاً عبر الاستدعاء الدفعي للمزود
+
+        تُخدم الطلبات المخزنة من الذاكرة المؤقتة ويُرسل الباقي دفعة واحدة.
+
+        Args:
+            requests: قائمة محادثات بصيغة API
+            use_cache: استخدام ذاكرة الردود المؤقتة (None = تلقائياً عند temperature=0)
+            timeout: مهلة الدفعة كاملة بالثواني (None = REQUEST_TIMEOUT)
+
+        Returns:
+            الردود بنفس ترتيب الطلبات
+        """
+        timeout = timeout if timeout is not None else self.request_timeout
+        cached = self._use_cache(use_cache)
+        keys = [self._cache_key(messages) for messages in requests] if cached else []
+        responses: List[Optional[str]] = (
+            [self.response_cache.get(key) for key in keys] if cached else [None] * len(requests)
+        )
+
+        started, clock = time.time(), time.perf_counter()
+        for i, response in enumerate(responses):
+            if response is not None:
+                self._record("batch", requests[i], started, clock, response, cached=True)
+
+        missing = [i for i, response in enumerate(responses) if response is None]
+        if missing:
+            usages: List[Dict[str, int]] = [{} for _ in missing]
+            try:
+                fresh = await asyncio.wait_for(
+                    self.backend.abatch([requests[i] for i in missing], self.max_tokens,
+                                        self.temperature, usages),
+                    timeout,
+                )
+            except BaseException as e:
+                for i, usage in zip(missing, usages):
+                    self._record("batch", requests[i], started, clock, "", usage, error=e)
+                raise
+            for i, response, usage in zip(missing, fresh, usages):
+                responses[i] = response
+                self._record("batch", requests[i], started, clock, response, usage)
+                if cached:
+                    self.response_cache.put(keys[i], response)
+        return responses
+
+    def complete_many(self, requests: List[List[Dict[str, str]]],
+                      use_cache: Optional[bool] = None) -> List[str]:
+        """النسخة المتزامنة من acomplete_many"""
+        return _submit(self.acomplete_many(requests, use_cache))
+
+    def complete(self, messages: List[Dict[str, str]], use_cache: Optional[bool] = None) -> str:
+        """
+        النسخة المتزامنة من acomplete (تُنفذ على حلقة الأحداث الخلفية)
+
+        Args:
+            messages: الرسائل بصيغة API
+            use_cache: استخدام ذاكرة الردود المؤقتة (None = تلقائياً عند temperature=0)
+
+        Returns:
+            نص الرد
+        """
+        return _submit(self.acomplete(messages, use_cache))
 
-    def process_with_groq(self, prompt: str) -> str:
-        """معالجة الطلب باستخدام Groq"""
+    def _summarize_with_model(self, messages: List[Message], previous_summary: Optional[str],
+                              max_tokens: int) -> str:
+        """تلخيص الرسائل المطوية باستخدام النموذج (HISTORY_LLM_SUMMARY)"""
+        transcript = "\n".join(f"{msg.role}: {msg.content}" for msg in messages)
+        previous = f"الملخص السابق:\n{previous_summary}\n\n" if previous_summary else ""
+        prompt = f"""لخص المحادثة التالية في نقاط موجزة لا تتجاوز {max_tokens} رمزاً،
+مع الاحتفاظ بالحقائق والقرارات والأسماء المهمة.
+
+{previous}المحادثة:
+{transcript}"""
         try:
-            self.add_to_history("user", prompt)
+            return self.complete([{"role": "user", "content": prompt}])
+        except Exception as e:
+            print(f"{Fore.YELLOW}⚠️  تعذر تلخيص السجل بالنموذج: {e}{Style.RESET_ALL}")
+            return summarize_locally(messages, previous_summary, max_tokens)
+
+    async def _aadd_to_history(self, role: str, content: str):
+        """إضافة رسالة إلى السجل دون حجب حلقة الأحداث عند التلخيص بالنموذج"""
+        if self.conversation_history.summarizer is summarize_locally:
+            self.add_to_history(role, content)
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, self.add_to_history, role, content)
+
+    async def aprocess(self, prompt: str, use_cache: Optional[bool] = None,
+                       timeout: Optional[float] = None) -> str:
+        """
+        معالجة الطلب مع سجل المحادثة بشكل غير متزامن
+
+        الاستدعاءات المتزامنة على نفس الوكيل تتشارك السجل؛ للتوزيع عبر
+        asyncio.gather استخدم acomplete.
 
-            response = self.model.chat.completions.create(
-                model=config.GROQ_MODEL,
-                messages=self.get_history_for_api(),
-                max_tokens=config.MAX_TOKENS,
-                temperature=config.TEMPERATURE,
-            )
+        Args:
+            prompt: الرسالة المراد معالجتها
+            use_cache: استخدام ذاكرة الردود المؤقتة (None = تلقائياً عند temperature=0)
+            timeout: مهلة الطلب بالثواني (None = REQUEST_TIMEOUT)
 
-            assistant_message = response.choices[0].message.content
-            self.add_to_history("assistant", assistant_message)
+        Returns:
+            الرد من النموذج أو رسالة الخطأ
+        """
+        try:
+            await self._aadd_to_history("user", prompt)
+
+            assistant_message = await self.acomplete(self.get_history_for_api(), use_cache, timeout)
+            await self._aadd_to_history("assistant", assistant_message)
             return assistant_message
 
+        except asyncio.TimeoutError:
+            error_msg = "خطأ في معالجة الطلب: انتهت مهلة الطلب"
+            print(f"{Fore.RED}{error_msg}{Style.RESET_ALL}")
+            return error_msg
+
         except Exception as e:
             error_msg = f"خطأ في معالجة الطلب: {str(e)}"
             print(f"{Fore.RED}{error_msg}{Style.RESET_ALL}")
             return error_msg
 
-    def process_with_ollama(self, prompt: str) -> str:
-        """معالجة الطلب باستخدام Ollama"""
-        try:
-            self.add_to_history("user", prompt)
+    def stream_response(self, prompt: str, use_cache: Optional[bool] = None) -> Iterator[str]:
+        """
+        معالجة الطلب مع إعادة الرد كتدفق من الأجزاء فور وصولها
 
-            response = self.model.chat(
-                model=config.OLLAMA_MODEL,
-                messages=self.get_history_for_api(),
-                stream=False,
-            )
+        تُضاف الرسالة الكاملة المجمعة إلى سجل المحادثة عند انتهاء التدفق.
 
-            assistant_message = response.get("message", {}).get("content", "")
-            self.add_to_history("assistant", assistant_message)
-            return assistant_message
+        Args:
+            prompt: الرسالة المراد معالجتها
+            use_cache: استخدام ذاكرة الردود المؤقتة (None = تلقائياً عند temperature=0)
+
+        Yields:
+            أجزاء الرد النصية بالترتيب
+        """
+        self.add_to_history("user", prompt)
+        parts: List[str] = []
+        messages = self.get_history_for_api()
+        cache_key = self._cache_key(messages) if self._use_cache(use_cache) else None
+        started, clock = time.time(), time.perf_counter()
+
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                self._record("stream", messages, started, clock, cached, cached=True)
+                self.add_to_history("assistant", cached)
+                yield cached
+                return
+
+        usage: Dict[str, int] = {}
+        ttft: Optional[float] = None
+        error: Optional[Exception] = None
+        try:
+            for delta in self.backend.stream(messages, self.max_tokens, self.temperature, usage):
+                if delta:
+                    if ttft is None:
+                        ttft = time.perf_counter() - clock
+                    parts.append(delta)
+                    yield delta
+
+            if cache_key is not None:
+                self.response_cache.put(cache_key, "".join(parts))
 
         except Exception as e:
+            error = e
             error_msg = f"خطأ في معالجة الطلب: {str(e)}"
             print(f"{Fore.RED}{error_msg}{Style.RESET_ALL}")
-            return error_msg
+            if not parts:
+                yield error_msg
+            return
+
+        finally:
+            self._record("stream", messages, started, clock, "".join(parts), usage,
+                         ttft=ttft, error=error)
+            if parts:
+                self.add_to_history("assistant", "".join(parts))
 
-    def process(self, prompt: str) -> str:
+    def get_streamed_response(self, prompt: str, on_token: Callable[[str], None]) -> str:
+        """
+        الحصول على رد مع تمرير كل جزء إلى on_token فور وصوله
+
+        Args:
+            prompt: الرسالة المراد معالجتها
+            on_token: دالة تُستدعى مع كل جزء من الرد
+
+        Returns:
+            الرد الكامل
+        """
+        parts = []
+        for delta in self.stream_response(prompt):
+            on_token(delta)
+            parts.append(delta)
+        return "".join(parts)
+
+    def process(self, prompt: str, use_cache: Optional[bool] = None) -> str:
         """
         معالجة الطلب الأساسي
 
         Args:
             prompt: الرسالة المراد معالجتها
+            use_cache: استخدام ذاكرة الردود المؤقتة (None = تلقائياً عند temperature=0)
 
         Returns:
             الرد من النموذج
         """
-        if self.provider == "groq":
-            return self.process_with_groq(prompt)
-        else:
-            return self.process_with_ollama(prompt)
+        return _submit(self.aprocess(prompt, use_cache))
 
     def clear_history(self):
         """مسح السجل"""
         self.conversation_history.clear()
 
-    def get_response(self, prompt: str) -> str:
+    def get_response(self, prompt: str, use_cache: Optional[bool] = None) -> str:
         """الحصول على رد من النموذج"""
-        return self.process(prompt)
+        return self.process(prompt, use_cache)
@@ -0,0 +1,158 @@
+"""
+سجل عملاء مزودي نماذج اللغة على مستوى العملية
+عميل واحد لكل (مزود، عنوان، مفتاح) يتشارك مجمع اتصالات keep-alive بين جميع الوكلاء
+"""
+import asyncio
+import os
+import sys
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+# إضافة المسار للوصول إلى config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import config
+
+ClientKey = Tuple[str, str, str]
+
+_clients: Dict[ClientKey, Any] = {}
+# httpx.AsyncClient مرتبط بحلقة الأحداث التي أُنشئ فيها، لذا يُحفظ لكل حلقة على حدة
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[ClientKey, Any]]' = \
+    weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _limits():
+    """حدود مجمع الاتصالات المشتركة من الإعدادات (httpx.Limits)"""
+    import httpx
+    return httpx.Limits(
+        max_connections=config.HTTP_POOL_SIZE,
+        max_keepalive_connections=config.HTTP_POOL_SIZE,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+def client_key(provider: str, base_url: Optional[str] = None,
+               api_key: Optional[str] = None) -> ClientKey:
+    """
+    مفتاح العميل في السجل
+
+    Args:
+        provider: مزود الخدمة ("groq" أو "ollama")
+        base_url: عنوان الخادم (None = من الإعدادات)
+        api_key: مفتاح API (None = من الإعدادات)
+
+    Returns:
+        (المزود، العنوان، المفتاح)
+    """
+    if provider == "groq":
+        return (provider, base_url or config.GROQ_BASE_URL, api_key or config.GROQ_API_KEY)
+    if provider == "ollama":
+        return (provider, base_url or config.OLLAMA_BASE_URL, api_key or "")
+    raise ValueError(f"مزود غير معروف: {provider}")
+
+
+def _create(key: ClientKey, is_async: bool) -> Any:
+    """إنشاء عميل جديد بمجمع الاتصالات المشترك"""
+    provider, base_url, api_key = key
+    if provider == "groq":
+        import groq
+        http_client = (groq.DefaultAsyncHttpxClient if is_async else groq.DefaultHttpxClient)(
+            limits=_limits())
+        client_class = groq.AsyncGroq if is_async else groq.Groq
+        return client_class(api_key=api_key, base_url=base_url or None, http_client=http_client)
+
+    import ollama
+    client_class = ollama.AsyncClient if is_async else ollama.Client
+    headers = {'Authorization': f'Bearer {api_key}'} if api_key else None
+    return client_class(host=base_url, headers=headers, limits=_limits())
+
+
+def get_client(provider: str, base_url: Optional[str] = None,
+               api_key: Optional[str] = None) -> Any:
+    """
+    العميل المتزامن المشترك للمزود
+
+    Args:
+        provider: مزود الخدمة
+        base_url: عنوان الخادم (None = من الإعدادات)
+        api_key: مفتاح API (None = من الإعدادات)
+
+    Returns:
+        عميل Groq أو ollama.Client
+    """
+    key = client_key(provider, base_url, api_key)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = _create(key, is_async=False)
+        return client
+
+
+def get_async_client(provider: str, base_url: Optional[str] = None,
+                     api_key: Optional[str] = None) -> Any:
+    """
+    العميل غير المتزامن المشترك للمزود في حلقة الأحداث الحالية
+
+    Args:
+        provider: مزود الخدمة
+        base_url: عنوان الخادم (None = من الإعدادات)
+        api_key: مفتاح API (None = من الإعدادات)
+
+    Returns:
+        عميل AsyncGroq أو ollama.AsyncClient
+    """
+    key = client_key(provider, base_url, api_key)
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = _create(key, is_async=True)
+        return client
+
+
+async def _aclose(clients):
+    """إغلاق عملاء غير متزامنة داخل حلقة الأحداث التي أُنشئت فيها"""
+    for client in clients:
+        try:
+            await client.close()
+        except Exception:
+            pass
+
+
+def close_all(timeout: float = 5.0):
+    """
+    إغلاق جميع العملاء وتفريغ السجل، ثم إيقاف الحلقة الخلفية
+
+    العملاء غير المتزامنة تُغلق بجدولة close() على حلقاتها التي ما زالت تعمل
+    (عادةً حلقة async_runtime) قبل إيقافها.
+
+    Args:
+        timeout: أقصى مدة انتظار لإغلاق العملاء غير المتزامنة في كل حلقة
+    """
+    from agents import async_runtime
+
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+        async_clients = [(loop, list(loop_clients.values()))
+                         for loop, loop_clients in _async_clients.items()]
+        _async_clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    for loop, loop_clients in async_clients:
+        # حلقة متوقفة أو مغلقة لا يمكن تشغيل close() عليها
+        if loop.is_closed() or not loop.is_running():
+            continue
+        future = asyncio.run_coroutine_threadsafe(_aclose(loop_clients), loop)
+        try:
+            future.result(timeout)
+        except Exception:
+            future.cancel()
+    async_runtime.stop(timeout)
@@ -0,0 +1,187 @@
+"""
+مصنف الرسائل بالكلمات المفتاحية
+قواعد قابلة للتعديل من ملف JSON تُترجم إلى تعبير نمطي واحد لكل حقل، فيُمسح كل حقل مرة واحدة
+"""
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple
+
+from colorama import Fore, Style
+
+# إضافة المسار للوصول إلى config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import config
+
+
+class KeywordRule:
+    """قاعدة فئة واحدة: الكلمات المفتاحية لكل حقل، الأولوية، وأدنى درجة"""
+
+    def __init__(self, name: str, keywords: Dict[str, List[str]], priority: int = 0,
+                 min_score: float = 0.0):
+        """
+        تهيئة القاعدة
+
+        Args:
+            name: اسم الفئة
+            keywords: الحقل -> الكلمات المفتاحية فيه
+            priority: الأولوية عند مطابقة أكثر من فئة (الأعلى يفوز)
+            min_score: أدنى درجة لاعتبار الفئة مطابقة (أي تطابق يكفي افتراضياً)
+        """
+        self.name = name
+        self.keywords = keywords
+        self.priority = priority
+        self.min_score = min_score
+
+
+class KeywordClassifier:
+    """
+    مصنف بمرور واحد على كل حقل
+
+    تُجمع الكلمات المفتاحية لجميع الفئات في الحقل نفسه في تعبير نمطي واحد
+    (الأطول أولاً)، وكل تطابق يضيف وزن الحقل إلى درجة كل فئة تملك تلك الكلمة.
+    الفئة الفائزة هي الأعلى أولوية بين الفئات التي بلغت min_score، ثم الأعلى
+    درجة. المطابقة داخل الكلمات (مثل "work" في "homework") كما في السابق.
+    """
+
+    def __init__(self, rules: List[KeywordRule], weights: Optional[Dict[str, float]] = None,
+                 default: str = 'other'):
+        """
+        تهيئة المصنف وترجمة القواعد
+
+        Args:
+            rules: قواعد الفئات
+            weights: وزن التطابق في كل حقل (1.0 للحقول غير المذكورة)
+            default: الفئة عند عدم مطابقة أي قاعدة
+        """
+        self.rules = {rule.name: rule for rule in rules}
+        self.weights = dict(weights or {})
+        self.default = default
+
+        # الحقل -> الكلمة بأحرف صغيرة -> الفئات التي تملكها
+        owners: Dict[str, Dict[str, List[str]]] = {}
+        for rule in rules:
+            for field, words in rule.keywords.items():
+                for word in words:
+                    names = owners.setdefault(field, {}).setdefault(word.lower(), [])
+                    if rule.name not in names:
+                        names.append(rule.name)
+
+        self._fields: List[Tuple[str, Pattern, Dict[str, List[str]], float]] = []
+        for field, words in owners.items():
+            pattern = re.compile('|'.join(re.escape(word) for word in
+                                          sorted(words, key=len, reverse=True)), re.IGNORECASE)
+            self._fields.append((field, pattern, words, self.weights.get(field, 1.0)))
+
+    @property
+    def categories(self) -> List[str]:
+        """أسماء الفئات بترتيب الأولوية، ثم الفئة الافتراضية"""
+        names = sorted(self.rules, key=lambda name: -self.rules[name].priority)
+        return names + ([self.default] if self.default not in self.rules else [])
+
+    @classmethod
+    def from_config(cls, data: Dict[str, Any]) -> 'KeywordClassifier':
+        """
+        إنشاء مصنف من قسم في ملف القواعد
+
+        كل قاعدة تحتوي على name و priority و min_score (اختياري)، و keywords إما
+        قائمة تُطبق على الحقول في fields (افتراضياً جميع الحقول في weights)،
+        أو قاموس الحقل -> قائمة.
+
+        Args:
+            data: القسم بالحقول default و weights و rules
+
+        Returns:
+            المصنف
+        """
+        weights = data.get('weights', {})
+        rules = []
+        for entry in data.get('rules', []):
+            keywords = entry.get('keywords', [])
+            if not isinstance(keywords, dict):
+                keywords = {field: keywords for field in entry.get('fields', list(weights))}
+            rules.append(KeywordRule(entry['name'], keywords, entry.get('priority', 0),
+                                     entry.get('min_score', 0.0)))
+        return cls(rules, weights, data.get('default', 'other'))
+
+    def scores(self, item: Dict[str, Any]) -> Dict[str, float]:
+        """
+        درجة كل فئة مطابقة
+
+        Args:
+            item: قاموس الحقول (رسالة أو {'command': ...})
+
+        Returns:
+            الفئة -> مجموع أوزان تطابقاتها
+        """
+        scores: Dict[str, float] = {}
+        for field, pattern, owners, weight in self._fields:
+            text = item.get(field)
+            if not text:
+                continue
+            for match in pattern.finditer(text):
+                for name in owners.get(match.group().lower(), ()):
+                    scores[name] = scores.get(name, 0.0) + weight
+        return scores
+
+    def classify(self, item: Dict[str, Any]) -> str:
+        """
+        الفئة الفائزة
+
+        Args:
+            item: قاموس الحقول
+
+        Returns:
+            اسم الفئة أو الفئة الافتراضية
+        """
+        best, best_key = self.default, None
+        for name, score in self.scores(item).items():
+            rule = self.rules[name]
+            if score < rule.min_score or score <= 0:
+                continue
+            key = (rule.priority, score)
+            if best_key is None or key > best_key:
+                best, best_key = name, key
+        return best
+
+    def group(self, items: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        تصنيف مجموعة عناصر
+
+        Returns:
+            الفئة -> عناصرها (جميع الفئات موجودة ولو كانت فارغة)
+        """
+        groups: Dict[str, List[Dict[str, Any]]] = {name: [] for name in self.categories}
+        for item in items:
+            groups[self.classify(item)].append(item)
+        return groups
+
+
+_classifiers: Dict[str, KeywordClassifier] = {}
+
+
+def load_classifier(section: str, path: Optional[str] = None) -> KeywordClassifier:
+    """
+    المصنف المبني من قسم في ملف القواعد (يُقرأ الملف ويُترجم مرة واحدة لكل مسار)
+
+    Args:
+        section: اسم القسم ("categories" أو "commands")
+        path: مسار ملف القواعد (None = EMAIL_RULES_FILE)
+
+    Returns:
+        المصنف، أو مصنف بدون قواعد إذا تعذرت قراءة الملف
+    """
+    path = path or config.EMAIL_RULES_FILE
+    key = f"{path}#{section}"
+    classifier = _classifiers.get(key)
+    if classifier is None:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f).get(section, {})
+        except (OSError, ValueError) as e:
+            print(f"{Fore.YELLOW}⚠️  تعذر تحميل قواعد التصنيف من {path}: {e}{Style.RESET_ALL}")
+            data = {}
+        classifier = _classifiers[key] = KeywordClassifier.from_config(data)
+    return classifier
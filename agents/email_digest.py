@@ -0,0 +1,135 @@
+"""
+تلخيص مجموعات الرسائل بأسلوب map-reduce
+تُجمع الرسائل في طلبات بميزانية رموز وتُلخص بالتوازي (map)، ثم تُدمج الملخصات في رد واحد (reduce)
+"""
+import os
+import re
+import sys
+from typing import Any, Dict, List
+
+# إضافة المسار للوصول إلى modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.history import CHARS_PER_TOKEN, MESSAGE_OVERHEAD_TOKENS, estimate_tokens
+
+# سطر ملخص رسالة في رد خطوة map: "[رقم] الملخص"
+_SUMMARY_LINE_RE = re.compile(r'^\s*\[(\d+)\]\s*(.+?)\s*$', re.MULTILINE)
+
+DIGEST_INSTRUCTIONS = """قدم ملخصاً موحداً يتضمن:
+1. أهم المواضيع
+2. الرسائل التي تحتاج إلى رد أو إجراء
+3. المواعيد والأرقام المهمة"""
+
+SENTIMENT_INSTRUCTIONS = """حلل المشاعر العامة في هذه الرسائل وقدم:
+1. المشاعر السائدة (إيجابية/سلبية/محايدة)
+2. المواضيع المشتركة
+3. مستوى الأهمية/الاستعجال"""
+
+# دمج مجموعة من الملخصات قبل خطوة reduce النهائية عندما لا تتسع كلها في طلب واحد
+PARTIAL_INSTRUCTIONS = """ادمج هذه الملخصات في ملخص موجز واحد يحتفظ بالمواضيع والإجراءات
+والمواعيد والأسماء المهمة."""
+
+
+def message_text(message: Dict[str, Any], max_chars: int) -> str:
+    """
+    نص الرسالة المرسل إلى النموذج
+
+    يُستخدم النص الكامل فقط إذا كان محملاً بالفعل، وإلا المقتطف، حتى لا
+    يتطلب التلخيص طلب API لكل رسالة.
+
+    Args:
+        message: الرسالة بصيغة GmailIntegration
+        max_chars: أقصى عدد أحرف من النص
+
+    Returns:
+        المرسل والموضوع والنص
+    """
+    # dict.get لا يحمّل نص GmailMessage الكسول
+    text = dict.get(message, 'body') or message.get('snippet', '')
+    return f"From: {message.get('from', '')}\nSubject: {message.get('subject', '')}\n{text[:max_chars]}"
+
+
+def pack_by_tokens(texts: List[str], budget_tokens: int) -> List[List[int]]:
+    """
+    تجميع النصوص بالترتيب في مجموعات لا تتجاوز ميزانية الرموز
+
+    النص الأكبر من الميزانية وحده يشكل مجموعة مستقلة.
+
+    Args:
+        texts: النصوص
+        budget_tokens: أقصى عدد رموز تقديري لكل مجموعة
+
+    Returns:
+        فهارس النصوص في كل مجموعة
+    """
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and used + tokens > budget_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def truncate_to_tokens(text: str, budget_tokens: int) -> str:
+    """
+    النص مقتطعاً (مع "…") بحيث لا يتجاوز تقديره budget_tokens
+
+    Args:
+        text: النص
+        budget_tokens: أقصى عدد رموز تقديري
+
+    Returns:
+        النص كما هو إذا اتسع، وإلا بدايته
+    """
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    chars = max(1, (budget_tokens - MESSAGE_OVERHEAD_TOKENS) * CHARS_PER_TOKEN - 1)
+    return text[:chars] + '…'
+
+
+def map_prompt(texts: List[str]) -> str:
+    """طلب تلخيص مجموعة رسائل في سطر لكل رسالة"""
+    numbered = "\n\n".join(f"[{i}]\n{text}" for i, text in enumerate(texts, 1))
+    return f"""لخص كل رسالة من الرسائل التالية في جملة واحدة موجزة.
+اكتب سطراً واحداً لكل رسالة بالصيغة: [الرقم] الملخص
+
+{numbered}"""
+
+
+def parse_map_response(response: str, count: int) -> Dict[int, str]:
+    """
+    استخراج ملخصات الرسائل من رد خطوة map
+
+    Args:
+        response: رد النموذج
+        count: عدد الرسائل في الطلب
+
+    Returns:
+        رقم الرسالة (من 1) -> الملخص، للأرقام الصحيحة فقط
+    """
+    if count == 1 and not _SUMMARY_LINE_RE.search(response) and response.strip():
+        # طلب برسالة واحدة: الرد كله هو الملخص حتى لو لم يلتزم بالصيغة
+        return {1: response.strip()}
+    summaries: Dict[int, str] = {}
+    for match in _SUMMARY_LINE_RE.finditer(response):
+        number = int(match.group(1))
+        if 1 <= number <= count and number not in summaries:
+            summaries[number] = match.group(2)
+    return summaries
+
+
+def reduce_prompt(lines: List[str], instructions: str) -> str:
+    """طلب دمج ملخصات الرسائل (أو ملخصات جزئية) حسب instructions"""
+    joined = "\n".join(lines)
+    return f"""فيما يلي ملخصات {len(lines)} من الرسائل أو مجموعات الرسائل:
+
+{joined}
+
+{instructions}"""
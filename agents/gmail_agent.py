@@ -4,31 +4,46 @@ Gmail Agent - وكيل Gmail الذكي
 """
 import sys
 import os
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Callable
 from colorama import Fore, Style
 
 # إضافة المسار للوصول إلى modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agents.brain import BaseAgent
+from agents.email_classifier import load_classifier
+from agents.email_digest import (
+    DIGEST_INSTRUCTIONS, PARTIAL_INSTRUCTIONS, SENTIMENT_INSTRUCTIONS,
+    map_prompt, message_text, pack_by_tokens, parse_map_response, reduce_prompt,
+    truncate_to_tokens,
+)
 from integrations.gmail_integration import GmailIntegration
+from integrations.message_cache import MessageCache
+from config.settings import config
 
 
 class GmailAgent(BaseAgent):
     """وكيل ذكي لإدارة Gmail"""
 
     def __init__(self, credentials_file: str = 'credentials.json',
-                 token_file: str = 'token.pickle'):
+                 token_file: str = 'token.pickle', provider: Optional[str] = None):
         """
         تهيئة وكيل Gmail
 
         Args:
             credentials_file: ملف بيانات اعتماد OAuth 2.0
             token_file: ملف حفظ التوكن
+            provider: مزود الخدمة
         """
-        super().__init__()
-        self.gmail = GmailIntegration(credentials_file, token_file)
+        super().__init__(provider)
+        cache = MessageCache(config.GMAIL_CACHE_DB) if config.GMAIL_CACHE_ENABLED else None
+        self.gmail = GmailIntegration(credentials_file, token_file, cache=cache)
         self.authenticated = False
+        # ملخصات الرسائل عند تعطيل المخزن المحلي
+        self._summaries: Dict[str, str] = {}
+        self._semantic_index = None
+        self._fulltext_index = None
+        self._mailbox_stats = None
 
         # تخصيص System Prompt للوكيل
         self.system_prompt = """أنت وكيل ذكي متخصص في إدارة البريد الإلكتروني على Gmail.
@@ -85,12 +100,79 @@ class GmailAgent(BaseAgent):
 
         return messages
 
+    @property
+    def fulltext_index(self):
+        """فهرس البحث النصي (يُنشأ عند أول استخدام، None إذا كان المخزن أو الفهرس معطلاً)"""
+        if self._fulltext_index is None and self.gmail.cache is not None and config.FULLTEXT_INDEX_ENABLED:
+            from integrations.fulltext_index import FullTextIndex
+            self._fulltext_index = FullTextIndex(config.FULLTEXT_INDEX_DB)
+        return self._fulltext_index
+
+    def build_search_index(self, limit: Optional[int] = None) -> int:
+        """
+        تحميل الصندوق كاملاً إلى المخزن المحلي وفهرسته
+
+        بعدها يُجاب search_emails من الفهرس وحده، وتصل الرسائل الجديدة إليه
+        عبر المزامنة التزايدية للمخزن.
+
+        Args:
+            limit: أقصى عدد رسائل (None = الصندوق كاملاً، ولا يُعد الفهرس كاملاً مع حد)
+
+        Returns:
+            عدد الرسائل المفهرسة
+        """
+        index = self.fulltext_index
+        if index is None or not self.ensure_authenticated():
+            return 0
+
+        print(f"{Fore.CYAN}📚 Building local search index...{Style.RESET_ALL}")
+        self.gmail.ensure_synced()
+        for _ in self.gmail.iter_messages('', page_size=500, limit=limit):
+            pass
+        indexed = index.update_from_cache(self.gmail.cache)
+        if limit is None:
+            index.complete = True
+        print(f"{Fore.GREEN}✅ Indexed {len(index)} messages{Style.RESET_ALL}")
+        return indexed
+
+    def _search_local(self, query: str, max_results: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        البحث في الفهرس النصي المحلي
+
+        Returns:
+            الرسائل المطابقة، أو None إذا كان الفهرس معطلاً أو الاستعلام غير مدعوم محلياً
+        """
+        from integrations.fulltext_index import UnsupportedQuery
+
+        index = self.fulltext_index
+        if index is None:
+            return None
+        self.gmail.ensure_synced()
+        if not len(self.gmail.cache):
+            # أُعيد بناء المخزن (انتهت صلاحية historyId) فلم يعد الفهرس كاملاً
+            index.clear()
+        index.update_from_cache(self.gmail.cache)
+        try:
+            msg_ids = index.search(query, max_results)
+        except UnsupportedQuery:
+            return None
+
+        messages = self.gmail.get_cached_messages(msg_ids)
+        found = {message['id'] for message in messages}
+        index.remove(msg_id for msg_id in msg_ids if msg_id not in found)
+        return messages
+
     def search_emails(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
         """
         البحث في الرسائل
 
+        يُبحث أولاً في الفهرس النصي المحلي. إذا كان الفهرس كاملاً (بعد
+        build_search_index) تكفي نتائجه، وإلا تُطلب بقية النتائج من Gmail API
+        وتُفهرس للمرات القادمة. الاستعلامات بمشغلات لا يدعمها الفهرس (مثل
+        is: و label:) تُرسل إلى Gmail API مباشرة.
+
         Args:
-            query: استعلام البحث
+            query: استعلام البحث بصيغة Gmail
             max_results: عدد النتائج
 
         Returns:
@@ -100,7 +182,15 @@ class GmailAgent(BaseAgent):
             return []
 
         print(f"{Fore.CYAN}🔍 Searching for: {query}{Style.RESET_ALL}")
-        messages = self.gmail.search_messages(query, max_results)
+        messages = self._search_local(query, max_results)
+        if messages is None:
+            messages = self.gmail.search_messages(query, max_results)
+        elif len(messages) < max_results and not self.fulltext_index.complete:
+            # رسائل لم يرها الفهرس بعد
+            seen = {message['id'] for message in messages}
+            remote = self.gmail.search_messages(query, max_results)
+            messages += [message for message in remote if message['id'] not in seen]
+            messages = messages[:max_results]
 
         if messages:
             print(f"{Fore.GREEN}✅ Found {len(messages)} messages{Style.RESET_ALL}")
@@ -109,6 +199,45 @@ class GmailAgent(BaseAgent):
 
         return messages
 
+    @property
+    def semantic_index(self):
+        """فهرس البحث الدلالي (يُنشأ عند أول استخدام، None إذا كان المخزن أو الفهرس معطلاً)"""
+        if self._semantic_index is None and self.gmail.cache is not None and config.SEMANTIC_INDEX_ENABLED:
+            # NumPy يُستورد هنا فقط حتى لا يبطئ بدء التشغيل
+            from integrations.semantic_index import SemanticIndex
+            self._semantic_index = SemanticIndex(config.SEMANTIC_INDEX_DIR or None)
+        return self._semantic_index
+
+    def semantic_search(self, query: str, max_results: int = 10) -> List[Dict[str, Any]]:
+        """
+        بحث دلالي محلي في الرسائل المخزنة بدون شبكة
+
+        يُحدّث الفهرس أولاً بالرسائل التي وصلت إلى المخزن منذ آخر بحث.
+
+        Args:
+            query: نص البحث بلغة طبيعية
+            max_results: عدد النتائج
+
+        Returns:
+            الرسائل الأقرب إلى الاستعلام، مع 'score' لكل منها
+        """
+        index = self.semantic_index
+        if index is None:
+            print(f"{Fore.YELLOW}ℹ️  Semantic search needs the local message cache{Style.RESET_ALL}")
+            return []
+
+        index.update_from_cache(self.gmail.cache)
+        hits = index.search(query, max_results)
+        # رسائل حُذفت من المخزن بعد فهرستها
+        messages = self.gmail.get_cached_messages([msg_id for msg_id, _ in hits])
+        found = {message['id'] for message in messages}
+        index.remove(msg_id for msg_id, _ in hits if msg_id not in found)
+
+        scores = dict(hits)
+        for message in messages:
+            message['score'] = scores[message['id']]
+        return messages
+
     def get_email_by_id(self, msg_id: str) -> Optional[Dict[str, Any]]:
         """
         الحصول على رسالة معينة
@@ -139,7 +268,7 @@ class GmailAgent(BaseAgent):
         if not self.ensure_authenticated():
             return "Failed to authenticate"
 
-        message = self.gmail.get_message(msg_id)
+        message = self.gmail.get_message(msg_id, format='full')
         if not message:
             return "Failed to retrieve message"
 
@@ -157,36 +286,107 @@ class GmailAgent(BaseAgent):
 2. النقاط المهمة
 3. أي إجراءات مطلوبة"""
 
-        return self.get_response(prompt)
+        # الملخص لا يعتمد على سجل المحادثة، فنعيد استخدام الرد المخزن لنفس الرسالة
+        try:
+            return self.complete([{"role": "user", "content": prompt}], use_cache=True)
+        except Exception as e:
+            return f"خطأ في معالجة الطلب: {str(e)}"
 
-    def analyze_emails_sentiment(self, messages: List[Dict[str, Any]]) -> str:
+    def summarize_messages(self, messages: List[Dict[str, Any]]) -> Dict[str, str]:
         """
-        تحليل المشاعر في مجموعة من الرسائل
+        ملخص سطر واحد لكل رسالة (خطوة map)
+
+        الملخصات محفوظة حسب معرف الرسالة، فلا تُرسل إلى النموذج إلا الرسائل
+        الجديدة. تُجمع هذه الرسائل في طلبات لا تتجاوز GMAIL_DIGEST_CHUNK_TOKENS
+        وتُرسل جميع الطلبات معاً.
 
         Args:
             messages: قائمة الرسائل
 
         Returns:
-            تحليل المشاعر
+            معرف الرسالة -> الملخص (المقتطف إذا لم يُرجع النموذج ملخصاً لها)
+        """
+        cache = self.gmail.cache
+        ids = [msg['id'] for msg in messages]
+        summaries = (cache.get_summaries(ids) if cache is not None
+                     else {i: self._summaries[i] for i in ids if i in self._summaries})
+
+        missing = [msg for msg in messages if msg['id'] not in summaries]
+        if missing:
+            texts = [message_text(msg, config.GMAIL_DIGEST_MESSAGE_CHARS) for msg in missing]
+            chunks = pack_by_tokens(texts, config.GMAIL_DIGEST_CHUNK_TOKENS)
+            responses = self.complete_many([
+                [{"role": "user", "content": map_prompt([texts[i] for i in chunk])}]
+                for chunk in chunks
+            ])
+
+            fresh: Dict[str, str] = {}
+            for chunk, response in zip(chunks, responses):
+                parsed = parse_map_response(response, len(chunk))
+                for number, i in enumerate(chunk, 1):
+                    if number in parsed:
+                        fresh[missing[i]['id']] = parsed[number]
+            if cache is not None:
+                cache.put_summaries(fresh)
+            else:
+                self._summaries.update(fresh)
+            summaries.update(fresh)
+
+        return {msg['id']: summaries.get(msg['id']) or msg.get('snippet', '') for msg in messages}
+
+    def digest_emails(self, messages: List[Dict[str, Any]],
+                      instructions: str = DIGEST_INSTRUCTIONS) -> str:
+        """
+        ملخص موحد لمجموعة رسائل بأسلوب map-reduce
+
+        تُلخص الرسائل أولاً (summarize_messages)، ثم تُدمج ملخصاتها. إذا لم
+        تتسع الملخصات في طلب واحد تُدمج على مراحل: كل مجموعة في طلب، بالتوازي.
+        كل سطر يُقتطع إلى نصف الميزانية، فتتسع كل مجموعة لسطرين على الأقل ويقل
+        عدد الأسطر في كل مرحلة.
+
+        Args:
+            messages: قائمة الرسائل
+            instructions: المطلوب من خطوة الدمج النهائية
+
+        Returns:
+            الملخص الموحد
         """
         if not messages:
             return "No messages to analyze"
 
-        emails_text = "\n\n".join([
-            f"From: {msg['from']}\nSubject: {msg['subject']}\nSnippet: {msg['snippet']}"
-            for msg in messages[:5]  # تحليل أول 5 رسائل
-        ])
+        try:
+            summaries = self.summarize_messages(messages)
+            lines = [f"- {msg['from']} | {msg['subject']}: {summaries[msg['id']]}"
+                     for msg in messages]
+
+            budget = config.GMAIL_DIGEST_CHUNK_TOKENS
+            while True:
+                lines = [truncate_to_tokens(line, budget // 2) for line in lines]
+                chunks = pack_by_tokens(lines, budget)
+                # ميزانية أصغر من أقصر سطر ممكن: لا يمكن الدمج أكثر
+                if len(chunks) == 1 or len(chunks) == len(lines):
+                    break
+                lines = self.complete_many([
+                    [{"role": "user", "content": reduce_prompt([lines[i] for i in chunk],
+                                                               PARTIAL_INSTRUCTIONS)}]
+                    for chunk in chunks
+                ])
+
+            return self.complete([{"role": "user", "content": reduce_prompt(lines, instructions)}])
+        except Exception as e:
+            return f"خطأ في معالجة الطلب: {str(e)}"
 
-        prompt = f"""حلل المشاعر العامة في هذه الرسائل:
-
-{emails_text}
+    def analyze_emails_sentiment(self, messages: List[Dict[str, Any]]) -> str:
+        """
+        تحليل المشاعر في مجموعة من الرسائل
 
-قدم:
-1. المشاعر السائدة (إيجابية/سلبية/محايدة)
-2. المواضيع المشتركة
-3. مستوى الأهمية/الاستعجال"""
+        Args:
+            messages: قائمة الرسائل (جميعها، عبر digest_emails)
 
-        return self.get_response(prompt)
+        Returns:
+            تحليل المشاعر
+        """
+        return self.digest_emails(messages, SENTIMENT_INSTRUCTIONS)
 
     def categorize_emails(self, messages: List[Dict[str, Any]]) -> Dict[str, List[Dict]]:
         """
@@ -198,36 +398,14 @@ class GmailAgent(BaseAgent):
         Returns:
             رسائل مصنفة
         """
-        categories = {
-            'urgent': [],
-            'work': [],
-            'personal': [],
-            'newsletters': [],
-            'spam': [],
-            'other': []
-        }
-
-        for msg in messages:
-            subject = msg['subject'].lower()
-            sender = msg['from'].lower()
-            snippet = msg['snippet'].lower()
-
-            # تصنيف بسيط
-            if any(word in subject or word in snippet for word in ['urgent', 'important', 'asap', 'عاجل', 'مهم']):
-                categories['urgent'].append(msg)
-            elif any(word in subject or word in snippet for word in ['meeting', 'project', 'work', 'عمل', 'اجتماع']):
-                categories['work'].append(msg)
-            elif 'unsubscribe' in sender or 'newsletter' in subject:
-                categories['newsletters'].append(msg)
-            else:
-                categories['other'].append(msg)
-
-        return categories
+        # القواعد من EMAIL_RULES_FILE (القسم categories) مترجمة إلى مرور واحد لكل حقل
+        return load_classifier('categories').group(messages)
 
     # ================== كتابة وإرسال البريد ==================
 
     def compose_email_with_ai(self, to: str, subject: str, context: str,
-                             tone: str = 'professional') -> str:
+                             tone: str = 'professional',
+                             on_token: Optional[Callable[[str], None]] = None) -> str:
         """
         صياغة رسالة بالذكاء الاصطناعي
 
@@ -236,6 +414,7 @@ class GmailAgent(BaseAgent):
             subject: الموضوع
             context: السياق أو المحتوى المطلوب
             tone: نبرة الرسالة (professional, friendly, formal)
+            on_token: دالة تُستدعى مع كل جزء من النص فور وصوله (عرض تدفقي)
 
         Returns:
             نص الرسالة
@@ -260,6 +439,8 @@ class GmailAgent(BaseAgent):
 - خاتمة مهذبة
 - توقيع بسيط"""
 
+        if on_token:
+            return self.get_streamed_response(prompt, on_token)
         return self.get_response(prompt)
 
     def send_email(self, to: str, subject: str, body: str,
@@ -299,7 +480,7 @@ class GmailAgent(BaseAgent):
         if not self.ensure_authenticated():
             return False
 
-        message = self.gmail.get_message(msg_id)
+        message = self.gmail.get_message(msg_id, format='full')
         if not message:
             return False
 
@@ -322,10 +503,17 @@ class GmailAgent(BaseAgent):
 
     # ================== إدارة متقدمة ==================
 
-    def smart_inbox_cleanup(self) -> Dict[str, int]:
+    def smart_inbox_cleanup(self, older_than_days: int = 30) -> Dict[str, int]:
         """
         تنظيف ذكي للبريد الوارد
 
+        ينقل البريد الترويجي (category:promotions) الأقدم من older_than_days إلى
+        المهملات. المعرفات تُجمع أولاً ثم تُنقل دفعة واحدة، لأن النقل أثناء المرور
+        على الصفحات يُقلّص نتائج البحث فتتخطى رموز الصفحات بعض الرسائل.
+
+        Args:
+            older_than_days: عمر الرسائل بالأيام قبل اعتبارها قديمة
+
         Returns:
             إحصائيات التنظيف
         """
@@ -334,26 +522,40 @@ class GmailAgent(BaseAgent):
 
         print(f"{Fore.CYAN}🧹 Starting smart inbox cleanup...{Style.RESET_ALL}")
 
-        # جلب رسائل النشرات والبريد الترويجي
-        newsletters = self.gmail.search_messages('category:promotions OR unsubscribe', max_results=50)
-
         stats = {
-            'newsletters_found': len(newsletters),
+            'newsletters_found': 0,
             'moved_to_trash': 0,
+            'failed': 0,
         }
 
-        # نقل الرسائل القديمة إلى المهملات
-        for msg in newsletters:
-            # يمكن إضافة منطق أكثر ذكاءً هنا
-            pass
+        query = f'category:promotions older_than:{older_than_days}d -in:trash'
+        msg_ids = [msg['id'] for msg in
+                   self.gmail.iter_messages(query, page_size=500, fetch_details=False)]
+        stats['newsletters_found'] = len(msg_ids)
+
+        for result in self.gmail.batch_delete_messages(msg_ids):
+            key = 'moved_to_trash' if result['success'] else 'failed'
+            stats[key] += len(result['ids'])
 
         print(f"{Fore.GREEN}✅ Cleanup completed!{Style.RESET_ALL}")
         return stats
 
+    @property
+    def mailbox_stats(self):
+        """لقطة إحصائيات الصندوق (تُنشأ عند أول استخدام، None إذا كان المخزن معطلاً)"""
+        if self._mailbox_stats is None and self.gmail.cache is not None:
+            from integrations.mailbox_stats import MailboxStats
+            self._mailbox_stats = MailboxStats(load_classifier('categories').classify)
+        return self._mailbox_stats
+
     def get_email_statistics(self) -> Dict[str, Any]:
         """
         الحصول على إحصائيات البريد
 
+        مع المخزن المحلي تُحسب الإحصائيات التفصيلية (أكثر المرسلين، البريد اليومي،
+        غير المقروءة حسب التصنيف والفئة، زمن الرد) من لقطة الرسائل المخزنة، وتصلها
+        الرسائل الجديدة بالمزامنة التزايدية فقط. build_search_index يوسعها للصندوق كاملاً.
+
         Returns:
             قاموس بالإحصائيات
         """
@@ -362,7 +564,14 @@ class GmailAgent(BaseAgent):
 
         stats = self.gmail.get_statistics()
 
-        # إضافة تحليل إضافي
+        snapshot = self.mailbox_stats
+        if snapshot is not None:
+            self.gmail.ensure_synced()
+            snapshot.update_from_cache(self.gmail.cache)
+            stats.update(snapshot.summary())
+            return stats
+
+        # بدون مخزن محلي: تصنيف آخر 100 رسالة غير مقروءة
         unread = self.gmail.get_unread_messages(max_results=100)
         if unread:
             categories = self.categorize_emails(unread)
@@ -408,9 +617,11 @@ class GmailAgent(BaseAgent):
             النتيجة
         """
         command_lower = command.lower()
+        # نوع الأمر من القسم commands في EMAIL_RULES_FILE
+        intent = load_classifier('commands').classify({'command': command})
 
         # أوامر القراءة
-        if any(word in command_lower for word in ['اقرأ', 'عرض', 'أظهر', 'read', 'show']):
+        if intent == 'read':
             if 'غير مقروء' in command_lower or 'unread' in command_lower:
                 messages = self.read_unread_emails(10)
                 if messages:
@@ -421,18 +632,18 @@ class GmailAgent(BaseAgent):
                 return "No unread messages"
 
         # أوامر التلخيص
-        elif any(word in command_lower for word in ['لخص', 'summarize', 'summary']):
+        elif intent == 'summarize':
             messages = self.read_unread_emails(5)
             if messages:
-                return self.analyze_emails_sentiment(messages)
+                return self.digest_emails(messages)
             return "No messages to summarize"
 
         # أوامر الإرسال
-        elif any(word in command_lower for word in ['أرسل', 'send', 'اكتب', 'write']):
+        elif intent == 'send':
             return "Please use the compose_email_with_ai() method or provide: recipient, subject, and context"
 
         # أوامر البحث
-        elif any(word in command_lower for word in ['ابحث', 'search', 'find']):
+        elif intent == 'search':
             # استخراج مصطلح البحث
             query = command.split('عن')[-1].strip() if 'عن' in command else command
             messages = self.search_emails(query, 10)
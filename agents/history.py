@@ -0,0 +1,159 @@
+"""
+إدارة سجل المحادثة بميزانية رموز محددة
+نافذة منزلقة للرسائل الحديثة مع طي الرسائل القديمة في ملخص مخزن
+"""
+from typing import Callable, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field
+
+# تكلفة ثابتة تقريبية لكل رسالة (الدور والفواصل في قالب المحادثة)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# متوسط تقريبي لعدد الأحرف لكل رمز (العربية أقل كثافة من الإنجليزية)
+CHARS_PER_TOKEN = 3
+
+SUMMARY_PREFIX = "ملخص المحادثة السابقة:\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    تقدير عدد الرموز في نص بدون الحاجة إلى tokenizer الخاص بالنموذج
+
+    Args:
+        text: النص
+
+    Returns:
+        عدد الرموز التقريبي بما فيه تكلفة الرسالة الثابتة
+    """
+    return -(-len(text) // CHARS_PER_TOKEN) + MESSAGE_OVERHEAD_TOKENS
+
+
+class Message(BaseModel):
+    """نموذج الرسالة"""
+    role: str  # "user" أو "assistant" أو "system"
+    content: str
+    tokens: int = Field(default=0, description="عدد الرموز التقريبي، يُحسب مرة واحدة عند الإنشاء")
+
+    def model_post_init(self, __context) -> None:
+        if not self.tokens:
+            self.tokens = estimate_tokens(self.content)
+
+
+def summarize_locally(messages: List[Message], previous_summary: Optional[str],
+                      max_tokens: int) -> str:
+    """
+    ملخص استخراجي سريع بدون استدعاء النموذج
+
+    يحتفظ بأول جزء من كل رسالة مطوية، ويحذف الأسطر الأقدم إذا تجاوز الملخص max_tokens.
+
+    Args:
+        messages: الرسائل المطوية حديثاً
+        previous_summary: الملخص السابق إن وُجد
+        max_tokens: الحد الأقصى لحجم الملخص
+
+    Returns:
+        نص الملخص
+    """
+    lines = previous_summary.splitlines() if previous_summary else []
+    for message in messages:
+        text = " ".join(message.content.split())
+        lines.append(f"- {message.role}: {text[:200]}{'…' if len(text) > 200 else ''}")
+
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    total = sum(len(line) + 1 for line in lines)
+    while len(lines) > 1 and total > max_chars:
+        total -= len(lines.pop(0)) + 1
+    return "\n".join(lines)
+
+
+class ConversationHistory:
+    """
+    سجل محادثة بميزانية رموز
+
+    يُحتفظ بعدد الرموز الكلي بشكل تزايدي. عند تجاوز الميزانية تُطوى أقدم
+    الرسائل في رسالة ملخص واحدة تُرسل في بداية السجل، ولا يُعاد حساب
+    الملخص إلا عند طي رسائل جديدة.
+    """
+
+    def __init__(self, budget_tokens: int, keep_recent: int = 4,
+                 summarizer: Optional[Callable[[List[Message], Optional[str], int], str]] = None,
+                 summary_ratio: float = 0.25):
+        """
+        تهيئة السجل
+
+        Args:
+            budget_tokens: الحد الأقصى لرموز السجل المرسل (الملخص + النافذة)
+            keep_recent: أقل عدد من الرسائل الحديثة التي لا تُطوى أبداً
+            summarizer: دالة (الرسائل المطوية، الملخص السابق، الحد الأقصى) -> ملخص جديد
+            summary_ratio: نسبة الميزانية المخصصة للملخص
+        """
+        self.budget_tokens = budget_tokens
+        self.keep_recent = keep_recent
+        self.summarizer = summarizer or summarize_locally
+        self.summary_budget = max(1, int(budget_tokens * summary_ratio))
+        self._messages: List[Message] = []
+        self._summary: Optional[Message] = None
+        self._window_tokens = 0
+
+    # ================== واجهة شبيهة بالقائمة ==================
+
+    def append(self, message: Message):
+        """إضافة رسالة ثم ضغط السجل إذا تجاوز الميزانية"""
+        self._messages.append(message)
+        self._window_tokens += message.tokens
+        self._compact()
+
+    def clear(self):
+        """مسح السجل والملخص"""
+        self._messages.clear()
+        self._summary = None
+        self._window_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+    # ================== الميزانية والضغط ==================
+
+    @property
+    def summary(self) -> Optional[str]:
+        """نص الملخص الحالي للرسائل المطوية"""
+        return self._summary.content[len(SUMMARY_PREFIX):] if self._summary else None
+
+    @property
+    def total_tokens(self) -> int:
+        """عدد رموز السجل المرسل (الملخص + النافذة)"""
+        return self._window_tokens + (self._summary.tokens if self._summary else 0)
+
+    def _compact(self):
+        """طي أقدم الرسائل في الملخص حتى يعود السجل ضمن الميزانية"""
+        if self.total_tokens <= self.budget_tokens or len(self._messages) <= self.keep_recent:
+            return
+
+        folded: List[Message] = []
+        while (len(self._messages) > self.keep_recent
+               and self._window_tokens + self.summary_budget > self.budget_tokens):
+            message = self._messages.pop(0)
+            self._window_tokens -= message.tokens
+            folded.append(message)
+
+        # نبدأ النافذة دائماً برسالة من المستخدم
+        while len(self._messages) > 1 and self._messages[0].role != "user":
+            message = self._messages.pop(0)
+            self._window_tokens -= message.tokens
+            folded.append(message)
+
+        if folded:
+            text = self.summarizer(folded, self.summary, self.summary_budget)
+            self._summary = Message(role="system", content=SUMMARY_PREFIX + text)
+
+    def to_api(self) -> List[Dict[str, str]]:
+        """السجل بصيغة API: الملخص (إن وُجد) ثم النافذة الحديثة"""
+        messages = [self._summary] if self._summary else []
+        messages.extend(self._messages)
+        return [{"role": msg.role, "content": msg.content} for msg in messages]
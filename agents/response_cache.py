@@ -0,0 +1,205 @@
+"""
+ذاكرة تخزين مؤقت لردود نموذج اللغة
+طبقة LRU في الذاكرة مع طبقة SQLite اختيارية بمدة صلاحية وحد للحجم
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# إضافة المسار للوصول إلى config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import config
+
+
+def make_cache_key(provider: str, model: str, temperature: float, max_tokens: int,
+                   messages: List[Dict[str, str]]) -> str:
+    """
+    مفتاح ثابت لطلب نموذج اللغة
+
+    Args:
+        provider: مزود الخدمة
+        model: اسم النموذج
+        temperature: درجة الحرارة
+        max_tokens: الحد الأقصى للرموز
+        messages: الرسائل بصيغة API
+
+    Returns:
+        بصمة SHA-256 بصيغة hex
+    """
+    payload = json.dumps(
+        [provider, model, temperature, max_tokens, messages],
+        ensure_ascii=False, separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """ذاكرة مؤقتة للردود من طبقتين مع عدادات الإصابة والإخفاق"""
+
+    def __init__(self, max_entries: int = 256, db_path: Optional[str] = None,
+                 ttl: Optional[float] = None, max_db_entries: int = 10000):
+        """
+        تهيئة الذاكرة المؤقتة
+
+        Args:
+            max_entries: عدد الردود في طبقة LRU بالذاكرة
+            db_path: مسار قاعدة SQLite للطبقة الدائمة (None = بدون طبقة دائمة)
+            ttl: مدة صلاحية الرد بالثواني (None = بلا انتهاء)
+            max_db_entries: الحد الأقصى لعدد الردود في الطبقة الدائمة
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_db_entries = max_db_entries
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._memory: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes_since_evict = 0
+
+        if db_path:
+            if db_path != ':memory:' and os.path.dirname(db_path):
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            with self._conn:
+                self._conn.execute('''
+                    CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY,
+                        response TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                ''')
+                self._conn.execute(
+                    'CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)'
+                )
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        البحث عن رد مخزن
+
+        Args:
+            key: مفتاح الطلب من make_cache_key
+
+        Returns:
+            الرد المخزن أو None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, created_at = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return response
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    'SELECT response, created_at FROM responses WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    with self._conn:
+                        self._conn.execute(
+                            'UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key)
+                        )
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str):
+        """
+        حفظ رد في الطبقتين
+
+        Args:
+            key: مفتاح الطلب
+            response: نص الرد
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            if self._conn is None:
+                return
+            with self._conn:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    (key, response, now, now),
+                )
+            # الإزالة حسب الحجم والصلاحية دورياً بدلاً من كل كتابة
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= 100:
+                self._evict(now)
+
+    def _remember(self, key: str, response: str, created_at: float):
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float):
+        """حذف الردود المنتهية والأقل استخداماً من الطبقة الدائمة"""
+        self._writes_since_evict = 0
+        with self._conn:
+            if self.ttl is not None:
+                self._conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl,))
+            self._conn.execute('''
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.max_db_entries,))
+
+    def clear(self):
+        """مسح جميع الردود وتصفير العدادات"""
+        with self._lock:
+            self._memory.clear()
+            self.hits = self.misses = self.disk_hits = 0
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute('DELETE FROM responses')
+
+    def stats(self) -> Dict[str, Any]:
+        """عدادات الإصابة والإخفاق"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'disk_hits': self.disk_hits,
+            'hit_rate': self.hits / total if total else 0.0,
+            'memory_entries': len(self._memory),
+        }
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> ResponseCache:
+    """الذاكرة المؤقتة المشتركة بين جميع الوكلاء في العملية، مبنية من الإعدادات"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache(
+                max_entries=config.RESPONSE_CACHE_SIZE,
+                db_path=config.RESPONSE_CACHE_DB or None,
+                ttl=config.RESPONSE_CACHE_TTL or None,
+                max_db_entries=config.RESPONSE_CACHE_MAX_DB_ENTRIES,
+            )
+        return _default_cache
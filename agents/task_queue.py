@@ -0,0 +1,158 @@
+"""
+طابور أولويات المهام
+كومة (heap) بترتيب FIFO داخل نفس الأولوية، مع حذف كسول وعدادات حالات محدّثة
+"""
+import heapq
+import itertools
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class TaskQueue:
+    """
+    طابور أولويات للمهام المعلقة
+
+    كل مدخل في الكومة هو (-الأولوية، رقم تسلسلي، معرف المهمة). عند تغير حالة
+    المهمة أو أولويتها لا يُحذف مدخلها من الكومة، بل يُتجاهل عند وصوله إلى
+    القمة إذا لم يعد مطابقاً للمدخل الحالي للمهمة (حذف كسول). يُبلغ كل Task
+    الطابور بتغير حالته، فتبقى عدادات الحالات محدّثة دون مسح المهام.
+    """
+
+    def __init__(self, pending_status: Any):
+        """
+        تهيئة طابور فارغ
+
+        Args:
+            pending_status: قيمة الحالة التي تعني أن المهمة بانتظار التنفيذ
+        """
+        self.pending_status = pending_status
+        self._heap: List[list] = []
+        self._entries: Dict[str, list] = {}  # المدخل الحالي لكل مهمة معلقة في الكومة
+        self._tasks: Dict[str, Any] = {}
+        self._counts: Counter = Counter()
+        self._seq = itertools.count()
+        self._sorted: Optional[List[Any]] = None
+        self._lock = threading.RLock()
+
+    # ================== الإضافة والإزالة ==================
+
+    def add(self, task: Any):
+        """
+        إضافة مهمة إلى الطابور (أو استبدال مهمة بنفس المعرف)
+
+        Args:
+            task: كائن Task
+        """
+        with self._lock:
+            if task.task_id in self._tasks:
+                self.remove(task.task_id)
+            self._tasks[task.task_id] = task
+            self._counts[task.status] += 1
+            task._listener = self._on_change
+            self._push(task)
+            self._sorted = None
+
+    def remove(self, task_id: str) -> Optional[Any]:
+        """
+        إزالة مهمة من الطابور نهائياً
+
+        Args:
+            task_id: معرف المهمة
+
+        Returns:
+            المهمة المزالة أو None
+        """
+        with self._lock:
+            task = self._tasks.pop(task_id, None)
+            if task is None:
+                return None
+            task._listener = None
+            self._counts[task.status] -= 1
+            self._entries.pop(task_id, None)
+            self._sorted = None
+            return task
+
+    def _push(self, task: Any):
+        """إضافة مدخل جديد للمهمة المعلقة؛ أي مدخل سابق لها يصبح قديماً"""
+        if task.status != self.pending_status:
+            self._entries.pop(task.task_id, None)
+            return
+        entry = [-task.priority, next(self._seq), task.task_id]
+        self._entries[task.task_id] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _on_change(self, task: Any, field: str, old: Any, new: Any):
+        """يُستدعى من Task عند تغير الحالة أو الأولوية"""
+        with self._lock:
+            if field == 'status':
+                self._counts[old] -= 1
+                self._counts[new] += 1
+                self._push(task)
+            elif field == 'priority':
+                self._sorted = None
+                if task.task_id in self._entries:
+                    self._push(task)
+
+    # ================== القراءة ==================
+
+    def _prune(self):
+        """إزالة المدخلات القديمة من قمة الكومة"""
+        heap = self._heap
+        while heap and self._entries.get(heap[0][2]) is not heap[0]:
+            heapq.heappop(heap)
+
+    def peek(self) -> Optional[Any]:
+        """المهمة المعلقة التالية حسب الأولوية دون إزالتها"""
+        with self._lock:
+            self._prune()
+            return self._tasks[self._heap[0][2]] if self._heap else None
+
+    def pop(self) -> Optional[Any]:
+        """
+        سحب المهمة المعلقة التالية من الطابور
+
+        تبقى المهمة بحالتها حتى يبدأ تنفيذها، لكنها لا تُعاد مرة أخرى
+        إلا إذا أُعيدت إلى حالة الانتظار.
+        """
+        with self._lock:
+            self._prune()
+            if not self._heap:
+                return None
+            entry = heapq.heappop(self._heap)
+            del self._entries[entry[2]]
+            return self._tasks[entry[2]]
+
+    def drain(self) -> Iterator[Any]:
+        """سحب جميع المهام المعلقة بترتيب الأولوية"""
+        while True:
+            task = self.pop()
+            if task is None:
+                return
+            yield task
+
+    def sorted_tasks(self) -> List[Any]:
+        """
+        جميع المهام مرتبة حسب الأولوية (تنازلياً) ثم ترتيب الإضافة
+
+        تُحفظ النتيجة حتى تُضاف مهمة أو تتغير أولوية.
+        """
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = sorted(self._tasks.values(), key=lambda t: -t.priority)
+            return list(self._sorted)
+
+    def count(self, status: Any) -> int:
+        """عدد المهام في حالة معينة"""
+        return self._counts[status]
+
+    @property
+    def pending(self) -> int:
+        """عدد المهام المعلقة في الطابور"""
+        return len(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._tasks
@@ -0,0 +1,182 @@
+"""
+مخزن المهام الدائم
+يحفظ طابور المهام ونتائجها في SQLite (وضع WAL) ليستأنف الوكيل العمل بعد التوقف
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List
+
+# حالات TaskStatus التي لا تبقى في task_queue
+FINISHED_STATUSES = ('COMPLETED', 'FAILED')
+
+
+class TaskStore:
+    """
+    مخزن SQLite لمهام TasksAgent
+
+    تُجمع التحديثات في الذاكرة وتُكتب دفعة واحدة في معاملة واحدة عند امتلاء
+    الدفعة أو مرور flush_interval أو عند استدعاء flush. المهام المنتهية تُنقل
+    من task_queue إلى جدول tasks_history، فلا يستعيد الوكيل إلا المهام غير المنتهية.
+    """
+
+    def __init__(self, db_path: str = 'data/tasks.db', batch_size: int = 50,
+                 flush_interval: float = 1.0):
+        """
+        تهيئة المخزن
+
+        Args:
+            db_path: مسار قاعدة البيانات (':memory:' للتخزين في الذاكرة فقط)
+            batch_size: عدد التحديثات المتراكمة قبل الكتابة
+            flush_interval: أقصى مدة بالثواني قبل كتابة التحديثات المتراكمة
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if db_path != ':memory:' and os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, tuple] = {}
+        self._finished: Dict[str, None] = {}
+        self._history: List[tuple] = []
+        self._last_flush = time.monotonic()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        """إنشاء الجداول إن لم تكن موجودة"""
+        with self._lock, self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS task_queue (
+                    task_id TEXT PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    latency REAL,
+                    seq INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_task_queue_status ON task_queue(status, seq)'
+            )
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS tasks_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    description TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    completed_at DATETIME
+                )
+            ''')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks_history(status, created_at DESC)'
+            )
+            # مهام منتهية بقيت في الطابور من إصدارات سابقة
+            self._conn.execute('DELETE FROM task_queue WHERE status IN (?, ?)', FINISHED_STATUSES)
+            row = self._conn.execute('SELECT MAX(seq) FROM task_queue').fetchone()
+        self._seq = (row[0] or 0) + 1
+
+    # ================== كتابة ==================
+
+    def save(self, task: Any, finished: bool = False):
+        """
+        تسجيل الحالة الحالية لمهمة (تُكتب مع الدفعة التالية)
+
+        Args:
+            task: كائن Task
+            finished: هل انتهت المهمة (تُضاف إلى tasks_history وتُحذف من الطابور)
+        """
+        now = time.time()
+        with self._lock:
+            seq = getattr(task, '_seq', None)
+            if seq is None:
+                seq = task._seq = self._seq
+                self._seq += 1
+            self._pending[task.task_id] = (
+                task.task_id, task.description, task.priority, task.status.name,
+                task.result, task.latency, seq, now,
+            )
+            self._finished.pop(task.task_id, None)
+            if finished:
+                self._pending.pop(task.task_id)
+                self._finished[task.task_id] = None
+                self._history.append((task.description, 'task', task.status.name,
+                                      task.result, time.strftime('%Y-%m-%d %H:%M:%S')))
+            due = (len(self._pending) + len(self._history) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """كتابة جميع التحديثات المتراكمة في معاملة واحدة"""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending and not self._history and not self._finished:
+                return
+            rows, history = list(self._pending.values()), self._history
+            finished = [(task_id,) for task_id in self._finished]
+            self._pending, self._history, self._finished = {}, [], {}
+            with self._conn:
+                self._conn.executemany('''
+                    INSERT INTO task_queue (task_id, description, priority, status,
+                                            result, latency, seq, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(task_id) DO UPDATE SET
+                        description = excluded.description,
+                        priority = excluded.priority,
+                        status = excluded.status,
+                        result = excluded.result,
+                        latency = excluded.latency,
+                        updated_at = excluded.updated_at
+                ''', rows)
+                self._conn.executemany(
+                    'INSERT INTO tasks_history (description, type, status, result, completed_at) '
+                    'VALUES (?, ?, ?, ?, ?)', history
+                )
+                self._conn.executemany('DELETE FROM task_queue WHERE task_id = ?', finished)
+
+    def delete(self, task_id: str):
+        """حذف مهمة من الطابور الدائم"""
+        with self._lock, self._conn:
+            self._pending.pop(task_id, None)
+            self._finished.pop(task_id, None)
+            self._conn.execute('DELETE FROM task_queue WHERE task_id = ?', (task_id,))
+
+    def clear(self):
+        """مسح طابور المهام (يبقى tasks_history كما هو)"""
+        with self._lock, self._conn:
+            self._pending.clear()
+            self._finished.clear()
+            self._conn.execute('DELETE FROM task_queue')
+
+    # ================== قراءة ==================
+
+    def load(self) -> List[Dict[str, Any]]:
+        """
+        قراءة المهام غير المنتهية المحفوظة بترتيب إضافتها
+
+        Returns:
+            قائمة قواميس بحقول المهمة، والحالة باسم عضو TaskStatus
+        """
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT task_id, description, priority, status, result, latency, seq '
+                'FROM task_queue ORDER BY seq'
+            ).fetchall()
+        keys = ('task_id', 'description', 'priority', 'status', 'result', 'latency', 'seq')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def close(self):
+        """كتابة التحديثات المتبقية وإغلاق الاتصال"""
+        self.flush()
+        with self._lock:
+            self._conn.close()
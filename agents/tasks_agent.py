@@ -3,14 +3,20 @@
 """
 from typing import Optional, Dict, List, Any
 from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
 from colorama import Fore, Style
+import statistics
 import sys
 import os
+import time
 
 # إضافة المسار للوصول إلى modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from agents.brain import BaseAgent
+from agents.task_queue import TaskQueue
+from agents.task_store import TaskStore
+from config.settings import config
 
 
 class TaskStatus(str, Enum):
@@ -35,9 +41,32 @@ class Task:
         """
         self.task_id = task_id
         self.description = description
-        self.priority = priority
-        self.status = TaskStatus.PENDING
+        self._priority = priority
+        self._status = TaskStatus.PENDING
+        self._listener = None  # يُبلغ TaskQueue بتغير الحالة أو الأولوية
+        self._seq: Optional[int] = None  # ترتيب الإضافة في TaskStore
         self.result = None
+        self.latency: Optional[float] = None  # مدة التنفيذ بالثواني
+
+    @property
+    def status(self) -> TaskStatus:
+        return self._status
+
+    @status.setter
+    def status(self, value: TaskStatus):
+        old, self._status = self._status, value
+        if self._listener is not None and old != value:
+            self._listener(self, 'status', old, value)
+
+    @property
+    def priority(self) -> int:
+        return self._priority
+
+    @priority.setter
+    def priority(self, value: int):
+        old, self._priority = self._priority, value
+        if self._listener is not None and old != value:
+            self._listener(self, 'priority', old, value)
 
     def __str__(self):
         return f"[{self.status}] {self.description} (الأولوية: {self.priority})"
@@ -46,32 +75,65 @@ class Task:
 class TasksAgent(BaseAgent):
     """وكيل المهام الذي يدير تنفيذ المهام"""
 
-    def __init__(self, provider: Optional[str] = None):
-        """تهيئة وكيل المهام"""
+    def __init__(self, provider: Optional[str] = None, store: Optional[TaskStore] = None):
+        """
+        تهيئة وكيل المهام
+
+        Args:
+            provider: مزود الخدمة
+            store: مخزن دائم للمهام؛ تُستعاد منه المهام السابقة عند الإنشاء
+        """
         super().__init__(provider)
         self.tasks: Dict[str, Task] = {}
+        self.queue = TaskQueue(TaskStatus.PENDING)
         self.completed_tasks: List[str] = []
+        self.last_run_report: Dict[str, Any] = {}
+        self.store = store
+        if store is not None:
+            self._restore()
+
+    def _restore(self):
+        """
+        استعادة المهام من المخزن الدائم
+
+        المهام التي توقفت أثناء التنفيذ تُعاد إلى حالة الانتظار لتُستأنف.
+        """
+        requeued = 0
+        for row in self.store.load():
+            task = Task(row['task_id'], row['description'], row['priority'])
+            task._seq = row['seq']
+            task.status = TaskStatus[row['status']]
+            task.result = row['result']
+            task.latency = row['latency']
+            if task.status == TaskStatus.IN_PROGRESS:
+                task.status = TaskStatus.PENDING
+                self.store.save(task)
+                requeued += 1
+            self.tasks[task.task_id] = task
+            self.queue.add(task)
+        self.store.flush()
+
+        if self.tasks:
+            print(f"{Fore.CYAN}✓ تمت استعادة {len(self.tasks)} مهمة "
+                  f"({requeued} أُعيدت للانتظار){Style.RESET_ALL}")
 
     def add_task(self, task_id: str, description: str, priority: int = 1) -> Task:
         """إضافة مهمة جديدة"""
         task = Task(task_id, description, priority)
         self.tasks[task_id] = task
+        self.queue.add(task)
+        if self.store is not None:
+            self.store.save(task)
         print(f"{Fore.CYAN}✓ تمت إضافة المهمة: {description}{Style.RESET_ALL}")
         return task
 
     def list_tasks(self) -> List[Task]:
         """عرض قائمة المهام"""
-        tasks = list(self.tasks.values())
-        tasks.sort(key=lambda x: x.priority, reverse=True)
-        return tasks
+        return self.queue.sorted_tasks()
 
     def get_next_task(self) -> Optional[Task]:
-        """الحصول على المهمة التالية حسب الأولوية"""
-        pending_tasks = [t for t in self.tasks.values() if t.status == TaskStatus.PENDING]
-        if not pending_tasks:
-            return None
-        pending_tasks.sort(key=lambda x: x.priority, reverse=True)
-        return pending_tasks[0]
+        """الحصول على المهمة التالية حسب الأولوية (FIFO داخل نفس الأولوية)"""
+        return self.queue.peek()
 
     def execute_task(self, task_id: str) -> str:
         """تنفيذ مهمة محددة"""
@@ -80,7 +142,10 @@ class TasksAgent(BaseAgent):
 
         task = self.tasks[task_id]
         task.status = TaskStatus.IN_PROGRESS
+        if self.store is not None:
+            self.store.save(task)
         print(f"{Fore.YELLOW}⟳ جاري تنفيذ: {task.description}{Style.RESET_ALL}")
+        started = time.perf_counter()
 
         try:
             # إنشاء prompt لتنفيذ المهمة
@@ -91,7 +156,8 @@ class TasksAgent(BaseAgent):
 
 قدم حلاً منطقياً وعملياً لهذه المهمة.
 """
-            result = self.process(prompt)
+            # لكل مهمة سياق مستقل حتى لا تتسرب نتائج المهام الأخرى إلى الـ prompt
+            result = self.complete([{"role": "user", "content": prompt}])
             task.result = result
             task.status = TaskStatus.COMPLETED
             self.completed_tasks.append(task_id)
@@ -105,26 +171,83 @@ class TasksAgent(BaseAgent):
             print(f"{Fore.RED}✗ فشل تنفيذ المهمة: {e}{Style.RESET_ALL}")
             return f"خطأ: {str(e)}"
 
-    def process_all_tasks(self) -> Dict[str, str]:
-        """معالجة جميع المهام المعلقة"""
-        results = {}
-        while True:
-            task = self.get_next_task()
-            if not task:
-                break
-            print(f"\n{Fore.BLUE}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━{Style.RESET_ALL}")
-            result = self.execute_task(task.task_id)
-            results[task.task_id] = result
-            print(f"{Fore.BLUE}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━{Style.RESET_ALL}\n")
+        finally:
+            task.latency = time.perf_counter() - started
+            if self.store is not None:
+                self.store.save(task, finished=True)
 
+    def process_all_tasks(self, max_workers: Optional[int] = None) -> Dict[str, str]:
+        """
+        معالجة جميع المهام المعلقة بالتوازي
+
+        تُرسل المهام إلى مجمع الخيوط بترتيب الأولوية، ويُنفذ كل منها بسياق
+        محادثة مستقل. يُحفظ تقرير الإنتاجية وزمن كل مهمة في last_run_report.
+
+        Args:
+            max_workers: عدد المهام المتزامنة (افتراضياً TASKS_MAX_WORKERS)
+
+        Returns:
+            قاموس معرف المهمة -> النتيجة بترتيب الأولوية
+        """
+        pending = list(self.queue.drain())
+        if not pending:
+            self.last_run_report = {}
+            return {}
+
+        max_workers = max(1, min(max_workers or config.TASKS_MAX_WORKERS, len(pending)))
+        print(f"\n{Fore.BLUE}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━{Style.RESET_ALL}")
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='task') as pool:
+            futures = {task.task_id: pool.submit(self.execute_task, task.task_id) for task in pending}
+            results = {task_id: future.result() for task_id, future in futures.items()}
+        elapsed = time.perf_counter() - started
+        if self.store is not None:
+            self.store.flush()
+
+        print(f"{Fore.BLUE}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━{Style.RESET_ALL}\n")
+
+        self.last_run_report = self._build_run_report(pending, elapsed, max_workers)
+        self.print_run_report()
         return results
 
+    def _build_run_report(self, tasks: List[Task], elapsed: float, workers: int) -> Dict[str, Any]:
+        """تقرير الإنتاجية وزمن التنفيذ لكل مهمة"""
+        latencies = sorted(t.latency for t in tasks if t.latency is not None)
+        report = {
+            'tasks': len(tasks),
+            'workers': workers,
+            'elapsed': elapsed,
+            'throughput': len(tasks) / elapsed if elapsed > 0 else 0.0,
+            'latencies': {t.task_id: t.latency for t in tasks},
+        }
+        if latencies:
+            report.update({
+                'latency_avg': statistics.fmean(latencies),
+                'latency_p50': latencies[len(latencies) // 2],
+                'latency_p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                'latency_max': latencies[-1],
+            })
+        return report
+
+    def print_run_report(self):
+        """طباعة تقرير آخر تشغيل"""
+        report = self.last_run_report
+        if not report:
+            return
+        print(f"{Fore.MAGENTA}📈 {report['tasks']} مهام في {report['elapsed']:.2f} ث "
+              f"({report['throughput']:.2f} مهمة/ث، {report['workers']} عامل){Style.RESET_ALL}")
+        if 'latency_avg' in report:
+            print(f"  {Fore.CYAN}زمن المهمة:{Style.RESET_ALL} "
+                  f"متوسط {report['latency_avg']:.2f} ث، p50 {report['latency_p50']:.2f} ث، "
+                  f"p95 {report['latency_p95']:.2f} ث، أقصى {report['latency_max']:.2f} ث")
+
     def get_statistics(self) -> Dict[str, Any]:
         """الحصول على إحصائيات المهام"""
-        total = len(self.tasks)
-        completed = sum(1 for t in self.tasks.values() if t.status == TaskStatus.COMPLETED)
-        pending = sum(1 for t in self.tasks.values() if t.status == TaskStatus.PENDING)
-        failed = sum(1 for t in self.tasks.values() if t.status == TaskStatus.FAILED)
+        total = len(self.queue)
+        completed = self.queue.count(TaskStatus.COMPLETED)
+        pending = self.queue.count(TaskStatus.PENDING)
+        failed = self.queue.count(TaskStatus.FAILED)
 
         return {
             "إجمالي المهام": total,
@@ -0,0 +1,216 @@
+"""
+قياس زمن وعدد رموز كل طلب إلى نموذج اللغة
+سجل لكل استدعاء يُرسل إلى مستقبلات قابلة للاستبدال: ذاكرة دائرية، ملف JSONL، وجدول conversations
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+from colorama import Fore, Style
+from pydantic import BaseModel
+
+# إضافة المسار للوصول إلى config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import config
+
+
+class CallRecord(BaseModel):
+    """سجل استدعاء واحد لنموذج اللغة"""
+    provider: str
+    model: str
+    kind: str  # "complete" أو "stream" أو "batch"
+    started_at: float  # epoch
+    queue_wait: Optional[float] = None  # الانتظار قبل بدء التنفيذ على حلقة الأحداث (None = لم يُقس)
+    ttft: Optional[float] = None  # زمن أول جزء (للتدفق فقط)
+    latency: float = 0.0  # الزمن الكلي (ثوانٍ)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    tokens_estimated: bool = False  # لم يُبلغ المزود عن العدد فتم تقديره
+    cached: bool = False
+    error: Optional[str] = None
+    # نص المحادثة لمستقبل conversations فقط؛ لا يُكتب في JSONL
+    user_message: str = ""
+    response: str = ""
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class TelemetrySink:
+    """واجهة مستقبل السجلات"""
+
+    def write(self, record: CallRecord):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class RingBufferSink(TelemetrySink):
+    """آخر capacity سجل في الذاكرة"""
+
+    def __init__(self, capacity: int = 1000):
+        self.records: deque = deque(maxlen=capacity)
+
+    def write(self, record: CallRecord):
+        self.records.append(record)
+
+
+class JsonlSink(TelemetrySink):
+    """سطر JSON لكل استدعاء (بدون نص المحادثة)"""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8', buffering=1)
+
+    def write(self, record: CallRecord):
+        line = json.dumps(record.model_dump(exclude={'user_message', 'response'}),
+                          ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ConversationsSink(TelemetrySink):
+    """
+    صف في جدول conversations لكل استدعاء ناجح، مع عدد الرموز في tokens_used
+
+    الردود المخدومة من الذاكرة المؤقتة لا تُسجل لأنها لا تستهلك رموزاً.
+    """
+
+    def __init__(self, db_path: str = 'data/agent-memory.db'):
+        if db_path != ':memory:' and os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        with self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_message TEXT NOT NULL,
+                    agent_response TEXT NOT NULL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                    tokens_used INTEGER,
+                    context_tags TEXT
+                )
+            ''')
+
+    def write(self, record: CallRecord):
+        if record.cached or record.error:
+            return
+        tags = json.dumps({'provider': record.provider, 'model': record.model,
+                           'kind': record.kind}, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO conversations (user_message, agent_response, tokens_used, context_tags) '
+                'VALUES (?, ?, ?, ?)',
+                (record.user_message, record.response, record.total_tokens, tags),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Telemetry:
+    """يوزع سجلات الاستدعاءات على المستقبلات"""
+
+    def __init__(self, sinks: Optional[List[TelemetrySink]] = None):
+        self.sinks: List[TelemetrySink] = list(sinks or [])
+
+    def add_sink(self, sink: TelemetrySink):
+        self.sinks.append(sink)
+
+    @property
+    def buffer(self) -> Optional[RingBufferSink]:
+        """أول مستقبل من نوع الذاكرة الدائرية إن وُجد"""
+        return next((s for s in self.sinks if isinstance(s, RingBufferSink)), None)
+
+    def record(self, record: CallRecord):
+        """إرسال سجل إلى جميع المستقبلات؛ فشل مستقبل لا يوقف الطلب"""
+        for sink in self.sinks:
+            try:
+                sink.write(record)
+            except Exception as e:
+                print(f"{Fore.YELLOW}⚠️  تعذر تسجيل القياس في {type(sink).__name__}: {e}{Style.RESET_ALL}")
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    المئين q (بين 0 و 100) بالاستيفاء الخطي
+
+    Returns:
+        القيمة أو None إذا كانت القائمة فارغة
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def summarize(records: Iterable[CallRecord]) -> Dict[str, Dict[str, Any]]:
+    """
+    ملخص المئينات لكل (مزود/نموذج)
+
+    Returns:
+        قاموس "المزود/النموذج" -> calls, errors, cached, latency, ttft, queue_wait
+        (لكل منها p50/p90/p99 بالثواني) ومجاميع الرموز
+    """
+    groups: Dict[str, List[CallRecord]] = {}
+    for record in records:
+        groups.setdefault(f"{record.provider}/{record.model}", []).append(record)
+
+    summary = {}
+    for key, group in groups.items():
+        live = [r for r in group if not r.cached and not r.error]
+        summary[key] = {
+            'calls': len(group),
+            'errors': sum(1 for r in group if r.error),
+            'cached': sum(1 for r in group if r.cached),
+            'prompt_tokens': sum(r.prompt_tokens for r in live),
+            'completion_tokens': sum(r.completion_tokens for r in live),
+        }
+        for field in ('latency', 'ttft', 'queue_wait'):
+            values = [getattr(r, field) for r in live if getattr(r, field) is not None]
+            summary[key][field] = {f'p{q}': percentile(values, q) for q in (50, 90, 99)}
+    return summary
+
+
+_default_telemetry: Optional[Telemetry] = None
+_default_telemetry_lock = threading.Lock()
+
+
+def get_default_telemetry() -> Optional[Telemetry]:
+    """القياس المشترك بين جميع الوكلاء في العملية، مبني من الإعدادات (None إذا كان معطلاً)"""
+    global _default_telemetry
+    if not config.TELEMETRY_ENABLED:
+        return None
+    with _default_telemetry_lock:
+        if _default_telemetry is None:
+            sinks: List[TelemetrySink] = [RingBufferSink(config.TELEMETRY_BUFFER_SIZE)]
+            if config.TELEMETRY_JSONL:
+                sinks.append(JsonlSink(config.TELEMETRY_JSONL))
+            if config.TELEMETRY_DB:
+                sinks.append(ConversationsSink(config.TELEMETRY_DB))
+            _default_telemetry = Telemetry(sinks)
+        return _default_telemetry
@@ -0,0 +1,235 @@
+"""
+حالات قياس المسارات الساخنة
+تعمل كلها على المزود الوهمي وخدمة Gmail الوهمية بدون شبكة
+"""
+import base64
+import contextlib
+import io
+import os
+import re
+import sys
+from typing import Any, Dict, Iterator, Tuple
+
+# إضافة المسار للوصول إلى modules
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.harness import benchmark, measure, skipped
+
+Result = Iterator[Tuple[str, Dict[str, Any]]]
+
+
+@contextlib.contextmanager
+def quiet():
+    """إخفاء رسائل الوكلاء أثناء القياس"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@benchmark('agent.turn')
+def bench_agent_turn(quick: bool) -> Result:
+    """زمن دورة process() الواحدة (بدون زمن النموذج) مع نمو السجل"""
+    from agents.brain import BaseAgent
+
+    for history in ([0, 100] if quick else [0, 100, 1000, 10000]):
+        def setup(history=history):
+            with quiet():
+                agent = BaseAgent(provider='fake')
+            agent.response_cache = None
+            for i in range(history):
+                agent.add_to_history('user' if i % 2 == 0 else 'assistant', f'رسالة رقم {i} ' * 10)
+            return agent
+
+        def turn(agent):
+            agent.process('ما هي مهام اليوم؟')
+
+        yield f'agent.turn[history={history}]', measure(
+            turn, setup=setup, repeat=3 if quick else 5, number=20, history=history)
+
+
+@benchmark('tasks.schedule')
+def bench_tasks_schedule(quick: bool) -> Result:
+    """إضافة N مهمة ثم سحبها بترتيب الأولوية مع تحديث الحالة والإحصائيات"""
+    from agents.task_queue import TaskQueue
+    from agents.tasks_agent import Task, TaskStatus
+
+    for size in ([10_000, 100_000] if quick else [10_000, 100_000, 1_000_000]):
+        def schedule(size=size):
+            queue = TaskQueue(TaskStatus.PENDING)
+            for i in range(size):
+                queue.add(Task(f't{i}', f'مهمة {i}', priority=i % 10 + 1))
+            while True:
+                task = queue.peek()
+                if task is None:
+                    break
+                task.status = TaskStatus.IN_PROGRESS
+                task.status = TaskStatus.COMPLETED
+                queue.count(TaskStatus.PENDING)
+
+        yield f'tasks.schedule[n={size}]', measure(
+            schedule, repeat=1 if size >= 1_000_000 else 3, tasks=size)
+
+
+@benchmark('gmail.list_messages')
+def bench_gmail_list_messages(quick: bool) -> Result:
+    """list_messages مع جلب التفاصيل على خدمة Gmail وهمية بزمن رحلة ثابت"""
+    from integrations.fake_gmail import FakeGmailService, make_message
+    from integrations.gmail_integration import GmailIntegration
+
+    latency = 0.005
+    for count in ([100, 500] if quick else [100, 500, 2000]):
+        def setup(count=count):
+            gmail = GmailIntegration(cache=None, quota_units_per_second=0)
+            gmail.service = FakeGmailService(
+                [make_message(f'm{i}', subject=f'Subject {i}', body=f'Body {i}') for i in range(count)],
+                latency=latency,
+            )
+            return gmail
+
+        def list_all(gmail, count=count):
+            gmail.list_messages(max_results=count)
+
+        yield f'gmail.list_messages[n={count}]', measure(
+            list_all, setup=setup, repeat=3, messages=count, round_trip=latency)
+
+
+def make_mime_payload(text_size: int, attachments: int, nested: bool = True) -> Dict[str, Any]:
+    """
+    رسالة MIME كبيرة بنص عادي و HTML
+
+    Args:
+        text_size: حجم كل جزء بالبايت
+        attachments: عدد المرفقات (للرسالة المتداخلة فقط)
+        nested: multipart/mixed بمرفقات وجزء alternative متداخل، وإلا
+            multipart/alternative بجزأي HTML ونص عادي في المستوى الأول
+    """
+    def part(mime_type: str, size: int, filename: str = '') -> Dict[str, Any]:
+        raw = ('سطر من نص الرسالة للقياس\n' * (size // 40 + 1)).encode('utf-8')[:size]
+        return {
+            'mimeType': mime_type,
+            'filename': filename,
+            'body': {'size': len(raw), 'data': base64.urlsafe_b64encode(raw).decode('ascii')},
+        }
+
+    html = part('text/html', text_size)
+    if not nested:
+        return {
+            'id': 'large',
+            'payload': {'mimeType': 'multipart/alternative',
+                        'parts': [html, part('text/plain', text_size)]},
+        }
+    return {
+        'id': 'large',
+        'payload': {
+            'mimeType': 'multipart/mixed',
+            'parts': [part('application/octet-stream', text_size, f'file{i}.bin')
+                      for i in range(attachments)] + [
+                {'mimeType': 'multipart/alternative', 'body': {'size': 0},
+                 'parts': [html, part('text/plain', text_size)]},
+            ],
+        },
+    }
+
+
+@benchmark('gmail.message_body')
+def bench_gmail_message_body(quick: bool) -> Result:
+    """استخراج نص رسالة MIME كبيرة"""
+    from integrations.gmail_integration import GmailIntegration
+
+    gmail = GmailIntegration(cache=None, quota_units_per_second=0)
+    for shape in ('alternative', 'mixed'):
+        for size in ([64 * 1024, 1024 * 1024] if quick else [64 * 1024, 1024 * 1024, 8 * 1024 * 1024]):
+            message = make_mime_payload(size, attachments=4, nested=shape == 'mixed')
+            yield f'gmail.message_body[{shape},size={size // 1024}KB]', measure(
+                lambda: gmail._get_message_body(message), repeat=5, shape=shape, part_bytes=size)
+
+
+@benchmark('gmail.categorize')
+def bench_gmail_categorize(quick: bool) -> Result:
+    """تصنيف الرسائل بقواعد الكلمات المفتاحية (categorize_emails)"""
+    from agents.email_classifier import load_classifier
+
+    classifier = load_classifier('categories')
+    subjects = ['Project meeting tomorrow', 'عاجل: تحديث الحساب', 'Weekly newsletter',
+                'صور الرحلة', 'Re: invoice']
+    for count in ([1000, 10_000] if quick else [1000, 10_000, 100_000]):
+        messages = [{'subject': subjects[i % len(subjects)], 'from': f'sender{i}@example.com',
+                     'snippet': 'نص الرسالة للقياس ' * 8} for i in range(count)]
+        yield f'gmail.categorize[n={count}]', measure(
+            lambda: classifier.group(messages), repeat=5, messages=count)
+
+
+@benchmark('gmail.semantic_search')
+def bench_gmail_semantic_search(quick: bool) -> Result:
+    """استعلام top-10 في الفهرس الدلالي المحلي (في الذاكرة)"""
+    from integrations.semantic_index import SemanticIndex
+
+    words = ['اجتماع', 'المشروع', 'فاتورة', 'invoice', 'meeting', 'report', 'رحلة', 'تقرير',
+             'budget', 'الميزانية', 'deadline', 'موعد']
+    for count in ([10_000, 50_000] if quick else [10_000, 50_000, 200_000]):
+        index = SemanticIndex(None)
+        for start in range(0, count, 5000):
+            index.add((f'm{i}', [' '.join(words[(i * j) % len(words)] for j in range(1, 8))])
+                      for i in range(start, min(count, start + 5000)))
+        yield f'gmail.semantic_search[n={count}]', measure(
+            lambda: index.search('موعد اجتماع الميزانية', k=10), repeat=5, number=10, chunks=count)
+
+
+@benchmark('gmail.fulltext_search')
+def bench_gmail_fulltext_search(quick: bool) -> Result:
+    """استعلام بصيغة Gmail في الفهرس النصي المحلي (SQLite FTS5 في الذاكرة)"""
+    from integrations.fulltext_index import FullTextIndex
+
+    words = ['اجتماع', 'المشروع', 'فاتورة', 'invoice', 'meeting', 'report', 'رحلة', 'تقرير',
+             'budget', 'الميزانية', 'deadline', 'موعد']
+    for count in ([10_000, 50_000] if quick else [10_000, 50_000, 200_000]):
+        index = FullTextIndex(':memory:')
+        index.add({'id': f'm{i}', 'from': f'user{i % 100}@example.com',
+                   'subject': ' '.join(words[(i * j) % len(words)] for j in range(1, 4)),
+                   'snippet': ' '.join(words[(i * j) % len(words)] for j in range(4, 12)),
+                   'date': f'Mon, {1 + i % 28} Jan 2024 10:00:00 +0000'} for i in range(count))
+        yield f'gmail.fulltext_search[n={count}]', measure(
+            lambda: index.search('from:user7 subject:meeting الميزانية after:2024/01/10', limit=10),
+            repeat=5, number=10, messages=count)
+
+
+@benchmark('gmail.mailbox_stats')
+def bench_gmail_mailbox_stats(quick: bool) -> Result:
+    """جميع إحصائيات الصندوق من اللقطة العمودية"""
+    from integrations.mailbox_stats import MailboxStats
+
+    labels = ['INBOX', 'UNREAD', 'SENT', 'IMPORTANT', 'Label_1', 'Label_2', 'Label_3']
+    for count in ([10_000, 50_000] if quick else [10_000, 50_000, 200_000]):
+        stats = MailboxStats(lambda message: ('work', 'personal', 'other')[len(message['id']) % 3])
+        stats.add({'id': f'm{i}', 'threadId': f't{i // 3}', 'from': f'user{i % 500}@example.com',
+                   'date': f'Mon, {1 + i % 28} Jan 2024 {i % 24:02d}:00:00 +0000', 'size': 2000 + i % 5000,
+                   'labels': [labels[(i * j) % len(labels)] for j in range(1, 4)]} for i in range(count))
+        yield f'gmail.mailbox_stats[n={count}]', measure(
+            lambda: stats.summary(days=None), repeat=5, number=10, messages=count)
+
+
+@benchmark('templates.render')
+def bench_template_render(quick: bool) -> Result:
+    """إنتاجية PromptTemplateLoader.render_prompt"""
+    sys.path.insert(0, os.path.join(ROOT, 'python'))
+    sys.path.insert(0, os.path.join(ROOT, 'prompts'))
+    try:
+        from template_loader import PromptTemplateLoader
+    except ImportError as e:
+        yield 'templates.render', skipped(f'template_loader غير متاح: {e}')
+        return
+
+    loader = PromptTemplateLoader(os.path.join(ROOT, 'prompts', 'prompt-templates.json'))
+    templates = list(loader.templates.values())
+    variables = {
+        template['id']: {name: f'قيمة {name}' for name in
+                         re.findall(r'\{\{(\w+)\}\}', template['user_message'])}
+        for template in templates
+    }
+
+    def render_all():
+        for template in templates:
+            loader.render_prompt(template['id'], **variables[template['id']])
+
+    yield 'templates.render', measure(
+        render_all, repeat=5, number=20 if quick else 200, templates=len(templates))
@@ -0,0 +1,159 @@
+"""
+أدوات قياس الأداء: التوقيت، سجل الحالات، حفظ النتائج ومقارنتها بخط أساس
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# الاسم -> دالة تُعيد (اسم القياس، النتيجة) لكل حجم مقيس
+BenchmarkCase = Callable[[bool], Iterator[Tuple[str, Dict[str, Any]]]]
+BENCHMARKS: Dict[str, BenchmarkCase] = {}
+
+
+def benchmark(name: str) -> Callable[[BenchmarkCase], BenchmarkCase]:
+    """
+    تسجيل حالة قياس
+
+    الدالة المسجلة تستقبل quick (تشغيل مختصر) وتُعيد أزواج (اسم القياس، النتيجة).
+    """
+    def register(func: BenchmarkCase) -> BenchmarkCase:
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def measure(func: Callable[[], Any], repeat: int = 5, number: int = 1,
+            setup: Optional[Callable[[], Any]] = None, **params) -> Dict[str, Any]:
+    """
+    قياس زمن تنفيذ دالة
+
+    Args:
+        func: الدالة المقيسة (أو دالة تستقبل ناتج setup إن وُجد)
+        repeat: عدد مرات القياس
+        number: عدد الاستدعاءات في كل قياس
+        setup: دالة تُنفذ قبل كل قياس خارج التوقيت، ويُمرر ناتجها إلى func
+        **params: معاملات تُحفظ مع النتيجة
+
+    Returns:
+        الزمن لكل استدعاء بالثواني (median, mean, min, max, stdev) و ops_per_sec
+    """
+    timings: List[float] = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        started = time.perf_counter()
+        for _ in range(number):
+            func(state) if setup else func()
+        timings.append((time.perf_counter() - started) / number)
+
+    median = statistics.median(timings)
+    return {
+        'unit': 's',
+        'median': median,
+        'mean': statistics.fmean(timings),
+        'min': min(timings),
+        'max': max(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'ops_per_sec': 1 / median if median > 0 else None,
+        'repeat': repeat,
+        'number': number,
+        'params': params,
+    }
+
+
+def skipped(reason: str, **params) -> Dict[str, Any]:
+    """نتيجة حالة لم تُشغل (مثلاً لغياب اعتمادية اختيارية)"""
+    return {'skipped': reason, 'params': params}
+
+
+def run(names: Optional[List[str]] = None, quick: bool = False,
+        log: Callable[[str], None] = print) -> Dict[str, Any]:
+    """
+    تشغيل حالات القياس
+
+    Args:
+        names: أسماء الحالات أو بادئاتها (None = الكل)
+        quick: أحجام أصغر وتكرار أقل
+        log: دالة طباعة التقدم
+
+    Returns:
+        {'meta': ..., 'results': {اسم القياس: النتيجة}}
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, case in BENCHMARKS.items():
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        for label, result in case(quick):
+            results[label] = result
+            log(format_result(label, result))
+    return {'meta': _metadata(quick), 'results': results}
+
+
+def _metadata(quick: bool) -> Dict[str, Any]:
+    """بيانات التشغيل لتمييز النتائج عند المقارنة"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quick': quick,
+    }
+
+
+def format_result(label: str, result: Dict[str, Any]) -> str:
+    """سطر واحد قابل للقراءة لنتيجة قياس"""
+    if 'skipped' in result:
+        return f"{label:<45} تم التخطي: {result['skipped']}"
+    return (f"{label:<45} {result['median'] * 1000:>12.3f} ms "
+            f"(±{result['stdev'] * 1000:.3f}, min {result['min'] * 1000:.3f})")
+
+
+def save(report: Dict[str, Any], path: str):
+    """حفظ تقرير القياس بصيغة JSON"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load(path: str) -> Dict[str, Any]:
+    """قراءة تقرير قياس محفوظ"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any],
+            threshold: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    مقارنة تقرير بخط أساس
+
+    Args:
+        report: التقرير الحالي
+        baseline: تقرير خط الأساس
+        threshold: نسبة التباطؤ المسموح بها قبل اعتبار القياس تراجعاً
+
+    Returns:
+        لكل قياس مشترك: الاسم، الزمنان، النسبة، وهل هو تراجع
+    """
+    rows = []
+    for label, result in report['results'].items():
+        base = baseline.get('results', {}).get(label)
+        if not base or 'median' not in base or 'median' not in result or not base['median']:
+            continue
+        ratio = result['median'] / base['median']
+        rows.append({
+            'name': label,
+            'baseline': base['median'],
+            'current': result['median'],
+            'ratio': ratio,
+            'regression': ratio > 1 + threshold,
+        })
+    return rows
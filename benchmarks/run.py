@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+تشغيل قياسات الأداء
+
+أمثلة:
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --only agent,tasks --output benchmarks/results/run.json
+    python -m benchmarks.run --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import os
+import sys
+import time
+
+# إضافة المسار للوصول إلى modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import cases  # noqa: F401  (تسجيل الحالات)
+from benchmarks.harness import BENCHMARKS, compare, load, run, save
+
+
+def main(argv=None) -> int:
+    """نقطة الدخول؛ تعيد 1 إذا وُجد تراجع مقارنة بخط الأساس"""
+    parser = argparse.ArgumentParser(description='قياس أداء المسارات الساخنة')
+    parser.add_argument('--quick', action='store_true', help='أحجام أصغر وتكرار أقل')
+    parser.add_argument('--only', default='', help='أسماء الحالات أو بادئاتها مفصولة بفواصل')
+    parser.add_argument('--output', default=None, help='مسار ملف النتائج JSON')
+    parser.add_argument('--baseline', default=None, help='ملف نتائج سابق للمقارنة')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='نسبة التباطؤ المسموح بها (0.2 = 20%%)')
+    parser.add_argument('--list', action='store_true', help='عرض الحالات المتاحة')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, case in BENCHMARKS.items():
+            print(f'{name:<25} {(case.__doc__ or "").strip()}')
+        return 0
+
+    names = [name.strip() for name in args.only.split(',') if name.strip()] or None
+    report = run(names, quick=args.quick)
+
+    output = args.output or os.path.join(
+        'benchmarks', 'results', time.strftime('%Y%m%d-%H%M%S') + '.json')
+    save(report, output)
+    print(f'\nالنتائج محفوظة في {output}')
+
+    if not args.baseline:
+        return 0
+
+    rows = compare(report, load(args.baseline), args.threshold)
+    print(f'\nالمقارنة مع {args.baseline}:')
+    for row in rows:
+        mark = '✗' if row['regression'] else '✓'
+        print(f"  {mark} {row['name']:<45} {row['baseline'] * 1000:>10.3f} → "
+              f"{row['current'] * 1000:>10.3f} ms (×{row['ratio']:.2f})")
+    return 1 if any(row['regression'] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
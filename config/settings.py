@@ -13,15 +13,51 @@ class Config:
     # Groq API Settings
     GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
     GROQ_MODEL = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
+    GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "")  # فارغ = العنوان الافتراضي
 
     # Ollama Settings
     OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama2")
 
     # Agent Settings
-    AI_PROVIDER = os.getenv("AI_PROVIDER", "groq")  # "groq" أو "ollama"
+    AI_PROVIDER = os.getenv("AI_PROVIDER", "groq")  # "groq" أو "ollama" أو "fake"
     MAX_TOKENS = int(os.getenv("MAX_TOKENS", "2048"))
     TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
+    # مهلة كل طلب إلى النموذج بالثواني (0 = بلا حد)
+    REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "120"))
+    # مجمع اتصالات HTTP المشترك بين جميع الوكلاء
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    # حجم نافذة سياق النموذج (0 = حسب اسم النموذج)
+    CONTEXT_WINDOW_TOKENS = int(os.getenv("CONTEXT_WINDOW_TOKENS", "0"))
+    # عدد الرسائل الحديثة التي لا تُطوى في ملخص السجل
+    HISTORY_KEEP_RECENT = int(os.getenv("HISTORY_KEEP_RECENT", "4"))
+    # تلخيص الرسائل القديمة بالنموذج بدلاً من الملخص الاستخراجي المحلي
+    HISTORY_LLM_SUMMARY = os.getenv("HISTORY_LLM_SUMMARY", "False").lower() == "true"
+
+    # Fake Provider Settings (مزود محلي بدون شبكة للاختبارات وقياس الأداء)
+    FAKE_LATENCY = float(os.getenv("FAKE_LATENCY", "0"))  # زمن الرد بالثواني
+    FAKE_TOKENS = int(os.getenv("FAKE_TOKENS", "32"))  # عدد رموز الرد
+
+    # Response Cache Settings (تُفعّل تلقائياً عند TEMPERATURE=0)
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+    RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "")  # فارغ = بدون طبقة SQLite
+    RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))  # 0 = بلا انتهاء
+    RESPONSE_CACHE_MAX_DB_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_DB_ENTRIES", "10000"))
+
+    # Telemetry Settings (قياس زمن وعدد رموز كل طلب)
+    TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "True").lower() == "true"
+    TELEMETRY_BUFFER_SIZE = int(os.getenv("TELEMETRY_BUFFER_SIZE", "1000"))
+    TELEMETRY_JSONL = os.getenv("TELEMETRY_JSONL", "")  # فارغ = بدون ملف
+    # تسجيل كل استدعاء في جدول conversations (فارغ = معطل)
+    TELEMETRY_DB = os.getenv("TELEMETRY_DB", "")
+
+    # Tasks Settings
+    TASKS_MAX_WORKERS = int(os.getenv("TASKS_MAX_WORKERS", "4"))
+    # مخزن المهام الدائم (فارغ = المهام في الذاكرة فقط)
+    TASKS_DB_PATH = os.getenv("TASKS_DB_PATH", "data/tasks.db")
+    TASKS_DB_BATCH_SIZE = int(os.getenv("TASKS_DB_BATCH_SIZE", "50"))
+    TASKS_DB_FLUSH_INTERVAL = float(os.getenv("TASKS_DB_FLUSH_INTERVAL", "1.0"))
 
     # Project Settings
     PROJECT_NAME = "ذكي الوكيل - Intelligent Agent"
@@ -30,6 +66,37 @@ class Config:
     # Gmail Settings
     GMAIL_CREDENTIALS_FILE = os.getenv("GMAIL_CREDENTIALS_FILE", "credentials.json")
     GMAIL_TOKEN_FILE = os.getenv("GMAIL_TOKEN_FILE", "token.pickle")
+    # نسخة محلية من مستند discovery لـ Gmail API (فارغ = بدون نسخة على القرص)
+    GMAIL_DISCOVERY_CACHE = os.getenv("GMAIL_DISCOVERY_CACHE", "data/gmail-discovery-{version}.json")
+    # أقصى حجم بالبايت يُفك من نص الرسالة (0 = بلا حد)
+    GMAIL_BODY_MAX_BYTES = int(os.getenv("GMAIL_BODY_MAX_BYTES", str(1024 * 1024)))
+    # عدد طلبات الرسائل في كل استدعاء batch (الحد الأقصى لـ Gmail هو 100)
+    GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))
+    # المخزن المحلي للرسائل والمزامنة التزايدية عبر historyId
+    GMAIL_CACHE_ENABLED = os.getenv("GMAIL_CACHE_ENABLED", "True").lower() == "true"
+    GMAIL_CACHE_DB = os.getenv("GMAIL_CACHE_DB", "data/gmail-cache.db")
+    # أقصى عمر للمخزن بالثواني قبل المزامنة (0 = مزامنة قبل كل قراءة)
+    GMAIL_CACHE_MAX_AGE = float(os.getenv("GMAIL_CACHE_MAX_AGE", "300"))
+    # التنفيذ المتزامن وحدود الحصة (Gmail: 250 وحدة/ثانية لكل مستخدم)
+    GMAIL_MAX_WORKERS = int(os.getenv("GMAIL_MAX_WORKERS", "4"))
+    GMAIL_QUOTA_UNITS_PER_SECOND = float(os.getenv("GMAIL_QUOTA_UNITS_PER_SECOND", "250"))
+    GMAIL_MAX_RETRIES = int(os.getenv("GMAIL_MAX_RETRIES", "5"))
+    GMAIL_BACKOFF_BASE = float(os.getenv("GMAIL_BACKOFF_BASE", "1.0"))
+    # فهرس البحث النصي المحلي (SQLite FTS5)؛ search_emails يبحث فيه قبل Gmail API
+    FULLTEXT_INDEX_ENABLED = os.getenv("FULLTEXT_INDEX_ENABLED", "True").lower() == "true"
+    FULLTEXT_INDEX_DB = os.getenv("FULLTEXT_INDEX_DB", "data/gmail-search.db")
+    # فهرس البحث الدلالي المحلي (متجهات على القرص بجانب المخزن)
+    SEMANTIC_INDEX_ENABLED = os.getenv("SEMANTIC_INDEX_ENABLED", "True").lower() == "true"
+    SEMANTIC_INDEX_DIR = os.getenv("SEMANTIC_INDEX_DIR", "data/semantic-index")
+    SEMANTIC_INDEX_DIM = int(os.getenv("SEMANTIC_INDEX_DIM", "512"))
+    SEMANTIC_CHUNK_CHARS = int(os.getenv("SEMANTIC_CHUNK_CHARS", "800"))
+    SEMANTIC_MAX_CHUNKS = int(os.getenv("SEMANTIC_MAX_CHUNKS", "4"))
+    # قواعد تصنيف الرسائل والأوامر بالكلمات المفتاحية
+    EMAIL_RULES_FILE = os.getenv(
+        "EMAIL_RULES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "email_rules.json"))
+    # تلخيص الرسائل دفعات: ميزانية الرموز لكل طلب وأقصى عدد أحرف من كل رسالة
+    GMAIL_DIGEST_CHUNK_TOKENS = int(os.getenv("GMAIL_DIGEST_CHUNK_TOKENS", "3000"))
+    GMAIL_DIGEST_MESSAGE_CHARS = int(os.getenv("GMAIL_DIGEST_MESSAGE_CHARS", "1000"))
 
 # إنشاء نسخة واحدة من الإعدادات
 config = Config()
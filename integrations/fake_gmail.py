@@ -0,0 +1,416 @@
+"""
+Fake Gmail Service - خدمة Gmail وهمية محلية
+تحاكي واجهة googleapiclient لـ Gmail بدون اتصال بالشبكة، للاختبارات وقياس الأداء
+"""
+import base64
+import json
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from googleapiclient.errors import HttpError
+from httplib2 import Response
+
+
+def make_message(msg_id: str, subject: str = 'Test subject', sender: str = 'sender@example.com',
+                 to: str = 'me@example.com', body: str = 'Hello', snippet: Optional[str] = None,
+                 labels: Optional[List[str]] = None, thread_id: Optional[str] = None,
+                 date: str = 'Mon, 1 Jan 2024 10:00:00 +0000',
+                 headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    إنشاء رسالة بصيغة استجابة Gmail API (format='full')
+
+    Args:
+        msg_id: معرف الرسالة
+        subject: الموضوع
+        sender: المرسل
+        to: المستلم
+        body: نص الرسالة
+        snippet: مقتطف الرسالة (افتراضياً أول 100 حرف من النص)
+        labels: التصنيفات
+        thread_id: معرف المحادثة
+        date: التاريخ
+        headers: ترويسات إضافية (مثل Message-ID و Cc)
+
+    Returns:
+        قاموس الرسالة
+    """
+    data = base64.urlsafe_b64encode(body.encode('utf-8')).decode('ascii')
+    return {
+        'id': msg_id,
+        'threadId': thread_id or msg_id,
+        'labelIds': list(labels if labels is not None else ['INBOX', 'UNREAD']),
+        'snippet': snippet if snippet is not None else body[:100],
+        'sizeEstimate': len(body.encode('utf-8')),
+        'payload': {
+            'mimeType': 'text/plain',
+            'headers': [
+                {'name': 'Subject', 'value': subject},
+                {'name': 'From', 'value': sender},
+                {'name': 'To', 'value': to},
+                {'name': 'Date', 'value': date},
+            ] + [{'name': name, 'value': value} for name, value in (headers or {}).items()],
+            'body': {'size': len(body), 'data': data},
+        },
+    }
+
+
+def _http_error(status: int, reason: str = 'error') -> HttpError:
+    """إنشاء HttpError بنفس شكل أخطاء googleapiclient"""
+    return HttpError(Response({'status': status}), reason.encode('utf-8'))
+
+
+class _FakeRequest:
+    """طلب مؤجل يحاكي googleapiclient.http.HttpRequest"""
+
+    def __init__(self, service: 'FakeGmailService', method: str, handler: Callable[[], Any]):
+        self._service = service
+        self.method = method
+        self.methodId = 'gmail.users.' + '.'.join(method.split('.')[:2])
+        self._handler = handler
+
+    def execute(self, http=None, num_retries: int = 0):
+        self._service.count(self.method)
+        self._service.maybe_fail(self.method)
+        return self._handler()
+
+    def _run(self):
+        """تنفيذ الطلب داخل batch (يُحتسب في calls تحت اسم batch)"""
+        return self._handler()
+
+
+class _FakeBatch:
+    """طلب batch يحاكي googleapiclient.http.BatchHttpRequest"""
+
+    def __init__(self, service: 'FakeGmailService', callback: Optional[Callable] = None):
+        self._service = service
+        self._callback = callback
+        self._requests: List[tuple] = []
+
+    def add(self, request: _FakeRequest, callback: Optional[Callable] = None,
+            request_id: Optional[str] = None):
+        if request_id is None:
+            request_id = str(len(self._requests) + 1)
+        self._requests.append((request_id, request, callback or self._callback))
+
+    def execute(self, http=None):
+        self._service.count('batch')
+        self._service.maybe_fail('batch')
+        for request_id, request, callback in self._requests:
+            response, exception = None, None
+            try:
+                response = request._run()
+            except HttpError as error:
+                exception = error
+            if callback:
+                callback(request_id, response, exception)
+
+
+class _Resource:
+    """مورد عام يعيد طلبات مؤجلة"""
+
+    def __init__(self, service: 'FakeGmailService'):
+        self._service = service
+
+    def _request(self, method: str, handler: Callable[[], Any]) -> _FakeRequest:
+        return _FakeRequest(self._service, method, handler)
+
+
+class _MessagesResource(_Resource):
+    """يحاكي users().messages()"""
+
+    def list(self, userId: str = 'me', q: str = '', maxResults: int = 100,
+             labelIds: Optional[List[str]] = None, pageToken: Optional[str] = None, **kwargs):
+        def handler():
+            matched = self._service.search(q, labelIds)
+            start = int(pageToken or 0)
+            page = matched[start:start + maxResults]
+            response: Dict[str, Any] = {
+                'messages': [{'id': m['id'], 'threadId': m['threadId']} for m in page],
+                'resultSizeEstimate': len(matched),
+            }
+            if start + maxResults < len(matched):
+                response['nextPageToken'] = str(start + maxResults)
+            if not page:
+                del response['messages']
+            return response
+        return self._request('messages.list', handler)
+
+    def get(self, userId: str = 'me', id: str = '', format: str = 'full',
+            metadataHeaders: Optional[List[str]] = None, **kwargs):
+        def handler():
+            self._service.maybe_fail_message(id)
+            if id not in self._service.messages:
+                raise _http_error(404, f'message {id} not found')
+            return self._service.render(self._service.messages[id], format, metadataHeaders)
+        return self._request(f'messages.get.{format}', handler)
+
+    def modify(self, userId: str = 'me', id: str = '', body: Optional[Dict[str, Any]] = None):
+        def handler():
+            body_ = body or {}
+            self._service.modify_labels(id, body_.get('addLabelIds', []),
+                                        body_.get('removeLabelIds', []))
+            return {'id': id}
+        return self._request('messages.modify', handler)
+
+    def batchModify(self, userId: str = 'me', body: Optional[Dict[str, Any]] = None):
+        def handler():
+            body_ = body or {}
+            if len(body_.get('ids', [])) > 1000:
+                raise _http_error(400, 'Too many ids')
+            for msg_id in body_.get('ids', []):
+                if msg_id in self._service.messages:
+                    self._service.modify_labels(msg_id, body_.get('addLabelIds', []),
+                                                body_.get('removeLabelIds', []))
+            return ''
+        return self._request('messages.batchModify', handler)
+
+    def batchDelete(self, userId: str = 'me', body: Optional[Dict[str, Any]] = None):
+        def handler():
+            body_ = body or {}
+            if len(body_.get('ids', [])) > 1000:
+                raise _http_error(400, 'Too many ids')
+            for msg_id in body_.get('ids', []):
+                self._service.remove_message(msg_id)
+            return ''
+        return self._request('messages.batchDelete', handler)
+
+    def trash(self, userId: str = 'me', id: str = ''):
+        def handler():
+            self._service.modify_labels(id, ['TRASH'], [])
+            return {'id': id}
+        return self._request('messages.trash', handler)
+
+    def delete(self, userId: str = 'me', id: str = ''):
+        def handler():
+            self._service.remove_message(id)
+            return ''
+        return self._request('messages.delete', handler)
+
+    def send(self, userId: str = 'me', body: Optional[Dict[str, Any]] = None):
+        def handler():
+            self._service.sent.append(dict(body or {}))
+            return {'id': f"sent{len(self._service.sent)}", 'threadId': (body or {}).get('threadId')}
+        return self._request('messages.send', handler)
+
+
+class _HistoryResource(_Resource):
+    """يحاكي users().history()"""
+
+    def list(self, userId: str = 'me', startHistoryId: str = '0',
+             pageToken: Optional[str] = None, maxResults: int = 100, **kwargs):
+        def handler():
+            start = int(startHistoryId)
+            if start < self._service.min_history_id:
+                raise _http_error(404, 'Requested entity was not found.')
+            records = [r for r in self._service.history if int(r['id']) > start]
+            offset = int(pageToken or 0)
+            response: Dict[str, Any] = {
+                'history': records[offset:offset + maxResults],
+                'historyId': str(self._service.history_id),
+            }
+            if offset + maxResults < len(records):
+                response['nextPageToken'] = str(offset + maxResults)
+            return response
+        return self._request('history.list', handler)
+
+
+class _UsersResource(_Resource):
+    """يحاكي users()"""
+
+    def messages(self) -> _MessagesResource:
+        return _MessagesResource(self._service)
+
+    def history(self) -> _HistoryResource:
+        return _HistoryResource(self._service)
+
+    def getProfile(self, userId: str = 'me'):
+        def handler():
+            return {
+                'emailAddress': self._service.email,
+                'messagesTotal': len(self._service.messages),
+                'threadsTotal': len({m['threadId'] for m in self._service.messages.values()}),
+                'historyId': str(self._service.history_id),
+            }
+        return self._request('getProfile', handler)
+
+
+class FakeGmailService:
+    """
+    خدمة Gmail وهمية في الذاكرة
+
+    تحفظ الرسائل في قاموس وتعدّ كل استدعاء في `calls` حتى يمكن قياس عدد
+    الرحلات إلى "الخادم" في الاختبارات.
+    """
+
+    def __init__(self, messages: Optional[List[Dict[str, Any]]] = None,
+                 email: str = 'me@example.com', latency: float = 0):
+        """
+        تهيئة الخدمة الوهمية
+
+        Args:
+            messages: رسائل أولية بصيغة make_message
+            email: البريد الإلكتروني للمستخدم
+            latency: زمن كل رحلة إلى "الخادم" بالثواني (لقياس الأداء)
+        """
+        self.email = email
+        self.latency = latency
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        self.failing_ids: Dict[str, List[Any]] = {}
+        self.failing_methods: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.bytes_served = 0
+        self.history: List[Dict[str, Any]] = []
+        self.sent: List[Dict[str, Any]] = []
+        self.history_id = 1
+        self.min_history_id = 0
+        for message in messages or []:
+            self.add_message(message)
+
+    def _record(self, kind: str, msg_id: str, label_ids: Optional[List[str]] = None):
+        """تسجيل تغيير في سجل history"""
+        self.history_id += 1
+        item: Dict[str, Any] = {'message': {'id': msg_id}}
+        if label_ids is not None:
+            item['labelIds'] = label_ids
+        self.history.append({'id': str(self.history_id), kind: [item]})
+
+    def add_message(self, message: Dict[str, Any]):
+        """إضافة رسالة إلى صندوق البريد الوهمي"""
+        self.messages[message['id']] = message
+        self._record('messagesAdded', message['id'])
+
+    def remove_message(self, msg_id: str):
+        """حذف رسالة نهائياً"""
+        if self.messages.pop(msg_id, None) is not None:
+            self._record('messagesDeleted', msg_id)
+
+    def modify_labels(self, msg_id: str, add: List[str], remove: List[str]):
+        """تعديل تصنيفات رسالة وتسجيل التغيير"""
+        if msg_id not in self.messages:
+            raise _http_error(404, f'message {msg_id} not found')
+        labels = self.messages[msg_id]['labelIds']
+        added = [label for label in add if label not in labels]
+        removed = [label for label in remove if label in labels]
+        labels[:] = [label for label in labels if label not in removed] + added
+        if added:
+            self._record('labelsAdded', msg_id, added)
+        if removed:
+            self._record('labelsRemoved', msg_id, removed)
+
+    def expire_history(self):
+        """محاكاة انتهاء صلاحية historyId القديمة"""
+        self.min_history_id = self.history_id + 1
+
+    def render(self, message: Dict[str, Any], format: str = 'full',
+               metadata_headers: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        تحويل الرسالة المخزنة إلى شكل الاستجابة حسب الصيغة المطلوبة
+
+        Args:
+            message: الرسالة الكاملة
+            format: 'full' أو 'metadata' أو 'minimal'
+            metadata_headers: الترويسات المطلوبة في صيغة metadata
+
+        Returns:
+            الاستجابة بالصيغة المطلوبة
+        """
+        if format == 'full':
+            response = message
+        else:
+            response = {key: value for key, value in message.items() if key != 'payload'}
+            if format == 'metadata':
+                wanted = {h.lower() for h in metadata_headers} if metadata_headers else None
+                response['payload'] = {
+                    'mimeType': message['payload'].get('mimeType'),
+                    'headers': [
+                        h for h in message['payload'].get('headers', [])
+                        if wanted is None or h['name'].lower() in wanted
+                    ],
+                }
+        self.bytes_served += len(json.dumps(response))
+        return response
+
+    def fail_message(self, msg_id: str, status: int = 500, times: Optional[int] = None):
+        """
+        جعل جلب رسالة معينة يفشل بخطأ HTTP
+
+        Args:
+            msg_id: معرف الرسالة
+            status: رمز حالة HTTP
+            times: عدد مرات الفشل قبل النجاح (None = دائماً)
+        """
+        self.failing_ids[msg_id] = [status, times]
+
+    def fail_next(self, method: str, status: int = 429, times: int = 1):
+        """جعل الاستدعاءات التالية لطريقة معينة (مثل 'messages.list' أو 'batch') تفشل مؤقتاً"""
+        self.failing_methods[method] = [status, times]
+
+    def count(self, method: str):
+        """تسجيل استدعاء ومحاكاة زمن الرحلة إلى الخادم"""
+        with self._lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _consume_failure(self, failures: Dict[str, List[Any]], key: str) -> Optional[int]:
+        with self._lock:
+            if key not in failures:
+                return None
+            status, remaining = failures[key]
+            if remaining is not None:
+                if remaining <= 1:
+                    del failures[key]
+                else:
+                    failures[key][1] = remaining - 1
+            return status
+
+    def maybe_fail(self, method: str):
+        """رفع HttpError إذا كانت الطريقة مجدولة للفشل"""
+        status = self._consume_failure(self.failing_methods, method)
+        if status is not None:
+            raise _http_error(status, f'injected failure for {method}')
+
+    def maybe_fail_message(self, msg_id: str):
+        """رفع HttpError إذا كانت الرسالة مجدولة للفشل"""
+        status = self._consume_failure(self.failing_ids, msg_id)
+        if status is not None:
+            raise _http_error(status, f'failure for {msg_id}')
+
+    def search(self, query: str = '', label_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        بحث مبسط يدعم is:unread والنص الحر في الموضوع والمقتطف
+
+        Args:
+            query: الاستعلام
+            label_ids: التصنيفات المطلوبة
+
+        Returns:
+            الرسائل المطابقة من الأحدث للأقدم
+        """
+        matched = []
+        terms = query.split()
+        for message in reversed(list(self.messages.values())):
+            labels = message.get('labelIds', [])
+            if label_ids and not all(label in labels for label in label_ids):
+                continue
+            if not all(self._matches(message, term) for term in terms):
+                continue
+            matched.append(message)
+        return matched
+
+    @staticmethod
+    def _matches(message: Dict[str, Any], term: str) -> bool:
+        if term == 'is:unread':
+            return 'UNREAD' in message.get('labelIds', [])
+        subject = next((h['value'] for h in message['payload']['headers']
+                        if h['name'] == 'Subject'), '')
+        return term.lower() in subject.lower() or term.lower() in message.get('snippet', '').lower()
+
+    def users(self) -> _UsersResource:
+        return _UsersResource(self)
+
+    def new_batch_http_request(self, callback: Optional[Callable] = None) -> _FakeBatch:
+        return _FakeBatch(self, callback)
@@ -0,0 +1,380 @@
+"""
+Full-Text Index - فهرس نصي كامل محلي للرسائل المخزنة
+SQLite FTS5 بنص مطبّع للعربية، تحديث تدريجي من MessageCache، ومحلل لصيغة بحث Gmail
+(from: و to: و subject: والعبارات والتواريخ)
+"""
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# إضافة المسار للوصول إلى modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.text import normalize, strip_arabic_prefix, tokenize
+
+# مشغلات Gmail المدعومة -> أعمدة FTS5
+FIELD_COLUMNS = {
+    'from': 'sender',
+    'to': 'recipients',
+    'cc': 'recipients',
+    'subject': 'subject',
+}
+_TOKEN_RE = re.compile(r'-?[\w.]+:"[^"]*"|-?"[^"]*"|\S+')
+_RELATIVE_RE = re.compile(r'^(\d+)([dmy])$')
+_RELATIVE_DAYS = {'d': 1, 'm': 30, 'y': 365}
+
+
+class UnsupportedQuery(ValueError):
+    """الاستعلام يحتوي على مشغل لا يدعمه الفهرس المحلي (يُرسل إلى Gmail API)"""
+
+
+class ParsedQuery:
+    """استعلام محلل: تعبير FTS5 للمطابقة، تعبير للاستبعاد، ومدى تاريخ"""
+
+    def __init__(self):
+        self.match: List[str] = []
+        self.exclude: List[str] = []
+        self.after: Optional[float] = None
+        self.before: Optional[float] = None
+
+    @property
+    def match_expression(self) -> str:
+        # في Gmail يرتبط OR أقوى من AND الضمني ("a b OR c" = a AND (b OR c)) بعكس FTS5،
+        # و FTS5 لا يقبل AND الضمني بجوار الأقواس، فتُكتب المجموعات و AND صراحة
+        groups: List[List[str]] = []
+        joined = False
+        for term in self.match:
+            if term == 'OR':
+                joined = bool(groups)
+            elif joined:
+                groups[-1].append(term)
+                joined = False
+            else:
+                groups.append([term])
+        return ' AND '.join(group[0] if len(group) == 1 else f"({' OR '.join(group)})"
+                            for group in groups)
+
+    @property
+    def exclude_expression(self) -> str:
+        return ' OR '.join(self.exclude)
+
+
+def _phrase(text: str, prefix: bool = False) -> Optional[str]:
+    """عبارة FTS5 من نص بعد تطبيعه (None إذا لم يبق منه شيء)"""
+    words = tokenize(text)
+    if not words:
+        return None
+    return '"' + ' '.join(words) + '"' + (' *' if prefix else '')
+
+
+def _parse_date(value: str) -> float:
+    """تاريخ Gmail (YYYY/MM/DD أو YYYY-MM-DD أو epoch) إلى epoch بالتوقيت المحلي"""
+    if value.isdigit():
+        return float(value)
+    try:
+        return datetime.strptime(value.replace('-', '/'), '%Y/%m/%d').timestamp()
+    except ValueError:
+        raise UnsupportedQuery(f"Invalid date: {value}")
+
+
+def parse_query(query: str, now: Optional[float] = None) -> ParsedQuery:
+    """
+    تحليل استعلام بصيغة Gmail
+
+    المدعوم: الكلمات والعبارات بين علامتي تنصيص، OR، الاستبعاد بـ -،
+    البادئات بـ *، from: و to: و cc: و subject:، و after: و before: و
+    newer_than: و older_than: (بالأيام d أو الأشهر m أو السنوات y).
+
+    Args:
+        query: الاستعلام
+        now: الوقت الحالي لـ newer_than/older_than (للاختبارات)
+
+    Returns:
+        ParsedQuery
+
+    Raises:
+        UnsupportedQuery: لمشغلات أخرى مثل is: و label: و has:
+    """
+    parsed = ParsedQuery()
+    now = time.time() if now is None else now
+    for token in _TOKEN_RE.findall(query):
+        token = token.replace('"', '')
+        if token == 'OR':
+            if parsed.match and parsed.match[-1] != 'OR':
+                parsed.match.append('OR')
+            continue
+
+        negate = token.startswith('-') and len(token) > 1
+        if negate:
+            token = token[1:]
+
+        operator, _, value = token.partition(':')
+        operator = operator.lower()
+        if value and operator in FIELD_COLUMNS:
+            phrase = _phrase(value, prefix=value.endswith('*'))
+            expression = f"{FIELD_COLUMNS[operator]} : {phrase}" if phrase else None
+        elif value and operator in ('after', 'before', 'newer_than', 'older_than'):
+            if negate:
+                raise UnsupportedQuery(f"Negated date filter: {token}")
+            if operator in ('after', 'before'):
+                timestamp = _parse_date(value)
+            else:
+                match = _RELATIVE_RE.match(value)
+                if not match:
+                    raise UnsupportedQuery(f"Invalid relative date: {value}")
+                days = int(match.group(1)) * _RELATIVE_DAYS[match.group(2)]
+                timestamp = now - timedelta(days=days).total_seconds()
+            if operator in ('after', 'newer_than'):
+                parsed.after = timestamp if parsed.after is None else max(parsed.after, timestamp)
+            else:
+                parsed.before = timestamp if parsed.before is None else min(parsed.before, timestamp)
+            continue
+        elif value and re.fullmatch(r'[a-z_]+', operator):
+            raise UnsupportedQuery(f"Unsupported operator: {operator}:")
+        else:
+            expression = _phrase(token, prefix=token.endswith('*'))
+            words = tokenize(token)
+            if expression and len(words) == 1 and not token.endswith('*'):
+                # "الاجتماع" تطابق أيضاً "اجتماع" عبر عمود stems
+                stem = strip_arabic_prefix(words[0])
+                if stem != words[0]:
+                    expression = f'({expression} OR stems : "{stem}")'
+
+        if expression:
+            (parsed.exclude if negate else parsed.match).append(expression)
+
+    while parsed.match and parsed.match[-1] == 'OR':
+        parsed.match.pop()
+    return parsed
+
+
+def message_timestamp(date: str) -> Optional[float]:
+    """ترويسة Date إلى epoch (None إذا تعذر تحليلها)"""
+    if not date:
+        return None
+    try:
+        return parsedate_to_datetime(date).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class FullTextIndex:
+    """
+    فهرس FTS5 للرسائل المخزنة
+
+    النصوص تُطبّع قبل الفهرسة (utils.text.normalize)، ويُضاف عمود stems
+    بالكلمات بدون أداة التعريف فتطابق "اجتماع" كلمة "الاجتماع". التواريخ في
+    جدول عادي مفهرس لتصفية المدى والترتيب من الأحدث.
+    """
+
+    def __init__(self, db_path: str = 'data/gmail-search.db'):
+        """
+        فتح الفهرس أو إنشاؤه
+
+        Args:
+            db_path: مسار قاعدة البيانات (':memory:' للتخزين في الذاكرة فقط)
+        """
+        self.db_path = db_path
+        if db_path != ':memory:' and os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        """إنشاء الجداول إن لم تكن موجودة"""
+        with self._lock, self._conn:
+            self._conn.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+                    sender, recipients, subject, body, stems,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS indexed (
+                    rowid INTEGER PRIMARY KEY,
+                    msg_id TEXT NOT NULL UNIQUE,
+                    date_ts REAL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_indexed_date ON indexed(date_ts)')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS index_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            ''')
+
+    # ================== الحالة ==================
+
+    def _get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM index_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key: str, value: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO index_state (key, value) VALUES (?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                (key, value),
+            )
+
+    @property
+    def watermark(self) -> Tuple[float, str]:
+        """(وقت الجلب، المعرف) لآخر رسالة فُهرست من المخزن"""
+        fetched_at, msg_id = self._get_state('fetched_at'), self._get_state('msg_id')
+        return (float(fetched_at) if fetched_at else 0.0, msg_id or '')
+
+    @property
+    def complete(self) -> bool:
+        """هل يغطي المخزن (وبالتالي الفهرس) الصندوق كاملاً بعد build_search_index"""
+        return self._get_state('complete') == '1'
+
+    @complete.setter
+    def complete(self, value: bool):
+        self._set_state('complete', '1' if value else '0')
+
+    # ================== التحديث ==================
+
+    @staticmethod
+    def _document(message: Dict[str, Any]) -> Tuple[str, ...]:
+        """أعمدة FTS5 لرسالة بعد التطبيع"""
+        fields = [
+            message.get('from') or '',
+            ' '.join(filter(None, [message.get('to'), message.get('cc')])),
+            message.get('subject') or '',
+            ' '.join(filter(None, [message.get('snippet'), message.get('body')])),
+        ]
+        stems = {strip_arabic_prefix(word) for field in fields for word in tokenize(field)}
+        return tuple(normalize(field) for field in fields) + (' '.join(sorted(stems)),)
+
+    def add(self, messages: Iterable[Dict[str, Any]]):
+        """
+        فهرسة رسائل أو إعادة فهرستها في معاملة واحدة
+
+        Args:
+            messages: الرسائل بصيغة MessageCache
+        """
+        with self._lock, self._conn:
+            for message in messages:
+                document = self._document(message)
+                date_ts = message_timestamp(message.get('date') or '')
+                row = self._conn.execute('SELECT rowid FROM indexed WHERE msg_id = ?',
+                                         (message['id'],)).fetchone()
+                if row:
+                    rowid = row[0]
+                    self._conn.execute('DELETE FROM documents WHERE rowid = ?', (rowid,))
+                    self._conn.execute('UPDATE indexed SET date_ts = ? WHERE rowid = ?',
+                                       (date_ts, rowid))
+                else:
+                    rowid = self._conn.execute('INSERT INTO indexed (msg_id, date_ts) VALUES (?, ?)',
+                                               (message['id'], date_ts)).lastrowid
+                self._conn.execute(
+                    'INSERT INTO documents (rowid, sender, recipients, subject, body, stems) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', (rowid,) + document)
+
+    def remove(self, msg_ids: Iterable[str]):
+        """حذف رسائل من الفهرس"""
+        with self._lock, self._conn:
+            for msg_id in msg_ids:
+                row = self._conn.execute('SELECT rowid FROM indexed WHERE msg_id = ?',
+                                         (msg_id,)).fetchone()
+                if row:
+                    self._conn.execute('DELETE FROM documents WHERE rowid = ?', (row[0],))
+                    self._conn.execute('DELETE FROM indexed WHERE rowid = ?', (row[0],))
+
+    def clear(self):
+        """مسح الفهرس وحالته"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM documents')
+            self._conn.execute('DELETE FROM indexed')
+            self._conn.execute('DELETE FROM index_state')
+
+    def update_from_cache(self, cache, batch_size: int = 1000) -> int:
+        """
+        فهرسة الرسائل الجديدة أو المعدلة في المخزن منذ آخر تحديث
+
+        Args:
+            cache: MessageCache
+            batch_size: عدد الرسائل في كل معاملة
+
+        Returns:
+            عدد الرسائل المفهرسة
+        """
+        indexed = 0
+        fetched_at, msg_id = self.watermark
+        while True:
+            messages = cache.changed_since(fetched_at, msg_id, limit=batch_size)
+            if not messages:
+                break
+            self.add(messages)
+            fetched_at, msg_id = messages[-1]['_fetched_at'], messages[-1]['id']
+            indexed += len(messages)
+        if indexed:
+            self._set_state('fetched_at', repr(fetched_at))
+            self._set_state('msg_id', msg_id)
+        return indexed
+
+    # ================== البحث ==================
+
+    def search(self, query: str, limit: int = 10, now: Optional[float] = None) -> List[str]:
+        """
+        البحث في الفهرس
+
+        Args:
+            query: استعلام بصيغة Gmail (انظر parse_query)
+            limit: أقصى عدد نتائج
+            now: الوقت الحالي لـ newer_than/older_than
+
+        Returns:
+            معرفات الرسائل من الأحدث للأقدم
+
+        Raises:
+            UnsupportedQuery: إذا احتوى الاستعلام على مشغل غير مدعوم
+        """
+        parsed = parse_query(query, now)
+        conditions, params = [], []
+        if parsed.match:
+            sql = 'SELECT i.msg_id FROM documents JOIN indexed i ON i.rowid = documents.rowid'
+            conditions.append('documents MATCH ?')
+            params.append(parsed.match_expression)
+        else:
+            sql = 'SELECT i.msg_id FROM indexed i'
+        if parsed.exclude:
+            conditions.append('i.rowid NOT IN (SELECT rowid FROM documents WHERE documents MATCH ?)')
+            params.append(parsed.exclude_expression)
+        if parsed.after is not None:
+            conditions.append('i.date_ts >= ?')
+            params.append(parsed.after)
+        if parsed.before is not None:
+            conditions.append('i.date_ts < ?')
+            params.append(parsed.before)
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY i.date_ts DESC LIMIT ?'
+        params.append(limit)
+
+        with self._lock:
+            try:
+                rows = self._conn.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as e:
+                # تعبير FTS5 غير صالح (مثل OR في بداية الاستعلام)
+                raise UnsupportedQuery(str(e))
+        return [row[0] for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM indexed').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -4,20 +4,29 @@ Gmail Integration - وحدة تكامل Gmail
 """
 import os
 import base64
+import json
 import pickle
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Iterator, Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import re
+import sys
+import threading
+import time
 
+# إضافة المسار للوصول إلى config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import config
+from integrations.message_cache import MessageCache
+from integrations.mime import HeaderIndex, extract_body
+from utils.rate_limit import TokenBucket, backoff_delay, call_with_backoff
+
+# بقية مكتبات Google (المصادقة و discovery و httplib2) تُستورد عند أول استخدام فقط
 try:
-    from google.auth.transport.requests import Request
-    from google.oauth2.credentials import Credentials
-    from google_auth_oauthlib.flow import InstalledAppFlow
-    from googleapiclient.discovery import build
     from googleapiclient.errors import HttpError
 except ImportError:
     print("⚠️  Warning: Google API libraries not installed.")
@@ -32,22 +41,212 @@ SCOPES = [
     'https://www.googleapis.com/auth/gmail.compose'
 ]
 
+# الحد الأقصى لعدد الطلبات في batch واحد حسب Gmail API
+MAX_BATCH_SIZE = 100
+
+# الحد الأقصى لحجم صفحة messages.list
+MAX_PAGE_SIZE = 500
+
+# الحد الأقصى لعدد المعرفات في batchModify/batchDelete
+BATCH_MODIFY_LIMIT = 1000
+
+# وحدات الحصة لكل طريقة حسب توثيق Gmail API
+QUOTA_UNITS = {
+    'messages.list': 5,
+    'messages.get': 5,
+    'messages.send': 100,
+    'messages.modify': 5,
+    'messages.trash': 5,
+    'messages.delete': 10,
+    'messages.batchModify': 50,
+    'messages.batchDelete': 50,
+    'history.list': 2,
+    'labels.list': 1,
+    'getProfile': 1,
+}
+DEFAULT_QUOTA_UNITS = 5
+
+# أخطاء HTTP المؤقتة التي تستحق إعادة المحاولة
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+# مستند discovery لكل (api, version) بعد تحليله، مشترك بين جميع المصادقات في العملية
+_DISCOVERY_DOCUMENTS: Dict[str, Dict[str, Any]] = {}
+_discovery_lock = threading.Lock()
+DISCOVERY_URL = 'https://gmail.googleapis.com/$discovery/rest?version={version}'
+
+
+def load_discovery_document(version: str = 'v1') -> Optional[Dict[str, Any]]:
+    """
+    مستند discovery الخاص بـ Gmail API
+
+    يُبحث عنه بالترتيب: الذاكرة، ثم النسخة المحفوظة على القرص (GMAIL_DISCOVERY_CACHE)،
+    ثم النسخة المرفقة مع googleapiclient، ثم الشبكة مع حفظه على القرص.
+
+    Args:
+        version: إصدار الـ API
+
+    Returns:
+        المستند كقاموس أو None إذا تعذر الحصول عليه
+    """
+    with _discovery_lock:
+        document = _DISCOVERY_DOCUMENTS.get(version)
+        if document is not None:
+            return document
+
+        path = config.GMAIL_DISCOVERY_CACHE.format(version=version) if config.GMAIL_DISCOVERY_CACHE else ''
+        content = None
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+
+        if content is None:
+            try:
+                from googleapiclient.discovery_cache import get_static_doc
+                content = get_static_doc('gmail', version)
+            except ImportError:
+                content = None
+
+        if content is None:
+            try:
+                import httplib2
+                response, body = httplib2.Http(timeout=30).request(DISCOVERY_URL.format(version=version))
+                if response.status != 200:
+                    return None
+                content = body.decode('utf-8')
+            except Exception as e:
+                print(f"⚠️  Could not fetch Gmail discovery document: {e}")
+                return None
+            if path:
+                if os.path.dirname(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+
+        document = _DISCOVERY_DOCUMENTS[version] = json.loads(content)
+        return document
+
+
+def build_gmail_service(credentials, version: str = 'v1'):
+    """
+    إنشاء خدمة Gmail من مستند discovery المخزن بدلاً من تحميله وتحليله في كل مرة
+
+    Args:
+        credentials: بيانات اعتماد Google
+        version: إصدار الـ API
+
+    Returns:
+        كائن الخدمة
+    """
+    from googleapiclient.discovery import build, build_from_document
+
+    document = load_discovery_document(version)
+    if document is None:
+        return build('gmail', version, credentials=credentials)
+    return build_from_document(document, credentials=credentials)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """هل الخطأ مؤقت (تجاوز المعدل أو خطأ خادم)"""
+    if not isinstance(error, HttpError):
+        return False
+    status = int(error.resp.status)
+    if status in RETRYABLE_STATUSES:
+        return True
+    return status == 403 and 'ratelimitexceeded' in str(error).lower()
+
+
+# الترويسات التي نطلبها عند الجلب بصيغة metadata
+METADATA_HEADERS = ['Subject', 'From', 'To', 'Cc', 'Date', 'Message-ID', 'References',
+                    'List-Unsubscribe']
+
+# صيغ الجلب المدعومة من Gmail API
+MESSAGE_FORMATS = ('full', 'metadata', 'minimal')
+
+
+class GmailMessage(dict):
+    """
+    رسالة Gmail بتحميل كسول للنص
+
+    تتصرف كقاموس عادي (message['subject'], message.get('labels')...)، لكن
+    مفتاح 'body' لا يُجلب ولا يُفك ترميزه إلا عند قراءته لأول مرة.
+    """
+
+    def __init__(self, data: Dict[str, Any], body_loader=None):
+        """
+        تهيئة الرسالة
+
+        Args:
+            data: بيانات الرسالة بدون النص (أو معه إن كان محملاً)
+            body_loader: دالة بدون معاملات تعيد نص الرسالة عند الحاجة
+        """
+        super().__init__(data)
+        self._body_loader = body_loader
+
+    def __missing__(self, key):
+        if key == 'body' and self._body_loader is not None:
+            loader, self._body_loader = self._body_loader, None
+            self['body'] = loader()
+            return self['body']
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    @property
+    def body(self) -> str:
+        """نص الرسالة (يُحمّل عند أول قراءة)"""
+        return self['body']
+
+    @property
+    def body_loaded(self) -> bool:
+        """هل تم تحميل النص بالفعل"""
+        return dict.__contains__(self, 'body')
+
 
 class GmailIntegration:
     """فئة تكامل Gmail"""
 
-    def __init__(self, credentials_file: str = 'credentials.json', token_file: str = 'token.pickle'):
+    def __init__(self, credentials_file: str = 'credentials.json', token_file: str = 'token.pickle',
+                 cache: Optional[MessageCache] = None, cache_max_age: Optional[float] = None,
+                 max_workers: Optional[int] = None,
+                 quota_units_per_second: Optional[float] = None):
         """
         تهيئة تكامل Gmail
 
         Args:
             credentials_file: ملف بيانات اعتماد OAuth 2.0
             token_file: ملف حفظ التوكن
+            cache: مخزن رسائل محلي تُقرأ منه الرسائل قبل الرجوع إلى API
+            cache_max_age: أقصى عمر (بالثواني) للمخزن قبل مزامنته عبر history API
+                (افتراضياً GMAIL_CACHE_MAX_AGE، و0 للمزامنة قبل كل قراءة)
+            max_workers: عدد الطلبات المتزامنة إلى API (افتراضياً GMAIL_MAX_WORKERS)
+            quota_units_per_second: حد وحدات الحصة في الثانية لكل مستخدم
+                (افتراضياً GMAIL_QUOTA_UNITS_PER_SECOND، و0 لتعطيل التحديد)
         """
         self.credentials_file = credentials_file
         self.token_file = token_file
         self.service = None
         self.user_email = None
+        self.cache = cache
+        self._credentials = None
+        self._local = threading.local()
+
+        # طبقة التنفيذ المتزامن: مجمع خيوط محدود + محدد معدل + إعادة المحاولة
+        self.max_workers = max_workers or config.GMAIL_MAX_WORKERS
+        if quota_units_per_second is None:
+            quota_units_per_second = config.GMAIL_QUOTA_UNITS_PER_SECOND
+        self.rate_limiter = TokenBucket(quota_units_per_second) if quota_units_per_second > 0 else None
+        self.max_retries = config.GMAIL_MAX_RETRIES
+        self.backoff_base = config.GMAIL_BACKOFF_BASE
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self.cache_max_age = config.GMAIL_CACHE_MAX_AGE if cache_max_age is None else cache_max_age
+        # (historyId، عدد غير المقروءة) من آخر get_statistics
+        self._unread_estimate: Optional[tuple] = None
 
     def authenticate(self) -> bool:
         """
@@ -67,6 +266,7 @@ class GmailIntegration:
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
                 try:
+                    from google.auth.transport.requests import Request
                     creds.refresh(Request())
                 except Exception as e:
                     print(f"⚠️  Error refreshing token: {e}")
@@ -79,6 +279,7 @@ class GmailIntegration:
                     return False
 
                 try:
+                    from google_auth_oauthlib.flow import InstalledAppFlow
                     flow = InstalledAppFlow.from_client_secrets_file(
                         self.credentials_file, SCOPES)
                     creds = flow.run_local_server(port=0)
@@ -91,9 +292,10 @@ class GmailIntegration:
                 pickle.dump(creds, token)
 
         try:
-            self.service = build('gmail', 'v1', credentials=creds)
+            self.service = build_gmail_service(creds)
+            self._credentials = creds
             # الحصول على البريد الإلكتروني للمستخدم
-            profile = self.service.users().getProfile(userId='me').execute()
+            profile = self._execute(self.service.users().getProfile(userId='me'))
             self.user_email = profile.get('emailAddress')
             return True
         except Exception as e:
@@ -103,7 +305,8 @@ class GmailIntegration:
     # ================== قراءة البريد ==================
 
     def list_messages(self, query: str = '', max_results: int = 10,
-                     label_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+                     label_ids: Optional[List[str]] = None,
+                     batch: bool = True, format: str = 'metadata') -> List[Dict[str, Any]]:
         """
         قائمة الرسائل بناءً على استعلام
 
@@ -111,6 +314,8 @@ class GmailIntegration:
             query: استعلام البحث (مثل: "is:unread", "from:example@gmail.com")
             max_results: الحد الأقصى لعدد الرسائل
             label_ids: قائمة معرفات التصنيفات (مثل: ['INBOX', 'UNREAD'])
+            batch: جلب التفاصيل عبر طلبات batch بدلاً من طلب لكل رسالة
+            format: صيغة الجلب ('metadata' افتراضياً مع تحميل كسول للنص، أو 'full'/'minimal')
 
         Returns:
             قائمة الرسائل
@@ -119,24 +324,26 @@ class GmailIntegration:
             print("❌ Not authenticated. Call authenticate() first.")
             return []
 
-        try:
-            params = {
-                'userId': 'me',
-                'maxResults': max_results,
-            }
-
-            if query:
-                params['q'] = query
-
-            if label_ids:
-                params['labelIds'] = label_ids
+        self.ensure_synced()
 
-            results = self.service.users().messages().list(**params).execute()
-            messages = results.get('messages', [])
+        try:
+            page_size = min(max_results, MAX_PAGE_SIZE)
+            msg_ids = []
+            page_token = None
+            while len(msg_ids) < max_results:
+                response = self._list_page(query, label_ids, page_size, page_token)
+                msg_ids.extend(msg['id'] for msg in response.get('messages', []))
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+            msg_ids = msg_ids[:max_results]
+
+            if batch:
+                return self.get_messages_batch(msg_ids, format=format)['messages']
 
             detailed_messages = []
-            for msg in messages:
-                detailed_msg = self.get_message(msg['id'])
+            for msg_id in msg_ids:
+                detailed_msg = self.get_message(msg_id, format=format)
                 if detailed_msg:
                     detailed_messages.append(detailed_msg)
 
@@ -146,12 +353,242 @@ class GmailIntegration:
             print(f"❌ An error occurred: {error}")
             return []
 
-    def get_message(self, msg_id: str) -> Optional[Dict[str, Any]]:
+    def iter_messages(self, query: str = '', page_size: int = 100, limit: Optional[int] = None,
+                      label_ids: Optional[List[str]] = None, format: str = 'metadata',
+                      fetch_details: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        المرور على جميع نتائج استعلام عبر كل الصفحات بذاكرة محدودة
+
+        تُعاد الرسائل صفحة بصفحة فور وصولها، بينما تُجلب الصفحة التالية في
+        الخلفية أثناء معالجة المستدعي للصفحة الحالية.
+
+        Args:
+            query: استعلام البحث
+            page_size: عدد الرسائل في كل صفحة (الحد الأقصى 500)
+            limit: الحد الأقصى الكلي لعدد الرسائل (None = جميع الرسائل)
+            label_ids: قائمة معرفات التصنيفات
+            format: صيغة جلب التفاصيل ('metadata' افتراضياً مع تحميل كسول للنص)
+            fetch_details: False لإعادة {'id', 'threadId'} فقط بدون جلب التفاصيل
+
+        Yields:
+            الرسائل واحدة تلو الأخرى
+        """
+        if not self.service:
+            print("❌ Not authenticated. Call authenticate() first.")
+            return
+
+        self.ensure_synced()
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+        def fetch_page(page_token: Optional[str], remaining: Optional[int]):
+            size = page_size if remaining is None else min(page_size, remaining)
+            response = self._list_page(query, label_ids, size, page_token)
+            stubs = response.get('messages', [])
+            if fetch_details:
+                stubs = self.get_messages_batch([m['id'] for m in stubs], format=format)['messages']
+            return stubs, response.get('nextPageToken')
+
+        yielded = 0
+        prefetcher = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = prefetcher.submit(fetch_page, None, limit)
+            while future is not None:
+                try:
+                    records, next_token = future.result()
+                except HttpError as error:
+                    print(f"❌ An error occurred: {error}")
+                    return
+
+                if limit is not None:
+                    records = records[:limit - yielded]
+                yielded += len(records)
+
+                future = None
+                if next_token and (limit is None or yielded < limit):
+                    remaining = None if limit is None else limit - yielded
+                    future = prefetcher.submit(fetch_page, next_token, remaining)
+
+                yield from records
+        finally:
+            prefetcher.shutdown(wait=False, cancel_futures=True)
+
+    def _list_page(self, query: str, label_ids: Optional[List[str]], page_size: int,
+                   page_token: Optional[str] = None) -> Dict[str, Any]:
+        """جلب صفحة واحدة من messages.list"""
+        params = {
+            'userId': 'me',
+            'maxResults': page_size,
+        }
+
+        if query:
+            params['q'] = query
+
+        if label_ids:
+            params['labelIds'] = label_ids
+
+        if page_token:
+            params['pageToken'] = page_token
+
+        return self._execute(self.service.users().messages().list(**params))
+
+    def _execute(self, request, units: Optional[int] = None):
+        """
+        تنفيذ طلب API أو batch مع تحديد المعدل وإعادة المحاولة
+
+        Args:
+            request: طلب HttpRequest أو BatchHttpRequest
+            units: وحدات الحصة التي يستهلكها الطلب (تُستنتج من methodId إن لم تُحدد)
+
+        Returns:
+            استجابة الطلب
+
+        Raises:
+            HttpError إذا فشل الطلب بخطأ دائم أو بعد استنفاد المحاولات
+        """
+        if units is None:
+            method = getattr(request, 'methodId', '').replace('gmail.users.', '', 1)
+            units = QUOTA_UNITS.get(method, DEFAULT_QUOTA_UNITS)
+
+        def attempt():
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(units)
+            return request.execute(http=self._thread_http())
+
+        return call_with_backoff(attempt, _is_retryable, self.max_retries, self.backoff_base)
+
+    def run_concurrently(self, calls: List[Callable[[], Any]]) -> List[Any]:
+        """
+        تنفيذ عدة استدعاءات I/O على مجمع خيوط محدود بـ max_workers
+
+        Args:
+            calls: دوال بدون معاملات
+
+        Returns:
+            النتائج بنفس ترتيب الدوال (يُعاد رفع أول خطأ)
+        """
+        if len(calls) <= 1 or self.max_workers <= 1:
+            return [call() for call in calls]
+
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='gmail-io')
+        futures = [self._pool.submit(call) for call in calls]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """إيقاف مجمع الخيوط"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def _thread_http(self):
+        """
+        اتصال HTTP مصرح لكل خيط
+
+        httplib2 غير آمن للاستخدام من عدة خيوط، لذلك يستخدم الخيط الرئيسي
+        اتصال الخدمة الافتراضي (None) ويحصل كل خيط آخر على اتصاله الخاص.
+        """
+        if self._credentials is None or threading.current_thread() is threading.main_thread():
+            return None
+
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
+            http = AuthorizedHttp(self._credentials, http=httplib2.Http())
+            self._local.http = http
+        return http
+
+    def get_messages_batch(self, msg_ids: List[str], batch_size: Optional[int] = None,
+                           format: str = 'metadata') -> Dict[str, Any]:
+        """
+        جلب تفاصيل عدة رسائل عبر طلبات batch متعددة الأجزاء
+
+        Args:
+            msg_ids: معرفات الرسائل
+            batch_size: عدد الطلبات في كل batch (افتراضياً GMAIL_BATCH_SIZE)
+            format: صيغة الجلب ('metadata' أو 'full' أو 'minimal')
+
+        Returns:
+            قاموس يحتوي على 'messages' (بنفس ترتيب المعرفات) و 'errors'
+            (معرف الرسالة -> سبب الفشل) للرسائل التي فشل جلبها
+        """
+        result: Dict[str, Any] = {'messages': [], 'errors': {}}
+        if not self.service:
+            print("❌ Not authenticated. Call authenticate() first.")
+            return result
+
+        batch_size = max(1, min(batch_size or config.GMAIL_BATCH_SIZE, MAX_BATCH_SIZE))
+        fetched: Dict[str, Dict[str, Any]] = {}
+        errors: Dict[str, Exception] = {}
+        # رسائل فشل الـ batch الخاص بها بعد استنفاد محاولات _execute
+        exhausted = set()
+
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                errors[request_id] = exception
+            else:
+                errors.pop(request_id, None)
+                fetched[request_id] = self._parse_message(response, format)
+
+        def run_chunk(chunk: List[str]):
+            batch = self.service.new_batch_http_request(callback=on_response)
+            for msg_id in chunk:
+                batch.add(self._get_request(msg_id, format), request_id=msg_id)
+            try:
+                self._execute(batch, units=len(chunk) * QUOTA_UNITS['messages.get'])
+            except HttpError as error:
+                for msg_id in chunk:
+                    if msg_id not in fetched:
+                        errors[msg_id] = error
+                        exhausted.add(msg_id)
+
+        def fetch(ids: List[str]):
+            self.run_concurrently([
+                lambda chunk=ids[start:start + batch_size]: run_chunk(chunk)
+                for start in range(0, len(ids), batch_size)
+            ])
+
+        unique_ids = list(dict.fromkeys(msg_ids))
+
+        # الرسائل الموجودة في المخزن المحلي لا تحتاج إلى طلب
+        if self.cache is not None and format != 'minimal':
+            for msg_id, cached in self.cache.get_many(unique_ids).items():
+                if format == 'metadata' or 'body' in cached:
+                    fetched[msg_id] = self._from_cache(cached)
+
+        missing_ids = [msg_id for msg_id in unique_ids if msg_id not in fetched]
+        fetch(missing_ids)
+
+        # إعادة محاولة الطلبات الفرعية التي فشلت بخطأ مؤقت (429/5xx) فقط
+        for attempt in range(self.max_retries):
+            retry_ids = [msg_id for msg_id, error in errors.items()
+                         if msg_id not in exhausted and _is_retryable(error)]
+            if not retry_ids:
+                break
+            time.sleep(backoff_delay(attempt, self.backoff_base))
+            fetch(retry_ids)
+
+        if errors:
+            print(f"⚠️  Failed to fetch {len(errors)} of {len(unique_ids)} messages")
+
+        if self.cache is not None and format != 'minimal':
+            self.cache.put_many(fetched[msg_id] for msg_id in missing_ids if msg_id in fetched)
+
+        result['messages'] = [fetched[msg_id] for msg_id in msg_ids if msg_id in fetched]
+        result['errors'] = {msg_id: str(error) for msg_id, error in errors.items()}
+        return result
+
+    def get_message(self, msg_id: str, format: str = 'metadata') -> Optional[Dict[str, Any]]:
         """
         الحصول على تفاصيل رسالة معينة
 
         Args:
             msg_id: معرف الرسالة
+            format: صيغة الجلب. 'metadata' (افتراضياً) تجلب الترويسات المطلوبة فقط
+                ويُحمّل النص عند أول قراءة لـ message['body']، و'full' تجلب النص فوراً،
+                و'minimal' تجلب المعرفات والتصنيفات والمقتطف فقط
 
         Returns:
             تفاصيل الرسالة
@@ -160,63 +597,181 @@ class GmailIntegration:
             print("❌ Not authenticated. Call authenticate() first.")
             return None
 
+        if self.cache is not None and format != 'minimal':
+            self.ensure_synced()
+            cached = self.cache.get(msg_id)
+            if cached and (format == 'metadata' or 'body' in cached):
+                return self._from_cache(cached)
+
+        try:
+            message = self._execute(self._get_request(msg_id, format))
+            parsed = self._parse_message(message, format)
+            if self.cache is not None and format != 'minimal':
+                self.cache.put(parsed)
+            return parsed
+
+        except HttpError as error:
+            print(f"❌ An error occurred: {error}")
+            return None
+
+    def _get_request(self, msg_id: str, format: str = 'metadata'):
+        """بناء طلب messages.get بالصيغة المطلوبة"""
+        if format not in MESSAGE_FORMATS:
+            raise ValueError(f"Unknown message format: {format}")
+
+        params = {'userId': 'me', 'id': msg_id, 'format': format}
+        if format == 'metadata':
+            params['metadataHeaders'] = METADATA_HEADERS
+        return self.service.users().messages().get(**params)
+
+    def _parse_message(self, message: Dict[str, Any], format: str = 'full') -> GmailMessage:
+        """تحويل استجابة API (بالصيغة format) إلى رسالة GmailMessage"""
+        msg_id = message['id']
+        payload = message.get('payload', {})
+
+        # استخراج المعلومات المهمة (الفهرس يمر على الترويسات مرة واحدة)
+        headers = HeaderIndex(payload.get('headers', []))
+
+        data = {
+            'id': msg_id,
+            'threadId': message.get('threadId'),
+            'subject': headers.get('subject', 'No Subject'),
+            'from': headers.get('from', 'Unknown'),
+            'to': headers.get('to'),
+            'cc': headers.get('cc'),
+            'date': headers.get('date'),
+            'messageId': headers.get('message-id'),
+            'references': headers.get('references'),
+            'listUnsubscribe': headers.get('list-unsubscribe'),
+            'snippet': message.get('snippet', ''),
+            'labels': message.get('labelIds', []),
+            'size': message.get('sizeEstimate'),
+        }
+
+        # النص متاح فقط في الصيغة الكاملة، وإلا يُحمّل عند الحاجة
+        if format == 'full':
+            data['body'] = self._get_message_body(message)
+            return GmailMessage(data)
+
+        return GmailMessage(data, body_loader=lambda: self._load_body(msg_id, data['snippet']))
+
+    def _load_body(self, msg_id: str, fallback: str = '') -> str:
+        """جلب النص الكامل لرسالة وفك ترميزه"""
         try:
-            message = self.service.users().messages().get(
-                userId='me', id=msg_id, format='full'
-            ).execute()
-
-            # استخراج المعلومات المهمة
-            headers = message['payload']['headers']
-            subject = next((h['value'] for h in headers if h['name'].lower() == 'subject'), 'No Subject')
-            sender = next((h['value'] for h in headers if h['name'].lower() == 'from'), 'Unknown')
-            date = next((h['value'] for h in headers if h['name'].lower() == 'date'), '')
-            to = next((h['value'] for h in headers if h['name'].lower() == 'to'), '')
-
-            # استخراج نص الرسالة
+            message = self._execute(self._get_request(msg_id, 'full'))
             body = self._get_message_body(message)
+            if self.cache is not None:
+                self.cache.set_body(msg_id, body)
+            return body
+        except HttpError as error:
+            print(f"❌ An error occurred: {error}")
+            return fallback
 
-            return {
-                'id': msg_id,
-                'threadId': message.get('threadId'),
-                'subject': subject,
-                'from': sender,
-                'to': to,
-                'date': date,
-                'snippet': message.get('snippet', ''),
-                'body': body,
-                'labels': message.get('labelIds', []),
-            }
+    def get_cached_messages(self, msg_ids: List[str]) -> List[GmailMessage]:
+        """
+        رسائل من المخزن المحلي فقط، بدون مزامنة أو طلبات API
+
+        Args:
+            msg_ids: معرفات الرسائل
+
+        Returns:
+            الرسائل الموجودة في المخزن بنفس ترتيب msg_ids
+        """
+        if self.cache is None:
+            return []
+        cached = self.cache.get_many(msg_ids)
+        return [self._from_cache(cached[msg_id]) for msg_id in msg_ids if msg_id in cached]
+
+    def _from_cache(self, cached: Dict[str, Any]) -> GmailMessage:
+        """بناء GmailMessage من رسالة مخزنة محلياً"""
+        if 'body' in cached:
+            return GmailMessage(cached)
+        msg_id, snippet = cached['id'], cached.get('snippet', '')
+        return GmailMessage(cached, body_loader=lambda: self._load_body(msg_id, snippet))
+
+    # ================== المزامنة مع المخزن المحلي ==================
+
+    def ensure_synced(self):
+        """مزامنة المخزن المحلي إذا تجاوز عمره cache_max_age"""
+        if self.cache is not None and self.cache.is_stale(self.cache_max_age):
+            self.sync()
+
+    def sync(self) -> Dict[str, int]:
+        """
+        مزامنة تزايدية للمخزن المحلي عبر Gmail history API
+
+        تُنقل فقط التغييرات منذ آخر historyId محفوظ: الرسائل الجديدة تُجلب
+        بصيغة metadata، والمحذوفة تُزال، وتغييرات التصنيفات تُطبق محلياً.
+
+        Returns:
+            إحصائيات المزامنة (added, deleted, labels_changed)
+        """
+        stats = {'added': 0, 'deleted': 0, 'labels_changed': 0}
+        if not self.service or self.cache is None:
+            return stats
+
+        start_history_id = self.cache.history_id
+        try:
+            if not start_history_id:
+                # أول مزامنة: نبدأ التتبع من الحالة الحالية للصندوق
+                profile = self._execute(self.service.users().getProfile(userId='me'))
+                self.cache.history_id = profile['historyId']
+                return stats
+
+            added: List[str] = []
+            deleted = set()
+            latest_history_id = start_history_id
+            page_token = None
+
+            while True:
+                params = {'userId': 'me', 'startHistoryId': start_history_id}
+                if page_token:
+                    params['pageToken'] = page_token
+                response = self._execute(self.service.users().history().list(**params))
+
+                for record in response.get('history', []):
+                    for item in record.get('messagesAdded', []):
+                        added.append(item['message']['id'])
+                    for item in record.get('messagesDeleted', []):
+                        deleted.add(item['message']['id'])
+                    for item in record.get('labelsAdded', []):
+                        self.cache.update_labels([item['message']['id']], add=item['labelIds'])
+                        stats['labels_changed'] += 1
+                    for item in record.get('labelsRemoved', []):
+                        self.cache.update_labels([item['message']['id']], remove=item['labelIds'])
+                        stats['labels_changed'] += 1
+
+                latest_history_id = response.get('historyId', latest_history_id)
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+
+            if deleted:
+                self.cache.delete(deleted)
+            new_ids = [msg_id for msg_id in dict.fromkeys(added) if msg_id not in deleted]
+            if new_ids:
+                self.get_messages_batch(new_ids)
+
+            stats['added'] = len(new_ids)
+            stats['deleted'] = len(deleted)
+            self.cache.history_id = latest_history_id
+            return stats
 
         except HttpError as error:
+            if error.resp.status == 404:
+                # historyId قديم جداً ولم يعد متاحاً: نعيد بناء المخزن من جديد
+                print("⚠️  Cache history expired, resetting local cache")
+                self.cache.clear()
+                return self.sync()
             print(f"❌ An error occurred: {error}")
-            return None
+            return stats
 
     def _get_message_body(self, message: Dict) -> str:
-        """استخراج نص الرسالة من البيانات"""
+        """استخراج نص الرسالة من البيانات (بحد أقصى GMAIL_BODY_MAX_BYTES بايت)"""
         try:
-            if 'parts' in message['payload']:
-                parts = message['payload']['parts']
-                body = ''
-                for part in parts:
-                    if part['mimeType'] == 'text/plain':
-                        if 'data' in part['body']:
-                            body = base64.urlsafe_b64decode(
-                                part['body']['data']
-                            ).decode('utf-8')
-                            break
-                    elif part['mimeType'] == 'text/html' and not body:
-                        if 'data' in part['body']:
-                            html_body = base64.urlsafe_b64decode(
-                                part['body']['data']
-                            ).decode('utf-8')
-                            # إزالة علامات HTML
-                            body = re.sub('<[^<]+?>', '', html_body)
+            body = extract_body(message['payload'], config.GMAIL_BODY_MAX_BYTES or None)
+            if body:
                 return body
-            else:
-                if 'data' in message['payload']['body']:
-                    return base64.urlsafe_b64decode(
-                        message['payload']['body']['data']
-                    ).decode('utf-8')
         except Exception as e:
             print(f"⚠️  Error extracting body: {e}")
 
@@ -288,10 +843,10 @@ class GmailIntegration:
                 message.as_bytes()
             ).decode('utf-8')
 
-            sent_message = self.service.users().messages().send(
+            sent_message = self._execute(self.service.users().messages().send(
                 userId='me',
                 body={'raw': raw_message}
-            ).execute()
+            ))
 
             print(f"✅ Message sent successfully! ID: {sent_message['id']}")
             return sent_message
@@ -318,32 +873,41 @@ class GmailIntegration:
             return None
 
         try:
-            # الحصول على الرسالة الأصلية
+            # الحصول على الرسالة الأصلية (ترويساتها من نفس فهرس get_message)
             original = self.get_message(msg_id)
+            if original and original.get('messageId') is None:
+                # رسالة مخزنة قبل إضافة ترويسات الرد إلى المخزن
+                original = self._parse_message(self._execute(self._get_request(msg_id)), 'metadata')
             if not original:
                 return None
 
             message = MIMEText(body)
             message['to'] = original['from']
-            message['subject'] = f"Re: {original['subject']}"
-            message['In-Reply-To'] = msg_id
-            message['References'] = msg_id
-
-            if reply_all and original.get('to'):
+            subject = original['subject']
+            message['subject'] = subject if subject.lower().startswith('re:') else f"Re: {subject}"
+            # ربط الرد بالمحادثة حسب RFC 5322 عبر Message-ID الأصلي
+            parent_id = original.get('messageId')
+            if parent_id:
+                message['In-Reply-To'] = parent_id
+                message['References'] = ' '.join(filter(None, [original.get('references'), parent_id]))
+
+            if reply_all:
                 # إضافة المستلمين الآخرين
-                message['cc'] = original['to']
+                cc = ', '.join(filter(None, [original.get('to'), original.get('cc')]))
+                if cc:
+                    message['cc'] = cc
 
             raw_message = base64.urlsafe_b64encode(
                 message.as_bytes()
             ).decode('utf-8')
 
-            sent_message = self.service.users().messages().send(
+            sent_message = self._execute(self.service.users().messages().send(
                 userId='me',
                 body={
                     'raw': raw_message,
                     'threadId': original['threadId']
                 }
-            ).execute()
+            ))
 
             print(f"✅ Reply sent successfully!")
             return sent_message
@@ -368,11 +932,13 @@ class GmailIntegration:
             return False
 
         try:
-            self.service.users().messages().modify(
+            self._execute(self.service.users().messages().modify(
                 userId='me',
                 id=msg_id,
                 body={'removeLabelIds': ['UNREAD']}
-            ).execute()
+            ))
+            if self.cache is not None:
+                self.cache.update_labels([msg_id], remove=['UNREAD'])
             return True
         except HttpError as error:
             print(f"❌ An error occurred: {error}")
@@ -392,11 +958,13 @@ class GmailIntegration:
             return False
 
         try:
-            self.service.users().messages().modify(
+            self._execute(self.service.users().messages().modify(
                 userId='me',
                 id=msg_id,
                 body={'addLabelIds': ['UNREAD']}
-            ).execute()
+            ))
+            if self.cache is not None:
+                self.cache.update_labels([msg_id], add=['UNREAD'])
             return True
         except HttpError as error:
             print(f"❌ An error occurred: {error}")
@@ -418,13 +986,19 @@ class GmailIntegration:
 
         try:
             if permanent:
-                self.service.users().messages().delete(
+                self._execute(self.service.users().messages().delete(
                     userId='me', id=msg_id
-                ).execute()
+                ))
             else:
-                self.service.users().messages().trash(
+                self._execute(self.service.users().messages().trash(
                     userId='me', id=msg_id
-                ).execute()
+                ))
+
+            if self.cache is not None:
+                if permanent:
+                    self.cache.delete([msg_id])
+                else:
+                    self.cache.update_labels([msg_id], add=['TRASH'])
 
             print(f"✅ Message {'permanently deleted' if permanent else 'moved to trash'}")
             return True
@@ -447,16 +1021,103 @@ class GmailIntegration:
             return False
 
         try:
-            self.service.users().messages().modify(
+            self._execute(self.service.users().messages().modify(
                 userId='me',
                 id=msg_id,
                 body={'addLabelIds': [label_id]}
-            ).execute()
+            ))
+            if self.cache is not None:
+                self.cache.update_labels([msg_id], add=[label_id])
             return True
         except HttpError as error:
             print(f"❌ An error occurred: {error}")
             return False
 
+    # ================== عمليات جماعية ==================
+
+    def batch_modify(self, msg_ids: List[str], add_labels: Optional[List[str]] = None,
+                     remove_labels: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        تعديل تصنيفات عدة رسائل عبر messages.batchModify
+
+        تُقسم المعرفات إلى دفعات بحد API الأقصى (1000 رسالة لكل استدعاء).
+
+        Args:
+            msg_ids: معرفات الرسائل
+            add_labels: التصنيفات المراد إضافتها
+            remove_labels: التصنيفات المراد إزالتها
+
+        Returns:
+            نتيجة كل دفعة: {'ids': [...], 'success': bool, 'error': str أو None}
+        """
+        body = {}
+        if add_labels:
+            body['addLabelIds'] = add_labels
+        if remove_labels:
+            body['removeLabelIds'] = remove_labels
+
+        def run(chunk: List[str]):
+            self._execute(self.service.users().messages().batchModify(
+                userId='me', body={'ids': chunk, **body}
+            ))
+            if self.cache is not None:
+                self.cache.update_labels(chunk, add=add_labels, remove=remove_labels)
+
+        return self._run_chunked(msg_ids, run)
+
+    def batch_mark_as_read(self, msg_ids: List[str]) -> List[Dict[str, Any]]:
+        """وضع علامة مقروء على عدة رسائل"""
+        return self.batch_modify(msg_ids, remove_labels=['UNREAD'])
+
+    def batch_mark_as_unread(self, msg_ids: List[str]) -> List[Dict[str, Any]]:
+        """وضع علامة غير مقروء على عدة رسائل"""
+        return self.batch_modify(msg_ids, add_labels=['UNREAD'])
+
+    def batch_add_label(self, msg_ids: List[str], label_id: str) -> List[Dict[str, Any]]:
+        """إضافة تصنيف لعدة رسائل"""
+        return self.batch_modify(msg_ids, add_labels=[label_id])
+
+    def batch_delete_messages(self, msg_ids: List[str],
+                              permanent: bool = False) -> List[Dict[str, Any]]:
+        """
+        حذف عدة رسائل
+
+        Args:
+            msg_ids: معرفات الرسائل
+            permanent: حذف نهائي عبر batchDelete (True) أو نقل إلى المهملات (False)
+
+        Returns:
+            نتيجة كل دفعة: {'ids': [...], 'success': bool, 'error': str أو None}
+        """
+        if not permanent:
+            return self.batch_modify(msg_ids, add_labels=['TRASH'])
+
+        def run(chunk: List[str]):
+            self._execute(self.service.users().messages().batchDelete(
+                userId='me', body={'ids': chunk}
+            ))
+            if self.cache is not None:
+                self.cache.delete(chunk)
+
+        return self._run_chunked(msg_ids, run)
+
+    def _run_chunked(self, msg_ids: List[str], run) -> List[Dict[str, Any]]:
+        """تنفيذ عملية جماعية على دفعات بحجم BATCH_MODIFY_LIMIT مع نتيجة لكل دفعة"""
+        if not self.service:
+            return []
+
+        msg_ids = list(dict.fromkeys(msg_ids))
+        results = []
+        for start in range(0, len(msg_ids), BATCH_MODIFY_LIMIT):
+            chunk = msg_ids[start:start + BATCH_MODIFY_LIMIT]
+            try:
+                run(chunk)
+                results.append({'ids': chunk, 'success': True, 'error': None})
+            except HttpError as error:
+                print(f"❌ An error occurred: {error}")
+                results.append({'ids': chunk, 'success': False, 'error': str(error)})
+        return results
+
     def get_labels(self) -> List[Dict[str, Any]]:
         """
         الحصول على جميع التصنيفات
@@ -468,7 +1129,7 @@ class GmailIntegration:
             return []
 
         try:
-            results = self.service.users().labels().list(userId='me').execute()
+            results = self._execute(self.service.users().labels().list(userId='me'))
             return results.get('labels', [])
         except HttpError as error:
             print(f"❌ An error occurred: {error}")
@@ -480,6 +1141,9 @@ class GmailIntegration:
         """
         الحصول على إحصائيات البريد
 
+        عدد غير المقروءة يُطلب فقط إذا تغير historyId منذ آخر استدعاء، فيكفي
+        طلب getProfile واحد ما دام الصندوق لم يتغير.
+
         Returns:
             قاموس بالإحصائيات
         """
@@ -487,7 +1151,7 @@ class GmailIntegration:
             return {}
 
         try:
-            profile = self.service.users().getProfile(userId='me').execute()
+            profile = self._execute(self.service.users().getProfile(userId='me'))
 
             stats = {
                 'total_messages': profile.get('messagesTotal', 0),
@@ -495,10 +1159,13 @@ class GmailIntegration:
             }
 
             # عدد الرسائل غير المقروءة
-            unread = self.service.users().messages().list(
-                userId='me', q='is:unread', maxResults=1
-            ).execute()
-            stats['unread_count'] = unread.get('resultSizeEstimate', 0)
+            history_id = profile.get('historyId')
+            if not history_id or not self._unread_estimate or self._unread_estimate[0] != history_id:
+                unread = self._execute(self.service.users().messages().list(
+                    userId='me', q='is:unread', maxResults=1
+                ))
+                self._unread_estimate = (history_id, unread.get('resultSizeEstimate', 0))
+            stats['unread_count'] = self._unread_estimate[1]
 
             return stats
 
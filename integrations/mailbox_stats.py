@@ -0,0 +1,335 @@
+"""
+Mailbox Stats - لقطة عمودية لبيانات الرسائل الوصفية لحساب إحصائيات الصندوق
+أعمدة NumPy (المرسل، التاريخ، التصنيفات، الحجم، الفئة) تُحدّث تدريجياً من MessageCache،
+وكل إحصائية مرور متجهي على الأعمدة بدون طلبات API
+"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parseaddr
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# إضافة المسار للوصول إلى modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from integrations.fulltext_index import message_timestamp
+
+INITIAL_CAPACITY = 1024
+SECONDS_PER_DAY = 86400
+
+
+class _Vocabulary:
+    """ترميز النصوص المتكررة (المرسلون، المحادثات، التصنيفات، الفئات) إلى أعداد صحيحة"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        """رمز القيمة (يُضاف إن لم يكن موجوداً)"""
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def get(self, value: str) -> int:
+        """رمز القيمة أو -1"""
+        return self._codes.get(value, -1)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def sender_address(sender: str) -> str:
+    """عنوان المرسل بأحرف صغيرة ("Ahmed <a@x.com>" -> "a@x.com")"""
+    return (parseaddr(sender)[1] or sender).strip().lower()
+
+
+class MailboxStats:
+    """
+    لقطة عمودية للرسائل في المخزن المحلي
+
+    كل رسالة صف في مصفوفات بطول السعة: التاريخ (epoch، NaN إذا تعذر تحليله)،
+    ورموز المرسل والمحادثة والفئة، والحجم، ومصفوفة منطقية للتصنيفات (صف لكل رسالة
+    وعمود لكل تصنيف). صفوف الرسائل المحذوفة تُعلّم ويُعاد استخدامها.
+    اللقطة في الذاكرة فقط وتُبنى من المخزن المحلي عند أول استخدام، بدون شبكة.
+    """
+
+    def __init__(self, categorize: Optional[Callable[[Dict[str, Any]], str]] = None):
+        """
+        تهيئة لقطة فارغة
+
+        Args:
+            categorize: دالة فئة الرسالة (مثل KeywordClassifier.classify)، تُحسب مرة عند إضافة الرسالة
+        """
+        self.categorize = categorize
+        self.senders = _Vocabulary()
+        self.threads = _Vocabulary()
+        self.labels = _Vocabulary()
+        self.categories = _Vocabulary()
+        self.watermark: Tuple[float, str] = (0.0, '')
+        self.count = 0
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._lock = threading.RLock()
+
+        self.timestamp = np.full(INITIAL_CAPACITY, np.nan)
+        self.sender = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self.thread = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self.category = np.full(INITIAL_CAPACITY, -1, dtype=np.int32)
+        self.size = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self.alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self.label_matrix = np.zeros((INITIAL_CAPACITY, 8), dtype=bool)
+
+    # ================== التخزين ==================
+
+    def _reserve(self, rows: int):
+        """توسيع الأعمدة (بالمضاعفة) لتتسع لـ rows صفاً"""
+        capacity = len(self.alive)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        extra = capacity - len(self.alive)
+        self.timestamp = np.concatenate([self.timestamp, np.full(extra, np.nan)])
+        self.sender = np.concatenate([self.sender, np.zeros(extra, dtype=np.int32)])
+        self.thread = np.concatenate([self.thread, np.zeros(extra, dtype=np.int32)])
+        self.category = np.concatenate([self.category, np.full(extra, -1, dtype=np.int32)])
+        self.size = np.concatenate([self.size, np.zeros(extra, dtype=np.int64)])
+        self.alive = np.concatenate([self.alive, np.zeros(extra, dtype=bool)])
+        self.label_matrix = np.concatenate(
+            [self.label_matrix, np.zeros((extra, self.label_matrix.shape[1]), dtype=bool)])
+
+    def _reserve_labels(self, labels: int):
+        """توسيع أعمدة التصنيفات (بالمضاعفة)"""
+        columns = self.label_matrix.shape[1]
+        if labels <= columns:
+            return
+        while columns < labels:
+            columns *= 2
+        extra = np.zeros((len(self.alive), columns - self.label_matrix.shape[1]), dtype=bool)
+        self.label_matrix = np.concatenate([self.label_matrix, extra], axis=1)
+
+    def add(self, messages: Iterable[Dict[str, Any]]):
+        """
+        إضافة رسائل إلى اللقطة أو تحديث صفوفها
+
+        Args:
+            messages: الرسائل بصيغة MessageCache
+        """
+        with self._lock:
+            for message in messages:
+                row = self._rows.get(message['id'])
+                if row is None:
+                    if self._free:
+                        row = self._free.pop()
+                    else:
+                        row = self.count
+                        self._reserve(row + 1)
+                        self.count += 1
+                    self._rows[message['id']] = row
+
+                timestamp = message_timestamp(message.get('date') or '')
+                self.timestamp[row] = np.nan if timestamp is None else timestamp
+                self.sender[row] = self.senders.code(sender_address(message.get('from') or ''))
+                self.thread[row] = self.threads.code(message.get('threadId') or message['id'])
+                self.category[row] = (self.categories.code(self.categorize(message))
+                                      if self.categorize else -1)
+                self.size[row] = message.get('size') or 0
+
+                codes = [self.labels.code(label) for label in message.get('labels') or []]
+                self._reserve_labels(len(self.labels))
+                self.label_matrix[row] = False
+                self.label_matrix[row, codes] = True
+                self.alive[row] = True
+
+    def remove(self, msg_ids: Iterable[str]):
+        """حذف رسائل من اللقطة"""
+        with self._lock:
+            for msg_id in msg_ids:
+                row = self._rows.pop(msg_id, None)
+                if row is not None:
+                    self.alive[row] = False
+                    self._free.append(row)
+
+    def update_from_cache(self, cache, batch_size: int = 1000) -> int:
+        """
+        تحديث اللقطة بالرسائل الجديدة أو المعدلة في المخزن منذ آخر تحديث
+
+        changed_since لا يذكر الرسائل المحذوفة، فإذا اختلف عدد الصفوف عن عدد
+        رسائل المخزن تُحذف الصفوف التي لم تعد في المخزن.
+
+        Args:
+            cache: MessageCache
+            batch_size: عدد الرسائل في كل دفعة
+
+        Returns:
+            عدد الرسائل المضافة أو المحدّثة
+        """
+        updated = 0
+        with self._lock:
+            while True:
+                messages = cache.changed_since(*self.watermark, limit=batch_size)
+                if not messages:
+                    break
+                self.add(messages)
+                self.watermark = (messages[-1]['_fetched_at'], messages[-1]['id'])
+                updated += len(messages)
+
+            if len(self._rows) != len(cache):
+                existing = set(cache.ids())
+                self.remove([msg_id for msg_id in self._rows if msg_id not in existing])
+        return updated
+
+    # ================== الإحصائيات ==================
+
+    def _live(self) -> np.ndarray:
+        """قناع الصفوف الحية"""
+        return self.alive[:self.count]
+
+    def _label_column(self, label: str) -> Optional[np.ndarray]:
+        code = self.labels.get(label)
+        return self.label_matrix[:self.count, code] if code >= 0 else None
+
+    def top_senders(self, n: int = 10, by_size: bool = False) -> List[Tuple[str, int]]:
+        """
+        أكثر المرسلين رسائل (أو حجماً)
+
+        Args:
+            n: عدد المرسلين
+            by_size: الترتيب بمجموع أحجام الرسائل بالبايت بدلاً من عددها
+
+        Returns:
+            أزواج (العنوان، العدد أو الحجم) تنازلياً
+        """
+        live = self._live()
+        weights = self.size[:self.count][live] if by_size else None
+        totals = np.bincount(self.sender[:self.count][live], weights=weights,
+                             minlength=len(self.senders))
+        top = np.argsort(-totals, kind='stable')[:n]
+        return [(self.senders.values[i], int(totals[i])) for i in top if totals[i] > 0]
+
+    def volume_per_day(self, days: Optional[int] = None,
+                       now: Optional[float] = None) -> Dict[str, int]:
+        """
+        عدد الرسائل في كل يوم (بتوقيت UTC)
+
+        Args:
+            days: آخر عدد من الأيام فقط (None = الكل)
+            now: الوقت الحالي (للاختبارات)
+
+        Returns:
+            التاريخ YYYY-MM-DD -> عدد الرسائل، تصاعدياً
+        """
+        timestamps = self.timestamp[:self.count][self._live()]
+        timestamps = timestamps[~np.isnan(timestamps)]
+        if days is not None:
+            now = time.time() if now is None else now
+            timestamps = timestamps[timestamps >= now - days * SECONDS_PER_DAY]
+        day_numbers, counts = np.unique((timestamps // SECONDS_PER_DAY).astype(np.int64),
+                                        return_counts=True)
+        return {
+            datetime.fromtimestamp(int(day) * SECONDS_PER_DAY, timezone.utc).strftime('%Y-%m-%d'): int(count)
+            for day, count in zip(day_numbers, counts)
+        }
+
+    def unread_by_label(self) -> Dict[str, int]:
+        """
+        عدد الرسائل غير المقروءة في كل تصنيف
+
+        Returns:
+            التصنيف -> العدد تنازلياً (بدون UNREAD نفسه والتصنيفات الفارغة)
+        """
+        unread = self._label_column('UNREAD')
+        if unread is None:
+            return {}
+        matrix = self.label_matrix[:self.count, :len(self.labels)]
+        counts = matrix[self._live() & unread].sum(axis=0)
+        return {
+            self.labels.values[code]: int(counts[code])
+            for code in np.argsort(-counts, kind='stable')
+            if counts[code] and self.labels.values[code] != 'UNREAD'
+        }
+
+    def count_by_category(self, unread_only: bool = False) -> Dict[str, int]:
+        """
+        عدد الرسائل في كل فئة
+
+        Args:
+            unread_only: غير المقروءة فقط
+
+        Returns:
+            الفئة -> العدد (الفئات الفارغة محذوفة)
+        """
+        mask = self._live() & (self.category[:self.count] >= 0)
+        if unread_only:
+            unread = self._label_column('UNREAD')
+            if unread is None:
+                return {}
+            mask &= unread
+        counts = np.bincount(self.category[:self.count][mask], minlength=len(self.categories))
+        return {name: int(counts[code]) for code, name in enumerate(self.categories.values)
+                if counts[code]}
+
+    def reply_latency(self) -> Dict[str, float]:
+        """
+        زمن الرد: من رسالة واردة إلى أول رسالة مرسلة (SENT) بعدها في المحادثة نفسها
+
+        الصفوف تُرتب بالمحادثة ثم التاريخ، فكل رد هو صف مرسل يسبقه صف وارد من المحادثة نفسها.
+
+        Returns:
+            عدد الردود، والوسيط والمتوسط والمئين 90 بالساعات
+        """
+        sent_column = self._label_column('SENT')
+        if sent_column is None:
+            return {'replies': 0}
+        timestamps = self.timestamp[:self.count]
+        rows = np.flatnonzero(self._live() & ~np.isnan(timestamps))
+        rows = rows[np.lexsort((timestamps[rows], self.thread[rows]))]
+
+        thread, stamps, sent = self.thread[rows], timestamps[rows], sent_column[rows]
+        replies = (thread[1:] == thread[:-1]) & sent[1:] & ~sent[:-1]
+        hours = (stamps[1:] - stamps[:-1])[replies] / 3600
+        if not hours.size:
+            return {'replies': 0}
+        return {
+            'replies': int(hours.size),
+            'median_hours': round(float(np.median(hours)), 2),
+            'mean_hours': round(float(hours.mean()), 2),
+            'p90_hours': round(float(np.percentile(hours, 90)), 2),
+        }
+
+    def summary(self, top: int = 5, days: Optional[int] = 14,
+                now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        جميع الإحصائيات في قاموس واحد (لـ GmailAgent.get_email_statistics)
+
+        Args:
+            top: عدد أكثر المرسلين
+            days: أيام حجم البريد اليومي (None = الكل)
+            now: الوقت الحالي (للاختبارات)
+
+        Returns:
+            قاموس بالإحصائيات
+        """
+        with self._lock:
+            return {
+                'cached_messages': len(self),
+                'cached_size_mb': round(float(self.size[:self.count][self._live()].sum()) / 2 ** 20, 2),
+                'top_senders': self.top_senders(top),
+                'volume_per_day': self.volume_per_day(days, now),
+                'unread_by_label': self.unread_by_label(),
+                'unread_by_category': self.count_by_category(unread_only=True),
+                'reply_latency': self.reply_latency(),
+            }
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, msg_id: str) -> bool:
+        return msg_id in self._rows
@@ -0,0 +1,344 @@
+"""
+Message Cache - ذاكرة تخزين محلية لرسائل Gmail
+تحفظ الرسائل في SQLite وتُبقيها محدّثة عبر Gmail history API باستخدام historyId
+"""
+import os
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+# ترويسات إضافية تُحفظ معاً في العمود headers بصيغة JSON
+HEADER_FIELDS = ('cc', 'messageId', 'references', 'listUnsubscribe')
+
+
+class MessageCache:
+    """مخزن رسائل دائم على القرص مفهرس بمعرف الرسالة"""
+
+    def __init__(self, db_path: str = 'data/gmail-cache.db'):
+        """
+        تهيئة المخزن
+
+        Args:
+            db_path: مسار ملف قاعدة البيانات (':memory:' للتخزين في الذاكرة فقط)
+        """
+        self.db_path = db_path
+        if db_path != ':memory:' and os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._create_tables()
+
+    def _create_tables(self):
+        """إنشاء الجداول إن لم تكن موجودة"""
+        with self._lock, self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    id TEXT PRIMARY KEY,
+                    thread_id TEXT,
+                    subject TEXT,
+                    sender TEXT,
+                    recipient TEXT,
+                    date TEXT,
+                    snippet TEXT,
+                    labels TEXT NOT NULL DEFAULT '[]',
+                    body TEXT,
+                    headers TEXT,
+                    size INTEGER,
+                    fetched_at REAL NOT NULL
+                )
+            ''')
+            # المخازن التي أُنشئت قبل إضافة عمودي الترويسات والحجم
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(messages)')}
+            if 'headers' not in columns:
+                self._conn.execute('ALTER TABLE messages ADD COLUMN headers TEXT')
+            if 'size' not in columns:
+                self._conn.execute('ALTER TABLE messages ADD COLUMN size INTEGER')
+            # الفهارس المحلية تقرأ الرسائل الجديدة أو المعدلة بترتيب وقت الجلب
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_messages_fetched ON messages(fetched_at, id)'
+            )
+            # ملخص سطر واحد لكل رسالة من تلخيص map-reduce في GmailAgent
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS summaries (
+                    id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            ''')
+
+    # ================== قراءة ==================
+
+    @staticmethod
+    def _row_to_message(row: sqlite3.Row) -> Dict[str, Any]:
+        message = {
+            'id': row['id'],
+            'threadId': row['thread_id'],
+            'subject': row['subject'],
+            'from': row['sender'],
+            'to': row['recipient'],
+            'date': row['date'],
+            'snippet': row['snippet'],
+            'labels': json.loads(row['labels']),
+        }
+        if row['headers'] is not None:
+            message.update(json.loads(row['headers']))
+        if row['size'] is not None:
+            message['size'] = row['size']
+        if row['body'] is not None:
+            message['body'] = row['body']
+        return message
+
+    def get(self, msg_id: str) -> Optional[Dict[str, Any]]:
+        """
+        الحصول على رسالة مخزنة
+
+        Args:
+            msg_id: معرف الرسالة
+
+        Returns:
+            قاموس الرسالة (يحتوي على 'body' فقط إن كان مخزناً) أو None
+        """
+        return self.get_many([msg_id]).get(msg_id)
+
+    def get_many(self, msg_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        الحصول على عدة رسائل مخزنة دفعة واحدة
+
+        Args:
+            msg_ids: معرفات الرسائل
+
+        Returns:
+            قاموس معرف الرسالة -> الرسالة، للرسائل الموجودة فقط
+        """
+        msg_ids = list(msg_ids)
+        found: Dict[str, Dict[str, Any]] = {}
+        # حد SQLite الافتراضي لعدد المتغيرات في الاستعلام الواحد
+        for start in range(0, len(msg_ids), 500):
+            chunk = msg_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f'SELECT * FROM messages WHERE id IN ({placeholders})', chunk
+                ).fetchall()
+            for row in rows:
+                found[row['id']] = self._row_to_message(row)
+        return found
+
+    def changed_since(self, fetched_at: float = 0.0, after_id: str = '',
+                      limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        الرسائل التي جُلبت أو حُدّث نصها أو تصنيفاتها بعد (fetched_at, after_id)، بترتيب وقت الجلب ثم المعرف
+
+        تُستخدم لتحديث الفهارس المحلية تدريجياً صفحة بعد صفحة: تُمرر قيمتا
+        '_fetched_at' و 'id' لآخر رسالة في الصفحة السابقة.
+
+        Args:
+            fetched_at: وقت الجلب لآخر رسالة معالجة
+            after_id: معرف آخر رسالة معالجة بنفس وقت الجلب
+            limit: أقصى عدد رسائل
+
+        Returns:
+            قائمة الرسائل، كل منها مع '_fetched_at'
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM messages WHERE fetched_at > ? OR (fetched_at = ? AND id > ?) '
+                'ORDER BY fetched_at, id LIMIT ?',
+                (fetched_at, fetched_at, after_id, limit),
+            ).fetchall()
+        messages = []
+        for row in rows:
+            message = self._row_to_message(row)
+            message['_fetched_at'] = row['fetched_at']
+            messages.append(message)
+        return messages
+
+    def ids(self) -> List[str]:
+        """معرفات جميع الرسائل المخزنة"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute('SELECT id FROM messages')]
+
+    def __contains__(self, msg_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM messages WHERE id = ?', (msg_id,)).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+
+    # ================== كتابة ==================
+
+    def put_many(self, messages: Iterable[Dict[str, Any]]):
+        """
+        حفظ أو تحديث رسائل في المخزن
+
+        النص المحفوظ سابقاً لا يُمسح إذا كانت الرسالة الجديدة بدون نص محمّل.
+
+        Args:
+            messages: قواميس الرسائل بصيغة GmailIntegration
+        """
+        now = time.time()
+        rows = []
+        for message in messages:
+            # GmailMessage لا يحمّل النص عند الفحص بـ dict.get
+            body = dict.get(message, 'body')
+            headers = ({field: message.get(field, '') for field in HEADER_FIELDS}
+                       if 'messageId' in message else None)
+            rows.append((
+                message['id'], message.get('threadId'), message.get('subject'),
+                message.get('from'), message.get('to'), message.get('date'),
+                message.get('snippet', ''), json.dumps(message.get('labels', [])),
+                body, json.dumps(headers) if headers is not None else None,
+                message.get('size'), now,
+            ))
+
+        with self._lock, self._conn:
+            self._conn.executemany('''
+                INSERT INTO messages (id, thread_id, subject, sender, recipient, date,
+                                      snippet, labels, body, headers, size, fetched_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    thread_id = excluded.thread_id,
+                    subject = excluded.subject,
+                    sender = excluded.sender,
+                    recipient = excluded.recipient,
+                    date = excluded.date,
+                    snippet = excluded.snippet,
+                    labels = excluded.labels,
+                    body = COALESCE(excluded.body, messages.body),
+                    headers = COALESCE(excluded.headers, messages.headers),
+                    size = COALESCE(excluded.size, messages.size),
+                    fetched_at = excluded.fetched_at
+            ''', rows)
+
+    def put(self, message: Dict[str, Any]):
+        """حفظ رسالة واحدة"""
+        self.put_many([message])
+
+    def set_body(self, msg_id: str, body: str):
+        """حفظ النص المفكوك لرسالة موجودة (تُعد معدلة في changed_since)"""
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE messages SET body = ?, fetched_at = ? WHERE id = ?',
+                               (body, time.time(), msg_id))
+
+    def update_labels(self, msg_ids: Iterable[str], add: Optional[List[str]] = None,
+                      remove: Optional[List[str]] = None):
+        """
+        تعديل تصنيفات رسائل مخزنة (تُعد معدلة في changed_since)
+
+        Args:
+            msg_ids: معرفات الرسائل
+            add: التصنيفات المضافة
+            remove: التصنيفات المحذوفة
+        """
+        add, remove = add or [], set(remove or [])
+        now = time.time()
+        rows = []
+        for msg_id, message in self.get_many(msg_ids).items():
+            labels = [label for label in message['labels'] if label not in remove]
+            labels += [label for label in add if label not in labels]
+            rows.append((json.dumps(labels), now, msg_id))
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany('UPDATE messages SET labels = ?, fetched_at = ? WHERE id = ?', rows)
+
+    def delete(self, msg_ids: Iterable[str]):
+        """حذف رسائل (وملخصاتها) من المخزن"""
+        rows = [(i,) for i in msg_ids]
+        with self._lock, self._conn:
+            self._conn.executemany('DELETE FROM messages WHERE id = ?', rows)
+            self._conn.executemany('DELETE FROM summaries WHERE id = ?', rows)
+
+    def clear(self):
+        """مسح جميع الرسائل وملخصاتها وحالة المزامنة"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM messages')
+            self._conn.execute('DELETE FROM summaries')
+            self._conn.execute('DELETE FROM sync_state')
+
+    # ================== ملخصات الرسائل ==================
+
+    def get_summaries(self, msg_ids: Iterable[str]) -> Dict[str, str]:
+        """
+        الملخصات المحفوظة لعدة رسائل
+
+        Args:
+            msg_ids: معرفات الرسائل
+
+        Returns:
+            معرف الرسالة -> الملخص، للرسائل الملخصة فقط
+        """
+        msg_ids = list(msg_ids)
+        found: Dict[str, str] = {}
+        for start in range(0, len(msg_ids), 500):
+            chunk = msg_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f'SELECT id, summary FROM summaries WHERE id IN ({placeholders})', chunk
+                ).fetchall()
+            found.update((row['id'], row['summary']) for row in rows)
+        return found
+
+    def put_summaries(self, summaries: Dict[str, str]):
+        """حفظ أو استبدال ملخصات رسائل"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO summaries (id, summary, created_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET summary = excluded.summary, '
+                'created_at = excluded.created_at',
+                [(msg_id, summary, now) for msg_id, summary in summaries.items()],
+            )
+
+    # ================== حالة المزامنة ==================
+
+    def _get_state(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+
+    def _set_state(self, key: str, value: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO sync_state (key, value) VALUES (?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                (key, value),
+            )
+
+    @property
+    def history_id(self) -> Optional[str]:
+        """آخر historyId تمت المزامنة حتى عنده"""
+        return self._get_state('history_id')
+
+    @history_id.setter
+    def history_id(self, value: str):
+        self._set_state('history_id', str(value))
+        self._set_state('synced_at', str(time.time()))
+
+    @property
+    def synced_at(self) -> float:
+        """وقت آخر مزامنة (epoch) أو 0 إن لم تتم مزامنة بعد"""
+        value = self._get_state('synced_at')
+        return float(value) if value else 0.0
+
+    def is_stale(self, max_age: float) -> bool:
+        """هل مضى على آخر مزامنة أكثر من max_age ثانية"""
+        return time.time() - self.synced_at > max_age
+
+    def close(self):
+        """إغلاق الاتصال بقاعدة البيانات"""
+        with self._lock:
+            self._conn.close()
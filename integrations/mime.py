@@ -0,0 +1,235 @@
+"""
+MIME - استخراج ترويسات ونص رسائل Gmail
+فهرس ترويسات بمرور واحد، مرور واحد على شجرة الأجزاء، فك base64url على دفعات بحد أقصى للبايتات،
+وتحويل HTML إلى نص في زمن خطي
+"""
+import base64
+import codecs
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# عدد أحرف base64 في كل دفعة فك (مضاعف لـ 4 حتى لا تنقسم مجموعة أحرف بين دفعتين)
+DECODE_CHUNK_CHARS = 64 * 1024
+
+_CHARSET_RE = re.compile(r'charset\s*=\s*"?([^";\s]+)', re.IGNORECASE)
+_SPACES_RE = re.compile(r'[^\S\n]+')
+
+
+class HeaderIndex:
+    """
+    فهرس ترويسات رسالة أو جزء MIME
+
+    تُحوّل أسماء الترويسات إلى أحرف صغيرة مرة واحدة عند الإنشاء، فيصبح كل
+    بحث لاحقاً O(1) مهما كان عدد الترويسات (مثل Received المتكررة).
+    """
+
+    def __init__(self, headers: Iterable[Dict[str, str]]):
+        """
+        بناء الفهرس
+
+        Args:
+            headers: قائمة {'name': ..., 'value': ...} كما في payload.headers
+        """
+        self._values: Dict[str, List[str]] = {}
+        for header in headers:
+            self._values.setdefault(header['name'].lower(), []).append(header['value'])
+
+    def get(self, name: str, default: str = '') -> str:
+        """قيمة أول ترويسة بالاسم name (بدون اعتبار حالة الأحرف)"""
+        values = self._values.get(name.lower())
+        return values[0] if values else default
+
+    def get_all(self, name: str) -> List[str]:
+        """جميع قيم الترويسة name بترتيب ظهورها"""
+        return list(self._values.get(name.lower(), []))
+
+    def __getitem__(self, name: str) -> str:
+        values = self._values.get(name.lower())
+        if not values:
+            raise KeyError(name)
+        return values[0]
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._values
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+def iter_parts(payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    الأجزاء الطرفية في شجرة MIME بترتيب ظهورها (بحث بالعمق دون تكرار ذاتي)
+
+    Args:
+        payload: الحقل payload من رسالة Gmail أو أي جزء منه
+
+    Returns:
+        مولد الأجزاء التي لا تحتوي على أجزاء فرعية
+    """
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        children = part.get('parts')
+        if children:
+            stack.extend(reversed(children))
+        else:
+            yield part
+
+
+def is_attachment(part: Dict[str, Any]) -> bool:
+    """هل الجزء مرفق (له اسم ملف أو يُجلب بطلب منفصل)"""
+    return bool(part.get('filename')) or 'attachmentId' in part.get('body', {})
+
+
+def part_charset(part: Dict[str, Any], default: str = 'utf-8') -> str:
+    """
+    ترميز أحرف الجزء من ترويسة Content-Type
+
+    Returns:
+        اسم ترميز يعرفه Python، أو default إذا كان غير موجود أو غير معروف
+    """
+    match = _CHARSET_RE.search(HeaderIndex(part.get('headers', [])).get('content-type'))
+    if not match:
+        return default
+    try:
+        return codecs.lookup(match.group(1)).name
+    except LookupError:
+        return default
+
+
+def iter_decoded(data: str, max_bytes: Optional[int] = None) -> Iterator[bytes]:
+    """
+    فك base64url على دفعات دون إنشاء نسخة كاملة من البايتات
+
+    Args:
+        data: النص المرمز (قد يكون بدون حشو '=')
+        max_bytes: أقصى عدد بايتات يُفك (None = بلا حد)
+
+    Returns:
+        مولد دفعات البايتات
+    """
+    remaining = max_bytes
+    for start in range(0, len(data), DECODE_CHUNK_CHARS):
+        chunk = data[start:start + DECODE_CHUNK_CHARS]
+        chunk += '=' * (-len(chunk) % 4)
+        decoded = base64.urlsafe_b64decode(chunk)
+        if remaining is not None:
+            decoded = decoded[:remaining]
+            remaining -= len(decoded)
+        yield decoded
+        if remaining == 0:
+            return
+
+
+def iter_text(part: Dict[str, Any], max_bytes: Optional[int] = None) -> Iterator[str]:
+    """
+    نص الجزء على دفعات بترميز أحرفه
+
+    إذا قُطع النص عند max_bytes يُحذف الحرف الأخير غير المكتمل بدلاً من استبداله.
+
+    Args:
+        part: جزء MIME يحتوي على body.data
+        max_bytes: أقصى عدد بايتات يُفك (None = بلا حد)
+
+    Returns:
+        مولد أجزاء النص
+    """
+    decoder = codecs.getincrementaldecoder(part_charset(part))(errors='replace')
+    total = 0
+    for chunk in iter_decoded(part.get('body', {}).get('data', ''), max_bytes):
+        total += len(chunk)
+        yield decoder.decode(chunk)
+    if max_bytes is None or total < max_bytes:
+        yield decoder.decode(b'', final=True)
+
+
+class HTMLTextExtractor(HTMLParser):
+    """محول HTML إلى نص عادي في مرور واحد يقبل الإدخال على دفعات"""
+
+    SKIP_TAGS = {'script', 'style', 'head', 'title', 'noscript', 'template'}
+    BLOCK_TAGS = {
+        'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt',
+        'footer', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'ol',
+        'p', 'pre', 'section', 'table', 'td', 'th', 'tr', 'ul',
+    }
+
+    def __init__(self):
+        # convert_charrefs يحول الكيانات (&amp; و &#1575; ...) داخل handle_data
+        super().__init__(convert_charrefs=True)
+        self._pieces = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._pieces.append('\n')
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self.BLOCK_TAGS:
+            self._pieces.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._pieces.append('\n')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._pieces.append(data)
+
+    def text(self) -> str:
+        """النص المستخرج بمسافات مدمجة وبدون أسطر فارغة متتالية"""
+        self.close()
+        lines = []
+        for line in _SPACES_RE.sub(' ', ''.join(self._pieces)).split('\n'):
+            line = line.strip()
+            if line or (lines and lines[-1]):
+                lines.append(line)
+        return '\n'.join(lines).strip()
+
+
+def html_to_text(html: Iterable[str]) -> str:
+    """
+    تحويل HTML إلى نص عادي
+
+    Args:
+        html: نص HTML كاملاً أو دفعات منه
+
+    Returns:
+        النص العادي
+    """
+    parser = HTMLTextExtractor()
+    for chunk in ([html] if isinstance(html, str) else html):
+        parser.feed(chunk)
+    return parser.text()
+
+
+def extract_body(payload: Dict[str, Any], max_bytes: Optional[int] = None) -> str:
+    """
+    نص الرسالة من شجرة MIME
+
+    يتوقف المرور عند أول جزء text/plain، ويُستخدم أول جزء text/html (بعد
+    تحويله إلى نص) فقط إذا لم يوجد نص عادي. المرفقات تُتجاهل.
+
+    Args:
+        payload: الحقل payload من رسالة Gmail بالصيغة الكاملة
+        max_bytes: أقصى عدد بايتات يُفك من الجزء المختار (None = بلا حد)
+
+    Returns:
+        النص أو '' إذا لم يوجد جزء نصي
+    """
+    html_part = None
+    for part in iter_parts(payload):
+        if is_attachment(part) or not part.get('body', {}).get('data'):
+            continue
+        mime_type = part.get('mimeType', 'text/plain').lower()
+        if mime_type == 'text/plain':
+            return ''.join(iter_text(part, max_bytes))
+        if mime_type == 'text/html' and html_part is None:
+            html_part = part
+    if html_part is not None:
+        return html_to_text(iter_text(html_part, max_bytes))
+    return ''
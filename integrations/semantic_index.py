@@ -0,0 +1,341 @@
+"""
+Semantic Index - فهرس متجهات محلي للبحث الدلالي في الرسائل المخزنة
+متجهات hashing-vectorizer في مصفوفات NumPy مربوطة بملفات على القرص (memmap)، تحديث تدريجي من
+MessageCache وبحث top-k بالقوة الغاشمة بدون شبكة
+"""
+import json
+import os
+import sys
+import threading
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# إضافة المسار للوصول إلى config
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.settings import config
+from utils.text import strip_arabic_prefix, tokenize
+
+# أطول معرف رسالة يُحفظ في ملف المعرفات (معرفات Gmail 16 حرفاً)
+ID_BYTES = 64
+INITIAL_CAPACITY = 1024
+
+
+class HashingEmbedder:
+    """
+    متجهات نصية بدون نموذج: كل كلمة وزوج كلمات يُجزأ (crc32) إلى بُعد بإشارة ±1
+
+    الأوزان log(1 + التكرار) والمتجه مطبّع (L2)، فحاصل الضرب هو تشابه جيب التمام.
+    أي كائن له الخاصية dim والدالة embed(texts) يمكن استخدامه بدلاً منه.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str) -> Dict[int, float]:
+        words = tokenize(text)
+        features: Dict[str, float] = {}
+        for i, word in enumerate(words):
+            features[word] = features.get(word, 0.0) + 1.0
+            # الكلمة بدون أداة التعريف كسمة إضافية ("الاجتماع" تطابق "اجتماع")
+            stem = strip_arabic_prefix(word)
+            if stem != word:
+                features[stem] = features.get(stem, 0.0) + 0.5
+            if i:
+                pair = words[i - 1] + ' ' + word
+                features[pair] = features.get(pair, 0.0) + 0.5
+
+        vector: Dict[int, float] = {}
+        for feature, count in features.items():
+            h = zlib.crc32(feature.encode('utf-8'))
+            index = h % self.dim
+            sign = 1.0 if h & 0x80000000 else -1.0
+            vector[index] = vector.get(index, 0.0) + sign * float(np.log1p(count))
+        return vector
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        متجهات مجموعة نصوص دفعة واحدة
+
+        Args:
+            texts: النصوص
+
+        Returns:
+            مصفوفة (عدد النصوص، dim) من float32 بصفوف مطبّعة (الصف الفارغ أصفار)
+        """
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for index, value in self._features(text).items():
+                matrix[row, index] = value
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+def message_chunks(message: Dict[str, Any], chunk_chars: int, max_chunks: int) -> List[str]:
+    """
+    أجزاء الرسالة المفهرسة: الموضوع مع المقتطف، ثم أجزاء النص المحمّل (إن وُجد)
+
+    Args:
+        message: الرسالة بصيغة MessageCache
+        chunk_chars: طول كل جزء من النص بالأحرف
+        max_chunks: أقصى عدد أجزاء للرسالة
+
+    Returns:
+        قائمة النصوص
+    """
+    chunks = [f"{message.get('subject') or ''}\n{message.get('snippet') or ''}"]
+    body = message.get('body') or ''
+    for start in range(0, len(body), chunk_chars):
+        if len(chunks) >= max_chunks:
+            break
+        chunks.append(body[start:start + chunk_chars])
+    return chunks
+
+
+class SemanticIndex:
+    """
+    فهرس متجهات لأجزاء الرسائل
+
+    الملفات في directory: vectors.f32 (المتجهات)، ids.bin (معرف الرسالة لكل
+    صف)، و meta.json (عدد الصفوف وآخر رسالة فُهرست من المخزن). تُفتح الملفات
+    كـ memmap فلا تُقرأ إلى الذاكرة إلا الصفحات المستخدمة، وتتضاعف سعتها عند
+    الامتلاء. الصفوف المحذوفة تُصفّر وتُزال عند compact.
+    """
+
+    def __init__(self, directory: Optional[str] = 'data/semantic-index', embedder=None):
+        """
+        فتح الفهرس أو إنشاؤه
+
+        Args:
+            directory: مجلد الملفات (None = في الذاكرة فقط)
+            embedder: مولد المتجهات (افتراضياً HashingEmbedder بـ SEMANTIC_INDEX_DIM)
+        """
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder(config.SEMANTIC_INDEX_DIM)
+        self.dim = self.embedder.dim
+        self._lock = threading.RLock()
+        self.count = 0
+        self.deleted = 0
+        self.watermark: Tuple[float, str] = (0.0, '')
+
+        meta = self._read_meta()
+        if meta and meta.get('dim') == self.dim:
+            self.count = meta['count']
+            self.deleted = meta.get('deleted', 0)
+            self.watermark = tuple(meta.get('watermark', (0.0, '')))
+            capacity = max(self.count, INITIAL_CAPACITY)
+            self._open(capacity, create=False)
+        else:
+            self._open(INITIAL_CAPACITY, create=True)
+
+        # معرف الرسالة -> صفوفها
+        self._rows: Dict[str, List[int]] = {}
+        for row, raw in enumerate(self._ids[:self.count]):
+            if raw:
+                self._rows.setdefault(raw.decode('utf-8'), []).append(row)
+
+    # ================== التخزين ==================
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        if not self.directory or not os.path.exists(self._path('meta.json')):
+            return None
+        try:
+            with open(self._path('meta.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _open(self, capacity: int, create: bool):
+        """فتح (أو إنشاء) الملفات بسعة capacity صف على الأقل"""
+        if not self.directory:
+            vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            ids = np.zeros(capacity, dtype=f'S{ID_BYTES}')
+            if not create:
+                vectors[:self.count] = self._vectors[:self.count]
+                ids[:self.count] = self._ids[:self.count]
+            self._vectors, self._ids, self.capacity = vectors, ids, capacity
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        sizes = {'vectors.f32': capacity * self.dim * 4, 'ids.bin': capacity * ID_BYTES}
+        for name, size in sizes.items():
+            path = self._path(name)
+            mode = 'w+b' if create or not os.path.exists(path) else 'r+b'
+            with open(path, mode) as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < size:
+                    f.truncate(size)
+        capacity = os.path.getsize(self._path('ids.bin')) // ID_BYTES
+        self._vectors = np.memmap(self._path('vectors.f32'), dtype=np.float32, mode='r+',
+                                  shape=(capacity, self.dim))
+        self._ids = np.memmap(self._path('ids.bin'), dtype=f'S{ID_BYTES}', mode='r+',
+                              shape=(capacity,))
+        self.capacity = capacity
+
+    def _reserve(self, rows: int):
+        """توسيع السعة (بالمضاعفة) لتتسع لـ rows صف إضافي"""
+        needed = self.count + rows
+        if needed <= self.capacity:
+            return
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        if self.directory:
+            self._vectors.flush()
+            self._ids.flush()
+        self._open(capacity, create=False)
+
+    def flush(self):
+        """كتابة المتجهات والبيانات الوصفية إلى القرص"""
+        if not self.directory:
+            return
+        with self._lock:
+            self._vectors.flush()
+            self._ids.flush()
+            meta = {'dim': self.dim, 'count': self.count, 'deleted': self.deleted,
+                    'watermark': list(self.watermark)}
+            tmp = self._path('meta.json.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+            os.replace(tmp, self._path('meta.json'))
+
+    # ================== التحديث ==================
+
+    def add(self, documents: Iterable[Tuple[str, List[str]]]):
+        """
+        إضافة رسائل أو استبدال أجزائها المفهرسة
+
+        Args:
+            documents: أزواج (معرف الرسالة، نصوص أجزائها)
+        """
+        documents = list(documents)
+        texts = [text for _, chunks in documents for text in chunks]
+        if not texts:
+            return
+        vectors = self.embedder.embed(texts)
+
+        with self._lock:
+            self.remove(msg_id for msg_id, _ in documents)
+            self._reserve(len(texts))
+            start = self.count
+            self._vectors[start:start + len(texts)] = vectors
+            row = start
+            for msg_id, chunks in documents:
+                rows = self._rows.setdefault(msg_id, [])
+                for _ in chunks:
+                    self._ids[row] = msg_id.encode('utf-8')
+                    rows.append(row)
+                    row += 1
+            self.count = row
+
+    def remove(self, msg_ids: Iterable[str]):
+        """حذف رسائل من الفهرس (تُصفّر صفوفها)"""
+        with self._lock:
+            for msg_id in msg_ids:
+                for row in self._rows.pop(msg_id, []):
+                    self._vectors[row] = 0
+                    self._ids[row] = b''
+                    self.deleted += 1
+
+    def compact(self):
+        """إعادة كتابة الفهرس بدون الصفوف المحذوفة"""
+        with self._lock:
+            live = np.flatnonzero(self._ids[:self.count] != b'')
+            vectors = np.array(self._vectors[live])
+            ids = np.array(self._ids[live])
+            self.count = len(live)
+            self._vectors[:self.count] = vectors
+            self._ids[:self.count] = ids
+            self._vectors[self.count:self.count + self.deleted] = 0
+            self._ids[self.count:self.count + self.deleted] = b''
+            self.deleted = 0
+            self._rows = {}
+            for row, raw in enumerate(ids):
+                self._rows.setdefault(raw.decode('utf-8'), []).append(row)
+            self.flush()
+
+    def update_from_cache(self, cache, batch_size: int = 1000) -> int:
+        """
+        فهرسة الرسائل الجديدة أو المعدلة في المخزن منذ آخر تحديث
+
+        Args:
+            cache: MessageCache
+            batch_size: عدد الرسائل في كل دفعة متجهات
+
+        Returns:
+            عدد الرسائل المفهرسة
+        """
+        indexed = 0
+        with self._lock:
+            while True:
+                messages = cache.changed_since(*self.watermark, limit=batch_size)
+                if not messages:
+                    break
+                self.add((msg['id'], message_chunks(msg, config.SEMANTIC_CHUNK_CHARS,
+                                                    config.SEMANTIC_MAX_CHUNKS))
+                         for msg in messages)
+                self.watermark = (messages[-1]['_fetched_at'], messages[-1]['id'])
+                indexed += len(messages)
+            if indexed:
+                if self.deleted > self.count // 2:
+                    self.compact()
+                else:
+                    self.flush()
+        return indexed
+
+    # ================== البحث ==================
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        أقرب الرسائل إلى الاستعلام (أعلى تشابه بين أجزائها)
+
+        Args:
+            query: نص الاستعلام
+            k: عدد النتائج
+
+        Returns:
+            أزواج (معرف الرسالة، التشابه) تنازلياً، للتشابه الموجب فقط
+        """
+        if k <= 0:
+            return []
+        vector = self.embedder.embed([query])[0]
+        with self._lock:
+            if not self.count or not vector.any():
+                return []
+            # نسخ قبل تحرير القفل: _reserve و compact يعيدان ربط ملفات memmap
+            scores = np.array(self._vectors[:self.count] @ vector)
+            ids = np.array(self._ids[:self.count])
+
+        results: List[Tuple[str, float]] = []
+        candidates = min(len(scores), k * 4)
+        while True:
+            top = np.argpartition(-scores, candidates - 1)[:candidates]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            seen = set()
+            results = []
+            for row in top:
+                score = float(scores[row])
+                if score <= 0:
+                    break
+                msg_id = ids[row].decode('utf-8')
+                if msg_id and msg_id not in seen:
+                    seen.add(msg_id)
+                    results.append((msg_id, score))
+                    if len(results) == k:
+                        return results
+            # أجزاء متعددة لنفس الرسالة ملأت المرشحين: توسيع البحث
+            if candidates == len(scores) or (top.size and scores[top[-1]] <= 0):
+                return results
+            candidates = min(len(scores), candidates * 4)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, msg_id: str) -> bool:
+        return msg_id in self._rows
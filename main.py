@@ -9,9 +9,10 @@ from colorama import Fore, Back, Style
 # إضافة المسار للوصول إلى modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# وكلاء المهام و Gmail يُستوردون داخل أوضاعهم فقط حتى لا تُحمّل مكتبات Google عند بدء المحادثة
 from agents.brain import BaseAgent
-from agents.tasks_agent import TasksAgent
-from agents.gmail_agent import GmailAgent
+from agents.clients import close_all
+from agents.telemetry import get_default_telemetry, summarize
 from config.settings import config
 
 
@@ -38,6 +39,11 @@ def print_menu():
     print(f"{Fore.YELLOW}═══════════════════════════════════════════════════════════{Style.RESET_ALL}")
 
 
+def print_token(delta: str):
+    """طباعة جزء من الرد فور وصوله"""
+    print(delta, end='', flush=True)
+
+
 def chat_mode(agent: BaseAgent):
     """وضع المحادثة التفاعلي"""
     print(f"\n{Fore.GREEN}مرحباً! أنت الآن في وضع المحادثة. اكتب 'خروج' أو 'exit' للعودة{Style.RESET_ALL}")
@@ -52,9 +58,10 @@ def chat_mode(agent: BaseAgent):
             if not user_input:
                 continue
 
-            print(f"{Fore.MAGENTA}⟳ جاري المعالجة...{Style.RESET_ALL}")
-            response = agent.get_response(user_input)
-            print(f"\n{Fore.GREEN}الوكيل:{Style.RESET_ALL}\n{response}")
+            # عرض الرد تدفقياً فور وصول كل جزء
+            print(f"\n{Fore.GREEN}الوكيل:{Style.RESET_ALL}")
+            agent.get_streamed_response(user_input, print_token)
+            print()
 
         except KeyboardInterrupt:
             print(f"\n{Fore.YELLOW}تم الإيقاف من قبل المستخدم{Style.RESET_ALL}")
@@ -67,16 +74,25 @@ def tasks_mode():
     """وضع إدارة المهام"""
     print(f"\n{Fore.GREEN}مرحباً بك في وضع إدارة المهام{Style.RESET_ALL}")
 
+    from agents.tasks_agent import TasksAgent
+    from agents.task_store import TaskStore
+
     try:
-        tasks_agent = TasksAgent()
+        store = TaskStore(
+            config.TASKS_DB_PATH,
+            batch_size=config.TASKS_DB_BATCH_SIZE,
+            flush_interval=config.TASKS_DB_FLUSH_INTERVAL,
+        ) if config.TASKS_DB_PATH else None
+        tasks_agent = TasksAgent(store=store)
     except Exception as e:
         print(f"{Fore.RED}خطأ في إنشاء وكيل المهام: {e}{Style.RESET_ALL}")
         return
 
-    # إضافة بعض المهام التجريبية
-    tasks_agent.add_task("task1", "اشرح مفهوم الذكاء الاصطناعي بشكل مبسط", priority=9)
-    tasks_agent.add_task("task2", "اقترح 3 طرق لتحسين الإنتاجية", priority=8)
-    tasks_agent.add_task("task3", "ما هي أفضل الممارسات في البرمجة؟", priority=7)
+    # إضافة بعض المهام التجريبية عند عدم وجود مهام محفوظة
+    if not tasks_agent.tasks:
+        tasks_agent.add_task("task1", "اشرح مفهوم الذكاء الاصطناعي بشكل مبسط", priority=9)
+        tasks_agent.add_task("task2", "اقترح 3 طرق لتحسين الإنتاجية", priority=8)
+        tasks_agent.add_task("task3", "ما هي أفضل الممارسات في البرمجة؟", priority=7)
 
     while True:
         print(f"\n{Fore.YELLOW}═══════════════════════════════════════════════════════════{Style.RESET_ALL}")
@@ -133,11 +149,16 @@ def tasks_mode():
         else:
             print(f"{Fore.RED}خيار غير صحيح{Style.RESET_ALL}")
 
+    if tasks_agent.store is not None:
+        tasks_agent.store.close()
+
 
 def gmail_mode():
     """وضع إدارة Gmail"""
     print(f"\n{Fore.GREEN}مرحباً بك في وضع إدارة Gmail{Style.RESET_ALL}")
 
+    from agents.gmail_agent import GmailAgent
+
     try:
         gmail_agent = GmailAgent(
             credentials_file=config.GMAIL_CREDENTIALS_FILE,
@@ -202,11 +223,10 @@ def gmail_mode():
             tone = input(f"{Fore.CYAN}النبرة (professional/friendly/formal):{Style.RESET_ALL} ").strip() or 'professional'
 
             if to and subject and context:
-                print(f"\n{Fore.MAGENTA}⟳ جاري صياغة الرسالة...{Style.RESET_ALL}")
-                email_body = gmail_agent.compose_email_with_ai(to, subject, context, tone)
-
                 print(f"\n{Fore.GREEN}── الرسالة المُصاغة ──{Style.RESET_ALL}")
-                print(email_body)
+                email_body = gmail_agent.compose_email_with_ai(to, subject, context, tone,
+                                                               on_token=print_token)
+                print()
 
                 confirm = input(f"\n{Fore.CYAN}إرسال الرسالة؟ (y/n):{Style.RESET_ALL} ").strip().lower()
                 if confirm == 'y':
@@ -283,6 +303,35 @@ def show_settings():
     print(f"  {Fore.CYAN}Gmail Credentials:{Style.RESET_ALL} {config.GMAIL_CREDENTIALS_FILE}")
     print(f"  {Fore.CYAN}Gmail Token:{Style.RESET_ALL} {config.GMAIL_TOKEN_FILE}")
 
+    print(f"\n  {Fore.CYAN}1{Style.RESET_ALL}. ملخص أداء الطلبات (المئينات)")
+    print(f"  {Fore.CYAN}2{Style.RESET_ALL}. العودة للقائمة الرئيسية")
+    choice = input(f"{Fore.CYAN}اختر خياراً:{Style.RESET_ALL} ").strip()
+    if choice == "1":
+        show_telemetry_summary()
+
+
+def show_telemetry_summary():
+    """عرض مئينات زمن الطلبات وعدد الرموز من سجل القياس"""
+    telemetry = get_default_telemetry()
+    buffer = telemetry.buffer if telemetry else None
+    if buffer is None or not buffer.records:
+        print(f"{Fore.YELLOW}لا توجد قياسات بعد (TELEMETRY_ENABLED){Style.RESET_ALL}")
+        return
+
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}ms"
+
+    for key, stats in summarize(buffer.records).items():
+        print(f"\n{Fore.MAGENTA}{key}{Style.RESET_ALL}: {stats['calls']} طلب "
+              f"({stats['cached']} من الذاكرة المؤقتة، {stats['errors']} أخطاء)")
+        for field, label in (("latency", "الزمن الكلي"), ("ttft", "أول جزء"),
+                             ("queue_wait", "الانتظار")):
+            values = stats[field]
+            print(f"  {Fore.CYAN}{label}:{Style.RESET_ALL} p50 {ms(values['p50'])}  "
+                  f"p90 {ms(values['p90'])}  p99 {ms(values['p99'])}")
+        print(f"  {Fore.CYAN}الرموز:{Style.RESET_ALL} {stats['prompt_tokens']} مدخلات، "
+              f"{stats['completion_tokens']} مخرجات")
+
 
 def main():
     """الدالة الرئيسية"""
@@ -315,6 +364,7 @@ def main():
             show_settings()
         elif choice == "5":
             print(f"\n{Fore.GREEN}شكراً لاستخدامك الوكيل الذكي. وداعاً!{Style.RESET_ALL}\n")
+            close_all()
             break
         else:
             print(f"{Fore.RED}خيار غير صحيح{Style.RESET_ALL}")
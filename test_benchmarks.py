@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+اختبارات أداة قياس الأداء
+"""
+import sys
+import os
+
+# إضافة المسار للوصول إلى modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks import cases  # noqa: F401
+from benchmarks.harness import compare, load, run, save
+
+
+def test_run_saves_json_and_flags_regressions(tmp_path):
+    """النتائج تُحفظ بصيغة JSON والتباطؤ فوق الحد يُعد تراجعاً"""
+    report = run(["agent.turn"], quick=True, log=lambda line: None)
+    assert set(report["results"]) == {"agent.turn[history=0]", "agent.turn[history=100]"}
+
+    path = str(tmp_path / "run.json")
+    save(report, path)
+    baseline = load(path)
+    assert not any(row["regression"] for row in compare(report, baseline))
+
+    for result in baseline["results"].values():
+        result["median"] /= 2
+    rows = compare(report, baseline, threshold=0.5)
+    assert rows and all(row["regression"] for row in rows)
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+اختبارات الوكيل الأساسي بدون اتصال بالشبكة
+"""
+import asyncio
+import sys
+import os
+
+# إضافة المسار للوصول إلى modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agents.brain import BaseAgent
+
+
+def make_agent(reply: str = "مرحباً بك", agent_class=BaseAgent, **kwargs) -> BaseAgent:
+    """إنشاء وكيل يعمل على المزود المحلي الوهمي بدون شبكة"""
+    agent = agent_class(provider="fake", **kwargs)
+    agent.backend.reply = reply
+    return agent
+
+
+def test_stream_response_yields_deltas_and_records_history():
+    """الرد التدفقي يعيد الأجزاء بالترتيب ويحفظ الرسالة المجمعة في السجل"""
+    agent = make_agent("أ ب ج")
+    deltas = list(agent.stream_response("سؤال"))
+
+    assert deltas == ["أ", " ب", " ج"]
+    assert [m.role for m in agent.conversation_history] == ["user", "assistant"]
+    assert agent.conversation_history[-1].content == "أ ب ج"
+
+    received = []
+    assert agent.get_streamed_response("سؤال آخر", received.append) == "أ ب ج"
+    assert received == ["أ", " ب", " ج"]
+
+
+def test_history_stays_within_token_budget():
+    """السجل يطوي الرسائل القديمة في ملخص ويبقى ضمن الميزانية"""
+    from agents.history import ConversationHistory, Message
+
+    history = ConversationHistory(budget_tokens=200, keep_recent=2)
+    for i in range(40):
+        history.append(Message(role="user" if i % 2 == 0 else "assistant",
+                               content=f"رسالة رقم {i} " + "نص " * 20))
+
+    assert history.total_tokens <= 200
+    assert len(history) >= 2
+    assert history[-1].content.startswith("رسالة رقم 39")
+    assert history.summary is not None
+
+    api = history.to_api()
+    assert api[0]["role"] == "system"
+    assert api[1]["role"] == "user"
+
+    history.clear()
+    assert history.total_tokens == 0 and history.to_api() == []
+
+
+def test_response_cache_hits_and_eviction():
+    """الردود المتطابقة تُخدم من الذاكرة المؤقتة، والطبقة الدائمة تحترم الصلاحية"""
+    from agents.response_cache import ResponseCache
+
+    agent = make_agent("رد ثابت")
+    agent.response_cache = ResponseCache(max_entries=2)
+    messages = [{"role": "user", "content": "سؤال"}]
+
+    assert agent.complete(messages, use_cache=True) == "رد ثابت"
+    assert agent.complete(messages, use_cache=True) == "رد ثابت"
+    assert len(agent.backend.calls) == 1
+    assert agent.response_cache.stats()["hits"] == 1
+
+    agent.temperature = 0.7
+    agent.complete(messages)
+    assert len(agent.backend.calls) == 2
+
+    agent.temperature = 0
+    agent.complete(messages)
+    agent.complete(messages)
+    assert len(agent.backend.calls) == 3
+
+    cache = ResponseCache(max_entries=1, db_path=":memory:", ttl=60)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    assert cache.stats()["disk_hits"] == 1
+    cache.ttl = -1
+    assert cache.get("b") is None
+
+
+def test_process_all_tasks_runs_in_parallel_with_isolated_context():
+    """المهام تُنفذ بالتوازي بسياق مستقل لكل مهمة مع تقرير الإنتاجية"""
+    from agents.tasks_agent import TasksAgent, TaskStatus
+
+    agent = make_agent("تم", TasksAgent)
+    agent.backend.latency = 0.05
+    agent.response_cache = None
+    for i in range(8):
+        agent.add_task(f"t{i}", f"مهمة {i}", priority=i)
+
+    results = agent.process_all_tasks(max_workers=4)
+
+    assert list(results) == [f"t{i}" for i in range(7, -1, -1)]
+    assert all(t.status == TaskStatus.COMPLETED for t in agent.tasks.values())
+    assert all(len(call) == 1 for call in agent.backend.calls)
+    assert agent.last_run_report["tasks"] == 8
+    assert agent.last_run_report["elapsed"] < 8 * 0.05
+
+
+def test_task_queue_orders_by_priority_then_fifo():
+    """الطابور يعيد المهام حسب الأولوية ثم ترتيب الإضافة، والعدادات محدّثة"""
+    from agents.tasks_agent import TasksAgent, TaskStatus
+
+    agent = make_agent("تم", TasksAgent)
+    for task_id, priority in [("a", 5), ("b", 9), ("c", 5), ("d", 1)]:
+        agent.add_task(task_id, task_id, priority)
+
+    assert [t.task_id for t in agent.list_tasks()] == ["b", "a", "c", "d"]
+    assert agent.get_next_task().task_id == "b"
+
+    agent.tasks["b"].status = TaskStatus.COMPLETED
+    assert agent.get_next_task().task_id == "a"
+    agent.tasks["d"].priority = 7
+    assert agent.get_next_task().task_id == "d"
+    agent.tasks["b"].status = TaskStatus.PENDING
+    assert agent.get_next_task().task_id == "b"
+
+    agent.tasks["c"].status = TaskStatus.FAILED
+    stats = agent.get_statistics()
+    assert stats["إجمالي المهام"] == 4
+    assert stats["المهام المعلقة"] == 3
+    assert stats["المهام الفاشلة"] == 1
+    assert [t.task_id for t in agent.queue.drain()] == ["b", "d", "a"]
+    assert agent.get_next_task() is None
+
+
+def test_task_store_resumes_interrupted_tasks(tmp_path):
+    """المهام غير المنتهية تُستعاد بعد التوقف، والمتوقفة أثناء التنفيذ تعود للانتظار"""
+    from agents.task_store import TaskStore
+    from agents.tasks_agent import TasksAgent, TaskStatus
+
+    db_path = str(tmp_path / "tasks.db")
+    agent = make_agent("تم", TasksAgent, store=TaskStore(db_path, batch_size=100, flush_interval=60))
+    agent.response_cache = None
+    for i in range(3):
+        agent.add_task(f"t{i}", f"مهمة {i}", priority=5)
+    agent.execute_task("t0")
+    agent.tasks["t1"].status = TaskStatus.IN_PROGRESS
+    agent.store.save(agent.tasks["t1"])
+    agent.store.flush()
+
+    restored = TasksAgent(provider="fake", store=TaskStore(db_path))
+    # المهام المنتهية تنتقل إلى tasks_history ولا تُستعاد
+    assert "t0" not in restored.tasks
+    assert restored.tasks["t1"].status == TaskStatus.PENDING
+    assert [t.task_id for t in restored.queue.drain()] == ["t1", "t2"]
+
+    history = restored.store._conn.execute("SELECT status, result FROM tasks_history").fetchall()
+    assert history == [("COMPLETED", "تم")]
+    queued = restored.store._conn.execute("SELECT task_id FROM task_queue ORDER BY seq").fetchall()
+    assert queued == [("t1",), ("t2",)]
+
+
+def test_async_fan_out_timeout_and_sync_wrapper():
+    """الاستدعاءات غير المتزامنة تعمل معاً عبر gather، والمهلة تلغي الطلب"""
+    import time
+
+    agent = make_agent("رد")
+    agent.backend.latency = 0.05
+    messages = [[{"role": "user", "content": f"سؤال {i}"}] for i in range(10)]
+
+    async def fan_out():
+        return await asyncio.gather(*(agent.acomplete(m, use_cache=False) for m in messages))
+
+    started = time.perf_counter()
+    assert asyncio.run(fan_out()) == ["رد"] * 10
+    assert time.perf_counter() - started < 10 * 0.05
+
+    async def too_slow():
+        return await agent.acomplete(messages[0], use_cache=False, timeout=0.01)
+
+    try:
+        asyncio.run(too_slow())
+        assert False, "expected a timeout"
+    except asyncio.TimeoutError:
+        pass
+
+    assert "انتهت مهلة" in asyncio.run(agent.aprocess("سؤال", timeout=0.01))
+    agent.backend.latency = 0
+    assert agent.process("سؤال") == "رد"
+    assert [m.role for m in agent.conversation_history][-2:] == ["user", "assistant"]
+
+
+def test_provider_clients_are_shared_across_agents():
+    """الوكلاء يتشاركون عميلاً واحداً لكل مزود وعنوان ومفتاح"""
+    from agents import clients
+    from agents.tasks_agent import TasksAgent
+
+    first, second = BaseAgent(provider="ollama"), TasksAgent(provider="ollama")
+    assert first.backend.client is second.backend.client
+    assert clients.get_client("ollama", base_url="http://other:11434") is not first.backend.client
+
+    async def both():
+        return clients.get_async_client("ollama"), clients.get_async_client("ollama")
+
+    async_first, async_second = asyncio.run(both())
+    assert async_first is async_second
+
+    # close_all يغلق العملاء غير المتزامنة على الحلقة الخلفية قبل إيقافها
+    from agents import async_runtime
+    background, _ = async_runtime.run_sync(both())
+    loop, sync_client = async_runtime.get_loop(), first.backend.client
+    clients.close_all()
+    assert background._client.is_closed
+    assert sync_client._client.is_closed
+    assert loop.is_closed()
+
+
+def test_groq_stream_matches_sdk_and_reads_usage(monkeypatch):
+    """بث Groq يستدعي SDK بمعاملات يقبلها، ويقرأ عدد الرموز من x_groq.usage في الجزء الأخير"""
+    import inspect
+    from types import SimpleNamespace
+    from groq.resources.chat.completions import Completions
+    from groq.types.chat import ChatCompletionChunk
+    from agents.backends import groq_backend
+
+    def chunk(content=None, usage=None):
+        data = {'id': 'c', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'm',
+                'choices': [] if content is None else
+                [{'index': 0, 'delta': {'content': content}, 'finish_reason': None}]}
+        if usage:
+            data['x_groq'] = {'id': 'r', 'usage': usage}
+        return ChatCompletionChunk.model_validate(data)
+
+    def create(**kwargs):
+        # نفس توقيع SDK المثبت: أي معامل غير مدعوم يرفع TypeError
+        inspect.signature(Completions.create).bind(None, **kwargs)
+        return iter([chunk("مرحباً"), chunk(" بك"),
+                     chunk(usage={'prompt_tokens': 7, 'completion_tokens': 2, 'total_tokens': 9})])
+
+    stub = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(groq_backend, "get_client", lambda provider: stub)
+    usage = {}
+    backend = groq_backend.GroqBackend(model="m")
+    messages = [{"role": "user", "content": "سؤال"}]
+    assert "".join(backend.stream(messages, max_tokens=10, temperature=0.5, usage=usage)) == "مرحباً بك"
+    assert usage == {"prompt_tokens": 7, "completion_tokens": 2}
+
+
+def test_backend_registry_and_fake_backend():
+    """المزودون يُنشؤون من السجل، والمزود الوهمي حتمي ويدعم الاستدعاء الدفعي"""
+    from agents.backends.base import LLMBackend
+    from agents.backends.registry import available_backends, create_backend, register_backend
+
+    assert {"groq", "ollama", "fake"} <= set(available_backends())
+    fake = create_backend("fake", tokens=5)
+    messages = [{"role": "user", "content": "سؤال"}]
+    reply = fake.complete(messages, max_tokens=100, temperature=0.7)
+    assert len(reply.split(" ")) == 5
+    assert reply == fake.complete(messages, max_tokens=100, temperature=0.7)
+    assert "".join(fake.stream(messages, max_tokens=100, temperature=0.7)) == reply
+    assert len(fake.complete(messages, max_tokens=2, temperature=0.7).split(" ")) == 2
+
+    class EchoBackend(LLMBackend):
+        name = display_name = "echo"
+
+        async def acomplete(self, messages, max_tokens, temperature, usage=None):
+            return messages[-1]["content"]
+
+    register_backend("echo", EchoBackend)
+    agent = BaseAgent(provider="echo")
+    agent.response_cache = None
+    assert agent.complete_many([[{"role": "user", "content": c}] for c in "أبج"]) == ["أ", "ب", "ج"]
+
+    try:
+        BaseAgent(provider="missing")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_telemetry_records_every_call():
+    """كل استدعاء يُسجل بزمنه وعدد رموزه في المستقبلات"""
+    from agents.telemetry import ConversationsSink, RingBufferSink, Telemetry, summarize
+
+    agent = make_agent("أ ب ج")
+    agent.response_cache = None
+    buffer, db = RingBufferSink(10), ConversationsSink(":memory:")
+    agent.telemetry = Telemetry([buffer, db])
+
+    agent.process("سؤال")
+    list(agent.stream_response("سؤال آخر"))
+
+    complete, stream = buffer.records
+    assert (complete.kind, stream.kind) == ("complete", "stream")
+    assert complete.provider == "fake" and complete.completion_tokens == 3
+    assert not complete.tokens_estimated
+    assert stream.ttft is not None and stream.ttft <= stream.latency
+    assert complete.user_message == "سؤال"
+    # الانتظار يُقاس فقط لما يمر بالحلقة الخلفية، وإلا يبقى فارغاً بدلاً من 0
+    assert complete.queue_wait is not None and stream.queue_wait is None
+    asyncio.run(agent.acomplete([{"role": "user", "content": "مباشر"}]))
+    assert buffer.records[-1].queue_wait is None
+
+    rows = db._conn.execute("SELECT user_message, tokens_used FROM conversations").fetchall()
+    assert [row[0] for row in rows] == ["سؤال", "سؤال آخر", "مباشر"]
+    assert all(row[1] > 0 for row in rows)
+
+    summary = summarize(buffer.records)["fake/fake"]
+    assert summary["calls"] == 3 and summary["latency"]["p50"] is not None
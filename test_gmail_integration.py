@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+اختبارات تكامل Gmail باستخدام خدمة Gmail وهمية محلية
+"""
+import sys
+import os
+
+# إضافة المسار للوصول إلى modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from integrations.gmail_integration import GmailIntegration
+from integrations.fake_gmail import FakeGmailService, make_message
+from integrations.message_cache import MessageCache
+
+
+def make_gmail(count: int = 5, cache: MessageCache = None) -> GmailIntegration:
+    """إنشاء تكامل Gmail متصل بخدمة وهمية"""
+    gmail = GmailIntegration(cache=cache, cache_max_age=0, quota_units_per_second=0)
+    gmail.backoff_base = 0
+    gmail.service = FakeGmailService([
+        make_message(f"m{i}", subject=f"Subject {i}", body=f"Body {i}")
+        for i in range(count)
+    ])
+    return gmail
+
+
+def test_list_messages_uses_batches():
+    """list_messages يجمع طلبات التفاصيل في batch بدلاً من طلب لكل رسالة"""
+    gmail = make_gmail(100)
+    messages = gmail.get_unread_messages(max_results=100)
+
+    assert len(messages) == 100
+    assert messages[0]['subject'] == 'Subject 99'
+    assert gmail.service.calls['messages.list'] == 1
+    assert gmail.service.calls['batch'] == 2
+    assert gmail.service.calls['messages.get.full'] == 0
+
+
+def test_batch_reports_partial_failures():
+    """الرسائل الفاشلة تُعاد في errors بينما تُعاد الباقية بنفس الترتيب"""
+    gmail = make_gmail(5)
+    gmail.service.fail_message('m2', status=403)
+
+    result = gmail.get_messages_batch(['m0', 'm1', 'm2', 'missing', 'm4'], batch_size=2)
+
+    assert [m['id'] for m in result['messages']] == ['m0', 'm1', 'm4']
+    assert set(result['errors']) == {'m2', 'missing'}
+    assert gmail.service.calls['batch'] == 3
+
+
+def test_list_messages_without_batch():
+    """المسار القديم (طلب لكل رسالة) ما زال متاحاً"""
+    gmail = make_gmail(3)
+    messages = gmail.search_messages('Subject', max_results=10)
+    assert len(messages) == 3
+
+    messages = gmail.list_messages('Subject', max_results=10, batch=False)
+    assert len(messages) == 3
+    assert gmail.service.calls['messages.get.metadata'] == 3
+
+
+def test_body_is_loaded_lazily():
+    """صيغة metadata لا تجلب النص إلا عند قراءة body لأول مرة"""
+    gmail = make_gmail(1)
+    message = gmail.get_message('m0')
+
+    assert message['subject'] == 'Subject 0'
+    assert not message.body_loaded
+    assert gmail.service.calls['messages.get.full'] == 0
+
+    assert message.body == 'Body 0'
+    assert message['body'] == 'Body 0'
+    assert gmail.service.calls['messages.get.full'] == 1
+
+    full = gmail.get_message('m0', format='full')
+    assert full.body_loaded
+    assert full.get('body') == 'Body 0'
+
+
+def test_cache_serves_repeated_reads():
+    """القراءات المتكررة تُخدم من المخزن المحلي بدون إعادة تنزيل"""
+    gmail = make_gmail(20, cache=MessageCache(':memory:'))
+    gmail.list_messages(max_results=20)
+    gmail.list_messages(max_results=20)
+    message = gmail.get_message('m3')
+
+    assert message['subject'] == 'Subject 3'
+    assert gmail.service.calls['batch'] == 1
+    assert message.body == 'Body 3'
+    assert gmail.get_message('m3', format='full').body == 'Body 3'
+    assert gmail.service.calls['messages.get.full'] == 1
+
+
+def test_cache_incremental_sync():
+    """المزامنة تنقل التغييرات فقط منذ آخر historyId"""
+    cache = MessageCache(':memory:')
+    gmail = make_gmail(3, cache=cache)
+    gmail.list_messages(max_results=10)
+
+    gmail.service.add_message(make_message('new', subject='New one'))
+    gmail.service.modify_labels('m0', [], ['UNREAD'])
+    gmail.service.remove_message('m1')
+
+    stats = gmail.sync()
+
+    assert stats == {'added': 1, 'deleted': 1, 'labels_changed': 1}
+    assert cache.get('new')['subject'] == 'New one'
+    assert 'UNREAD' not in cache.get('m0')['labels']
+    assert 'm1' not in cache
+
+    gmail.service.expire_history()
+    gmail.sync()
+    assert len(cache) == 0
+    assert cache.history_id == str(gmail.service.history_id)
+
+
+def test_iter_messages_streams_all_pages():
+    """iter_messages يتبع nextPageToken عبر جميع الصفحات ويحترم limit"""
+    gmail = make_gmail(250)
+
+    ids = [msg['id'] for msg in gmail.iter_messages(page_size=100)]
+    assert len(ids) == 250
+    assert len(set(ids)) == 250
+    assert gmail.service.calls['messages.list'] == 3
+
+    limited = list(gmail.iter_messages(page_size=40, limit=90, fetch_details=False))
+    assert len(limited) == 90
+    assert set(limited[0]) == {'id', 'threadId'}
+
+    assert len(gmail.list_messages(max_results=600)) == 250
+
+
+def test_batch_modify_chunks_to_api_limit():
+    """العمليات الجماعية تُقسم إلى دفعات من 1000 معرف مع نتيجة لكل دفعة"""
+    cache = MessageCache(':memory:')
+    gmail = make_gmail(2500, cache=cache)
+    gmail.list_messages(max_results=10)
+    ids = list(gmail.service.messages)
+
+    results = gmail.batch_mark_as_read(ids)
+    assert [len(r['ids']) for r in results] == [1000, 1000, 500]
+    assert all(r['success'] for r in results)
+    assert gmail.service.calls['messages.batchModify'] == 3
+    assert not any('UNREAD' in m['labelIds'] for m in gmail.service.messages.values())
+    assert 'UNREAD' not in cache.get('m2499')['labels']
+
+    results = gmail.batch_delete_messages(ids[:1500], permanent=True)
+    assert len(results) == 2
+    assert len(gmail.service.messages) == 1000
+    assert 'm0' not in cache
+
+
+def test_transient_errors_are_retried():
+    """أخطاء 429/5xx المؤقتة يُعاد تنفيذها بدلاً من إعادة قائمة فارغة"""
+    gmail = make_gmail(10)
+    gmail.service.fail_next('messages.list', status=429, times=2)
+    gmail.service.fail_message('m4', status=503, times=1)
+    gmail.service.fail_message('m5', status=404)
+
+    result = gmail.get_messages_batch(['m3', 'm4', 'm5'])
+    assert [m['id'] for m in result['messages']] == ['m3', 'm4']
+    assert list(result['errors']) == ['m5']
+
+    assert len(gmail.list_messages(max_results=10)) == 9
+    assert gmail.service.calls['messages.list'] == 3
+
+
+def test_concurrent_batches_and_rate_limit():
+    """الدفعات تُنفذ على مجمع خيوط ويُحترم حد وحدات الحصة"""
+    from utils.rate_limit import TokenBucket
+
+    gmail = make_gmail(400)
+    gmail.max_workers = 4
+    messages = gmail.get_messages_batch([f"m{i}" for i in range(400)], batch_size=50)['messages']
+    assert len(messages) == 400
+    assert gmail.service.calls['batch'] == 8
+
+    clock = [0.0]
+    bucket = TokenBucket(250, clock=lambda: clock[0],
+                         sleep=lambda delay: clock.__setitem__(0, clock[0] + delay))
+    for _ in range(5):
+        bucket.acquire(250)
+    assert clock[0] == 4.0
+
+
+def test_mime_body_walks_nested_parts_and_converts_html():
+    """النص يُستخرج من أجزاء متداخلة، و HTML يُحول إلى نص بترميز الجزء وحد البايتات"""
+    import base64
+    from integrations.mime import extract_body
+
+    def part(mime_type, text, charset='utf-8', filename=''):
+        data = base64.urlsafe_b64encode(text.encode(charset)).decode('ascii').rstrip('=')
+        return {'mimeType': mime_type, 'filename': filename,
+                'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset="{charset}"'}],
+                'body': {'data': data}}
+
+    html = part('text/html', '<html><head><style>p {color: red}</style></head>'
+                '<body><p>مرحباً&nbsp;&amp; أهلاً</p><p>caf&#233;</p></body></html>')
+    payload = {'mimeType': 'multipart/mixed', 'parts': [
+        part('text/plain', 'not the body', filename='notes.txt'),
+        {'mimeType': 'multipart/alternative', 'parts': [html]},
+    ]}
+    assert extract_body(payload) == 'مرحباً & أهلاً\n\ncafé'
+
+    payload['parts'][1]['parts'].append(part('text/plain', 'caf\xe9 ' * 10, 'latin-1'))
+    assert extract_body(payload) == 'café ' * 10
+    assert extract_body(payload, max_bytes=7) == 'café ca'
+
+
+def test_reply_threads_with_indexed_headers():
+    """الرد يستخدم Message-ID و References و Cc من فهرس ترويسات الرسالة الأصلية"""
+    import base64
+    import email
+
+    gmail = make_gmail(0, cache=MessageCache(':memory:'))
+    gmail.service.add_message(make_message('m0', subject='Plan', headers={
+        'CC': 'team@example.com', 'Message-ID': '<b@example.com>',
+        'References': '<a@example.com>', 'List-Unsubscribe': '<mailto:u@example.com>'}))
+
+    original = gmail.get_message('m0')
+    assert original['messageId'] == '<b@example.com>'
+    assert original['listUnsubscribe'] == '<mailto:u@example.com>'
+    assert gmail.get_message('m0')['cc'] == 'team@example.com'
+
+    assert gmail.reply_to_message('m0', 'OK', reply_all=True)
+    assert gmail.service.calls['messages.get.metadata'] == 1
+    sent = email.message_from_bytes(base64.urlsafe_b64decode(gmail.service.sent[0]['raw']))
+    assert sent['In-Reply-To'] == '<b@example.com>'
+    assert sent['References'] == '<a@example.com> <b@example.com>'
+    assert sent['Cc'] == 'me@example.com, team@example.com'
+    assert sent['Subject'] == 'Re: Plan'
+
+
+def test_digest_batches_messages_and_caches_summaries(monkeypatch):
+    """التلخيص يجمع الرسائل في طلبات بالتوازي ولا يعيد تلخيص الرسائل المحفوظة"""
+    from agents.email_digest import message_text
+    from agents.gmail_agent import GmailAgent
+    from agents.history import estimate_tokens
+    from config.settings import config
+
+    monkeypatch.setattr(config, 'GMAIL_CACHE_ENABLED', False)
+    agent = GmailAgent(provider='fake')
+    agent.gmail = make_gmail(8, cache=MessageCache(':memory:'))
+    agent.backend.reply = "[1] one\n[2] two\n[3] three"
+    messages = agent.gmail.list_messages(max_results=8)
+    monkeypatch.setattr(config, 'GMAIL_DIGEST_CHUNK_TOKENS',
+                        3 * estimate_tokens(message_text(messages[0], 1000)))
+
+    def map_calls():
+        return [call for call in agent.backend.calls if call[0]['content'].startswith('لخص كل')]
+
+    assert agent.digest_emails(messages[2:]) == agent.backend.reply
+    assert len(map_calls()) == 2
+    assert agent.gmail.cache.get_summaries([messages[2]['id']]) == {messages[2]['id']: 'one'}
+    assert agent.summarize_messages(messages[2:5]) == {
+        messages[2]['id']: 'one', messages[3]['id']: 'two', messages[4]['id']: 'three'}
+
+    agent.analyze_emails_sentiment(messages)
+    assert len(map_calls()) == 3
+    assert 'Subject 7' in map_calls()[-1][0]['content']
+    assert 'Subject 5' not in map_calls()[-1][0]['content']
+
+
+def test_digest_reduce_prompts_stay_within_budget(monkeypatch):
+    """الميزانية أصغر من سطر ملخص واحد: تُقتطع الأسطر وتُدمج على مراحل ولا يتجاوز أي طلب دمج الميزانية"""
+    from agents.email_digest import DIGEST_INSTRUCTIONS, reduce_prompt
+    from agents.gmail_agent import GmailAgent
+    from agents.history import estimate_tokens
+    from config.settings import config
+
+    monkeypatch.setattr(config, 'GMAIL_CACHE_ENABLED', False)
+    agent = GmailAgent(provider='fake')
+    agent.gmail = make_gmail(6, cache=MessageCache(':memory:'))
+    agent.backend.reply = "\n".join(f"[{i}] " + "ملخص طويل جداً " * 20 for i in range(1, 7))
+    messages = agent.gmail.list_messages(max_results=6)
+    budget = 40
+    monkeypatch.setattr(config, 'GMAIL_DIGEST_CHUNK_TOKENS', budget)
+
+    agent.digest_emails(messages)
+    reduce_calls = [call[0]['content'] for call in agent.backend.calls
+                    if not call[0]['content'].startswith('لخص كل')]
+    assert len(reduce_calls) > 1
+    overhead = estimate_tokens(reduce_prompt([], DIGEST_INSTRUCTIONS))
+    assert all(estimate_tokens(content) <= budget + overhead for content in reduce_calls)
+
+
+def test_keyword_classifier_rules_weights_and_priorities(tmp_path):
+    """القواعد تُحمّل من الملف، والأولوية تحسم بين الفئات والأوزان تحدد أدنى درجة"""
+    import json
+    from agents.email_classifier import load_classifier
+    from agents.gmail_agent import GmailAgent
+
+    categories = GmailAgent.categorize_emails(None, [
+        {'subject': 'Project MEETING', 'from': 'boss@example.com', 'snippet': 'urgent please'},
+        {'subject': 'Weekly newsletter', 'from': 'news@example.com', 'snippet': ''},
+        {'subject': 'اجتماع الغد', 'from': 'a@example.com', 'snippet': ''},
+        {'subject': 'Hello', 'from': 'friend@example.com', 'snippet': 'hi'},
+    ])
+    assert [len(categories[name]) for name in ('urgent', 'work', 'newsletters', 'other')] == [1, 1, 1, 1]
+    assert categories['personal'] == [] and categories['spam'] == []
+
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'categories': {
+        'default': 'misc',
+        'weights': {'subject': 2.0, 'snippet': 1.0},
+        'rules': [
+            {'name': 'billing', 'priority': 1, 'keywords': ['invoice', 'فاتورة']},
+            {'name': 'alerts', 'priority': 5, 'min_score': 2, 'keywords': ['alert']},
+        ],
+    }}), encoding='utf-8')
+    classifier = load_classifier('categories', str(path))
+
+    assert classifier.classify({'subject': 'Alert: invoice due'}) == 'alerts'
+    assert classifier.classify({'subject': 'Invoice', 'snippet': 'alert'}) == 'billing'
+    assert classifier.scores({'subject': 'فاتورة', 'snippet': 'فاتورة invoice'}) == {'billing': 4.0}
+    assert classifier.classify({'subject': 'nothing'}) == 'misc'
+    assert load_classifier('commands').classify({'command': 'لخص آخر 5 رسائل'}) == 'summarize'
+
+
+def test_semantic_index_updates_incrementally_and_persists(tmp_path, monkeypatch):
+    """الفهرس يضيف الرسائل الجديدة فقط، يبقى على القرص، ويجد الرسائل القريبة من الاستعلام"""
+    from agents.gmail_agent import GmailAgent
+    from config.settings import config
+    from integrations.semantic_index import SemanticIndex
+
+    cache = MessageCache(':memory:')
+    cache.put_many([
+        {'id': 'm1', 'subject': 'موعد الاجتماع الأسبوعي', 'snippet': 'نلتقي يوم الأحد لمناقشة المشروع'},
+        {'id': 'm2', 'subject': 'Invoice #42', 'snippet': 'Your invoice for March is attached'},
+        {'id': 'm3', 'subject': 'Weekend trip', 'snippet': 'Photos from the beach'},
+    ])
+    directory = str(tmp_path / 'index')
+    index = SemanticIndex(directory)
+    assert index.update_from_cache(cache) == 3
+    assert index.search('اجتماع المشروع', k=1)[0][0] == 'm1'
+    assert index.search('march invoice', k=1)[0][0] == 'm2'
+    assert index.search('march invoice', k=0) == []
+
+    cache.put({'id': 'm4', 'subject': 'Team meeting moved', 'snippet': 'The project meeting is now Monday'})
+    reopened = SemanticIndex(directory)
+    assert len(reopened) == 3
+    assert reopened.update_from_cache(cache) == 1
+    assert reopened.search('project meeting', k=1)[0][0] == 'm4'
+
+    monkeypatch.setattr(config, 'GMAIL_CACHE_ENABLED', False)
+    monkeypatch.setattr(config, 'SEMANTIC_INDEX_DIR', directory)
+    agent = GmailAgent(provider='fake')
+    agent.gmail = make_gmail(0, cache=cache)
+    cache.delete(['m1'])
+    results = agent.semantic_search('موعد الاجتماع الأسبوعي', max_results=5)
+    assert 'm1' not in [m['id'] for m in results]
+    assert 'm1' not in agent.semantic_index
+    assert agent.semantic_search('project meeting', max_results=1)[0]['id'] == 'm4'
+    assert agent.gmail.service.calls['messages.list'] == 0
+
+
+def test_fulltext_index_answers_gmail_queries_offline(tmp_path, monkeypatch):
+    """search_emails يُجاب من الفهرس المحلي بعد build_search_index، والمشغلات غير المدعومة تذهب إلى API"""
+    from agents.gmail_agent import GmailAgent
+    from config.settings import config
+
+    monkeypatch.setattr(config, 'GMAIL_CACHE_ENABLED', False)
+    monkeypatch.setattr(config, 'FULLTEXT_INDEX_DB', str(tmp_path / 'search.db'))
+    agent = GmailAgent(provider='fake')
+    agent.gmail = make_gmail(0, cache=MessageCache(':memory:'))
+    agent.authenticated = True
+    service = agent.gmail.service
+    service.add_message(make_message('a1', subject='Weekly report', sender='Ahmed <ahmed@example.com>',
+                                     body='Numbers for the weekly report', labels=['INBOX'],
+                                     date='Mon, 8 Jan 2024 10:00:00 +0000'))
+    service.add_message(make_message('a2', subject='موعد الإجتماع', sender='sara@example.com',
+                                     body='نلتقي غداً في المكتب', date='Tue, 5 Mar 2024 09:00:00 +0000'))
+    service.add_message(make_message('a3', subject='Weekly report', sender='spam@example.com',
+                                     body='Buy now', date='Wed, 6 Dec 2023 09:00:00 +0000'))
+
+    assert agent.build_search_index() == 3
+    assert agent.fulltext_index.complete
+    service.calls.clear()
+
+    assert [m['id'] for m in agent.search_emails('subject:"weekly report" -from:spam')] == ['a1']
+    assert [m['id'] for m in agent.search_emails('from:ahmed@example.com after:2024/01/01')] == ['a1']
+    assert [m['id'] for m in agent.search_emails('اجتماع')] == ['a2']
+    assert [m['id'] for m in agent.search_emails('report before:2024/01/01')] == ['a3']
+    # حد عند epoch صفر يبقى محفوظاً ولا يُعامل كغير محدد
+    assert agent.search_emails('report before:1970/01/01 before:2024/01/01') == []
+    assert service.calls['messages.list'] == 0
+
+    # الرسائل الجديدة تصل إلى الفهرس عبر المزامنة التزايدية
+    service.add_message(make_message('a4', subject='Quarterly report', sender='ahmed@example.com',
+                                     date='Fri, 5 Apr 2024 09:00:00 +0000'))
+    assert [m['id'] for m in agent.search_emails('from:ahmed report')] == ['a4', 'a1']
+    assert service.calls['messages.list'] == 0
+
+    unread = agent.search_emails('is:unread')
+    assert service.calls['messages.list'] == 1
+    assert 'a1' not in [m['id'] for m in unread]
+
+
+def test_mailbox_stats_snapshot_refreshes_incrementally(monkeypatch):
+    """الإحصائيات تُحسب من لقطة المخزن، وتصلها الرسائل الجديدة والتصنيفات والحذف بدون إعادة تحميل"""
+    from agents.gmail_agent import GmailAgent
+    from config.settings import config
+    import time
+    from email.utils import formatdate
+
+    monkeypatch.setattr(config, 'GMAIL_CACHE_ENABLED', False)
+    agent = GmailAgent(provider='fake')
+    agent.gmail = make_gmail(0, cache=MessageCache(':memory:'))
+    agent.authenticated = True
+    service = agent.gmail.service
+    # ثلاثة أيام متتالية تنتهي أمس (الإحصائيات اليومية لآخر 14 يوماً)
+    start = (time.time() // 86400 - 3) * 86400
+    day = [time.strftime('%Y-%m-%d', time.gmtime(start + i * 86400)) for i in range(3)]
+    for msg_id, sender, subject, hours, labels in [
+        ('i1', 'Ahmed <ahmed@example.com>', 'Project meeting', 10, ['INBOX', 'UNREAD']),
+        ('r1', 'me@example.com', 'Re: Project meeting', 12, ['SENT']),
+        ('i2', 'ahmed@example.com', 'Urgent invoice', 33, ['INBOX', 'UNREAD', 'Label_1']),
+        ('i3', 'news@example.com', 'Weekly newsletter', 35, ['INBOX']),
+    ]:
+        date = formatdate(start + hours * 3600, usegmt=True)
+        service.add_message(make_message(msg_id, subject=subject, sender=sender, date=date, labels=labels,
+                                         thread_id='t1' if msg_id in ('i1', 'r1') else None))
+    list(agent.gmail.iter_messages(''))
+
+    stats = agent.get_email_statistics()
+    assert stats['cached_messages'] == 4
+    assert stats['top_senders'][0] == ('ahmed@example.com', 2)
+    assert stats['volume_per_day'] == {day[0]: 2, day[1]: 2}
+    assert stats['unread_by_label'] == {'INBOX': 2, 'Label_1': 1}
+    assert stats['unread_by_category'] == {'urgent': 1, 'work': 1}
+    assert stats['reply_latency'] == {'replies': 1, 'median_hours': 2.0, 'mean_hours': 2.0, 'p90_hours': 2.0}
+
+    service.calls.clear()
+    agent.gmail.mark_as_read('i2')
+    service.remove_message('i3')
+    service.add_message(make_message('i4', sender='sara@example.com',
+                                     date=formatdate(start + 56 * 3600, usegmt=True)))
+    stats = agent.get_email_statistics()
+    assert stats['cached_messages'] == 4
+    assert stats['volume_per_day'] == {day[0]: 2, day[1]: 1, day[2]: 1}
+    assert stats['unread_by_label'] == {'INBOX': 2}
+    assert agent.mailbox_stats.update_from_cache(agent.gmail.cache) == 0
+    assert service.calls['messages.get.full'] == 0
+
+    # الصندوق لم يتغير: getProfile فقط
+    service.calls.clear()
+    agent.get_email_statistics()
+    assert service.calls['messages.list'] == 0
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+اختبارات زمن بدء التشغيل
+"""
+import json
+import os
+import subprocess
+import sys
+
+# إضافة المسار للوصول إلى modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ('googleapiclient', 'google_auth_oauthlib', 'groq', 'ollama', 'httpx')
+
+STARTUP_SCRIPT = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+from agents.brain import BaseAgent
+BaseAgent(provider="groq")
+print(json.dumps({{
+    "seconds": time.perf_counter() - started,
+    "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def test_startup_skips_provider_and_google_sdks():
+    """بدء المحادثة لا يستورد مكتبات المزودين أو Google ويبقى ضمن الميزانية"""
+    env = dict(os.environ, AI_PROVIDER="groq", GROQ_API_KEY="test-key")
+    output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert result["loaded"] == []
+    assert result["seconds"] < float(os.getenv("STARTUP_BUDGET_SECONDS", "1.5"))
+
+
+def test_discovery_document_cached_on_disk(tmp_path, monkeypatch):
+    """مستند discovery يُقرأ من النسخة المحفوظة على القرص ويُحفظ في الذاكرة"""
+    from config.settings import config
+    from integrations import gmail_integration
+
+    path = tmp_path / "gmail-discovery-{version}.json"
+    (tmp_path / "gmail-discovery-v9.json").write_text(json.dumps({"name": "gmail"}))
+    monkeypatch.setattr(config, "GMAIL_DISCOVERY_CACHE", str(path))
+    monkeypatch.setattr(gmail_integration, "_DISCOVERY_DOCUMENTS", {})
+
+    document = gmail_integration.load_discovery_document("v9")
+    assert document == {"name": "gmail"}
+    (tmp_path / "gmail-discovery-v9.json").unlink()
+    assert gmail_integration.load_discovery_document("v9") is document
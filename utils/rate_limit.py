@@ -0,0 +1,112 @@
+"""
+أدوات التحكم في معدل الطلبات وإعادة المحاولة
+"""
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class TokenBucket:
+    """
+    محدد معدل من نوع Token Bucket آمن للاستخدام من عدة خيوط
+
+    يمتلئ الدلو بمعدل rate وحدة في الثانية حتى capacity. الطلب الذي تتجاوز
+    تكلفته السعة يُسمح له عندما يمتلئ الدلو، ويصبح الرصيد سالباً حتى يُسدد.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        تهيئة المحدد
+
+        Args:
+            rate: عدد الوحدات المضافة في الثانية
+            capacity: الحد الأقصى للرصيد (افتراضياً rate، أي دفعة ثانية واحدة)
+            clock: دالة الوقت (للاختبارات)
+            sleep: دالة الانتظار (للاختبارات)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, cost: float = 1) -> float:
+        """
+        حجز وحدات من الدلو، مع الانتظار إذا لم يكن الرصيد كافياً
+
+        Args:
+            cost: عدد الوحدات المطلوبة
+
+        Returns:
+            إجمالي وقت الانتظار بالثواني
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= min(cost, self.capacity):
+                    self._tokens -= cost
+                    return waited
+                delay = (min(cost, self.capacity) - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+def backoff_delay(attempt: int, base: float = 1.0, maximum: float = 32.0) -> float:
+    """
+    حساب مدة الانتظار قبل المحاولة التالية (تصاعد أسي مع jitter كامل)
+
+    Args:
+        attempt: رقم المحاولة الفاشلة (يبدأ من 0)
+        base: المدة الأساسية بالثواني
+        maximum: الحد الأقصى للمدة
+
+    Returns:
+        مدة الانتظار بالثواني
+    """
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+def call_with_backoff(func: Callable[[], T], should_retry: Callable[[Exception], bool],
+                      max_retries: int = 5, base: float = 1.0, maximum: float = 32.0,
+                      sleep: Callable[[float], None] = time.sleep) -> T:
+    """
+    تنفيذ دالة مع إعادة المحاولة بتصاعد أسي عند الأخطاء المؤقتة
+
+    Args:
+        func: الدالة المراد تنفيذها
+        should_retry: تحدد ما إذا كان الخطأ مؤقتاً ويستحق إعادة المحاولة
+        max_retries: الحد الأقصى لعدد إعادات المحاولة
+        base: المدة الأساسية للانتظار بالثواني
+        maximum: الحد الأقصى لمدة الانتظار
+        sleep: دالة الانتظار (للاختبارات)
+
+    Returns:
+        نتيجة الدالة
+
+    Raises:
+        آخر خطأ إذا فشلت جميع المحاولات أو كان الخطأ غير مؤقت
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as error:
+            if attempt >= max_retries or not should_retry(error):
+                raise
+            sleep(backoff_delay(attempt, base, maximum))
+            attempt += 1
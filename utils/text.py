@@ -0,0 +1,61 @@
+"""
+أدوات تطبيع النص العربي والإنجليزي للفهرسة والبحث
+"""
+import re
+from typing import List
+
+# التشكيل والتطويل
+_DIACRITICS_RE = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_WORD_RE = re.compile(r'\w+')
+# بادئات عربية شائعة ("الاجتماع" و "بالاجتماع" -> "اجتماع")
+ARABIC_PREFIXES = ('وال', 'بال', 'فال', 'كال', 'لل', 'ال')
+
+# توحيد أشكال الحروف التي يكتبها المستخدمون بأكثر من طريقة
+_ARABIC_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+})
+
+
+def normalize(text: str) -> str:
+    """
+    تطبيع النص للمقارنة: أحرف صغيرة، بدون تشكيل أو تطويل، وأشكال موحدة للألف والياء والتاء المربوطة
+
+    Args:
+        text: النص
+
+    Returns:
+        النص المطبّع
+    """
+    return _DIACRITICS_RE.sub('', text.lower()).translate(_ARABIC_LETTERS)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    كلمات النص بعد التطبيع
+
+    Args:
+        text: النص
+
+    Returns:
+        قائمة الكلمات
+    """
+    return _WORD_RE.findall(normalize(text))
+
+
+def strip_arabic_prefix(word: str) -> str:
+    """
+    الكلمة بدون أداة التعريف وما يسبقها، إذا بقي منها حرفان على الأقل
+
+    Args:
+        word: كلمة مطبّعة
+
+    Returns:
+        الجذع أو الكلمة نفسها
+    """
+    for prefix in ARABIC_PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+            return word[len(prefix):]
+    return word